@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Runs the benchmarks and compares them with a baseline."""
+
+from __future__ import print_function
+
+import argparse
+import json
+import sys
+
+from tuxywords.transform import TransformationFinder
+
+from . import suite, wordlists
+
+
+def main():
+    """Module entry point."""
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="""times the construction of the relations between words
+                       and the search for transformations""")
+    parser.add_argument('--dataset', action='append',
+                        choices=['synthetic'] + wordlists.DICTIONARIES,
+                        help="""generated list of words to benchmark, can be
+                                repeated (default: all of them)""")
+    parser.add_argument('--wordlist', action='append', default=[],
+                        type=argparse.FileType('rb'),
+                        help="""also benchmark the list of words read from a
+                                file, can be repeated""")
+    parser.add_argument('--count', type=int, default=5000,
+                        help="""number of words of the generated lists
+                                (default: %(default)s)""")
+    parser.add_argument('--length', type=int, default=5,
+                        help="""length of the synthetic words
+                                (default: %(default)s)""")
+    parser.add_argument('--alphabet', default='abcdef',
+                        help="""letters of the synthetic words
+                                (default: %(default)s)""")
+    parser.add_argument('--seed', type=int, default=42,
+                        help="""seed of the generated lists and of the
+                                sampled pairs of words
+                                (default: %(default)s)""")
+    parser.add_argument('--pairs', type=int, default=20,
+                        help="""number of pairs of words searched for each
+                                kind of pair (default: %(default)s)""")
+    parser.add_argument('--search', action='append',
+                        choices=TransformationFinder.SEARCHES,
+                        help="""search algorithm to benchmark, can be repeated
+                                (default: all of them)""")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="""number of repetitions of each benchmark, the
+                                best time is kept (default: %(default)s)""")
+    parser.add_argument('--output', metavar='FILE',
+                        help='write the results as JSON to FILE')
+    parser.add_argument('--baseline', metavar='FILE',
+                        type=argparse.FileType('r'),
+                        help="""compare the results with the ones previously
+                                written to FILE and exit with status 1 when a
+                                benchmark is slower""")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="""fraction by which a benchmark must be slower
+                                than the baseline to be reported
+                                (default: %(default)s)""")
+    args = parser.parse_args()
+    datasets = []
+    for name in args.dataset or ['synthetic'] + wordlists.DICTIONARIES:
+        if name == 'synthetic':
+            words = wordlists.synthetic_words(args.count, args.length,
+                                              args.alphabet, args.seed)
+        else:
+            words = wordlists.dictionary_words(args.count, name, args.seed)
+        datasets.append((name, wordlists.encode(words)))
+    for wordlist in args.wordlist:
+        datasets.append((wordlist.name, wordlist.read()))
+
+    def report(name, seconds):
+        print('%-50s %10.6f s' % (name, seconds))
+        sys.stdout.flush()
+
+    results = {}
+    for name, data in datasets:
+        results.update(suite.run_dataset(name, data, args.repeat, args.pairs,
+                                         args.search, args.seed, report))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'format': suite.FORMAT,
+                       'environment': suite.describe_environment(),
+                       'results': results}, f, indent=2, sort_keys=True)
+    if args.baseline is not None:
+        baseline = json.load(args.baseline)
+        if baseline.get('format') != suite.FORMAT:
+            parser.error('%s is not a baseline of these benchmarks' %
+                         args.baseline.name)
+        comparisons, regressions = suite.compare(results,
+                                                 baseline['results'],
+                                                 args.threshold)
+        print()
+        for name, before, after, ratio in comparisons:
+            print('%-50s %10.6f s -> %10.6f s  x%.2f%s' % (
+                name, before, after, ratio,
+                '  slower' if name in regressions else ''))
+        if regressions:
+            parser.exit(1, '%d benchmarks are slower than the baseline by '
+                           'more than %d%%\n' %
+                        (len(regressions), round(args.threshold * 100)))
+
+
+if __name__ == '__main__':
+    main()
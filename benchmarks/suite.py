@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Times the steps of finding transformations between words and compares
+the timings with a baseline.
+
+Each benchmark is named after its dataset and step, such as
+'english-like/relations' or 'synthetic/search/long/astar', and its timing is
+the best of several repetitions.
+"""
+
+import random
+
+from collections import deque
+from io import BytesIO
+from timeit import default_timer
+
+from tuxywords.transform import (MultiLengthRelationsBuilder,
+                                 NoTransformationError, NormalizedWordList,
+                                 TransformationFinder, connected_components)
+
+# Version of the format of the results
+FORMAT = 1
+
+PAIR_KINDS = ('reachable', 'unreachable', 'long')
+
+
+def best_time(function, repeat=3, setup=None):
+    """Returns the shortest time in seconds taken by repeat calls to function.
+
+    When setup is given, it is called before each call to function, outside
+    of the timing, and function is called with the value it returns.
+    """
+    best = None
+    for i in range(repeat):
+        if setup is None:
+            start = default_timer()
+            function()
+        else:
+            argument = setup()
+            start = default_timer()
+            function(argument)
+        elapsed = default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _members(relations, components):
+    """Returns the list of the words of each component, by number."""
+    members = [[] for size in components.sizes()]
+    for word in sorted(relations):
+        members[components[word]].append(word)
+    return members
+
+
+def _farthest(relations, start):
+    """Returns the word the farthest from start with a breadth-first search.
+    """
+    seen = set([start])
+    boundary = deque([start])
+    word = start
+    while boundary:
+        word = boundary.popleft()
+        for relation in sorted(relations[word]):
+            if relation not in seen:
+                seen.add(relation)
+                boundary.append(relation)
+    return word
+
+
+def sample_pairs(graphs, count, seed=42):
+    """Returns a dictionnary that maps each kind of pair of words with count
+    pairs of words of the same length drawn from graphs.
+
+    graphs maps a word length with the relations between the words of that
+    length. The words of the reachable pairs are related, the words of the
+    unreachable pairs are not, and the long pairs are made of a word and the
+    word the farthest from it. A kind of pair is left empty when the words
+    cannot form it.
+    """
+    generator = random.Random(seed)
+    groups = []
+    for length in sorted(graphs):
+        relations = graphs[length]
+        members = _members(relations, connected_components(relations))
+        groups.append((relations, members))
+    related = [(relations, words) for relations, members in groups
+               for words in members if len(words) > 1]
+    separated = [members for relations, members in groups
+                 if len(members) > 1]
+    pairs = dict((kind, []) for kind in PAIR_KINDS)
+    for i in range(count):
+        if related:
+            relations, words = generator.choice(related)
+            start = generator.choice(words)
+            pairs['reachable'].append((start, generator.choice(words)))
+            pairs['long'].append((start, _farthest(relations, start)))
+        if separated:
+            members = generator.choice(separated)
+            first, second = generator.sample(range(len(members)), 2)
+            pairs['unreachable'].append((generator.choice(members[first]),
+                                         generator.choice(members[second])))
+    return pairs
+
+
+def _search_all(graphs, search, pairs):
+    """Searches the transformation of each pair with new finders, so that
+    nothing is cached from a previous repetition.
+    """
+    finders = {}
+    for start, end in pairs:
+        finder = finders.get(len(start))
+        if finder is None:
+            finder = finders[len(start)] = TransformationFinder(
+                graphs[len(start)], search)
+        try:
+            for word in finder.find_transformation(start, end):
+                pass
+        except NoTransformationError:
+            pass
+
+
+def run_dataset(name, data, repeat=3, pairs=20, searches=None, seed=42,
+                report=None):
+    """Times the steps of finding transformations between the words of a
+    UTF-8 encoded list of words.
+
+    Returns a dictionnary that maps the name of each benchmark with its
+    timing. The searches are the search algorithms of TransformationFinder,
+    all of them unless searches is given. report is called with the name and
+    timing of each benchmark as soon as it is done.
+    """
+    if searches is None:
+        searches = TransformationFinder.SEARCHES
+    results = {}
+
+    def record(step, function, setup=None):
+        seconds = best_time(function, repeat, setup)
+        results['%s/%s' % (name, step)] = seconds
+        if report is not None:
+            report('%s/%s' % (name, step), seconds)
+
+    words = []
+
+    def load():
+        words[:] = NormalizedWordList(BytesIO(data), None)
+    record('load', load)
+
+    def connect():
+        builder = MultiLengthRelationsBuilder()
+        for word in words:
+            builder.connect(word)
+    record('connect', connect)
+    # The builders keep the relations they computed
+    record('relations',
+           lambda builders: [builder.relations()
+                             for builder in builders.values()],
+           lambda: MultiLengthRelationsBuilder(words).builders)
+
+    def warm():
+        builders = MultiLengthRelationsBuilder(words).builders
+        for builder in builders.values():
+            builder.relations()
+        return builders
+
+    def update(builders):
+        # Remove and add back one word in a hundred in place
+        for word in words[::100]:
+            builders[len(word)].remove(word)
+        for word in words[::100]:
+            builders[len(word)].add(word)
+    record('update', update, warm)
+    builders = MultiLengthRelationsBuilder(words).builders
+    graphs = dict((length, builder.relations())
+                  for length, builder in builders.items())
+    for kind, kind_pairs in sorted(sample_pairs(graphs, pairs,
+                                                seed).items()):
+        if not kind_pairs:
+            continue
+        for search in searches:
+            record('search/%s/%s' % (kind, search),
+                   lambda: _search_all(graphs, search, kind_pairs))
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    """Compares the timings of the benchmarks with the baseline.
+
+    Returns the list of (name, baseline timing, timing, ratio) tuples of the
+    benchmarks in both, sorted by name, and the list of the names of the
+    benchmarks that are slower than the baseline by more than the threshold
+    fraction. A benchmark too fast to be timed in the baseline is only slower
+    when it can be timed.
+    """
+    comparisons = []
+    regressions = []
+    for name in sorted(set(results) & set(baseline)):
+        before, after = baseline[name], results[name]
+        if before > 0:
+            ratio = after / before
+        else:
+            ratio = float('inf') if after > 0 else 1.0
+        comparisons.append((name, before, after, ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return comparisons, regressions
+
+
+def describe_environment():
+    """Returns a dictionnary describing where the benchmarks were run."""
+    import platform
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+    }
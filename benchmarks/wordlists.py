@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Generates reproducible lists of words for the benchmarks.
+
+The synthetic lists draw each letter uniformly from an alphabet, which gives
+densely related words. The dictionary-like lists build words from syllables
+with a realistic distribution of the word lengths, which gives the sparse
+relations and the many isolated words of a real dictionary.
+"""
+
+import random
+
+# Letters starting, forming and ending a syllable of each style
+_STYLES = {
+    'english-like': (
+        ['', 'b', 'c', 'd', 'f', 'g', 'h', 'l', 'm', 'n', 'p', 'r', 's', 't',
+         'w', 'bl', 'br', 'ch', 'cl', 'dr', 'gr', 'pl', 'sh', 'st', 'th',
+         'tr'],
+        ['a', 'e', 'i', 'o', 'u', 'ea', 'ee', 'oo', 'ou', 'ai'],
+        ['', '', 'd', 'g', 'l', 'm', 'n', 'p', 'r', 's', 't', 'ck', 'ng',
+         'nt', 'st'],
+    ),
+    'french-like': (
+        [u'', u'b', u'c', u'd', u'f', u'g', u'j', u'l', u'm', u'n', u'p',
+         u'r', u's', u't', u'v', u'ch', u'cr', u'gr', u'pr', u'tr'],
+        [u'a', u'e', u'i', u'o', u'u', u'é', u'è', u'ê', u'à', u'ou', u'ai',
+         u'au', u'eau', u'oi'],
+        [u'', u'', u'', u'l', u'n', u'r', u's', u't', u'x', u'nt', u'rs'],
+    ),
+}
+
+# Relative frequency of the words of each length in a dictionary
+_LENGTHS = {2: 1, 3: 4, 4: 8, 5: 12, 6: 14, 7: 14, 8: 12, 9: 10, 10: 8,
+            11: 5, 12: 3}
+
+DICTIONARIES = sorted(_STYLES)
+
+
+def synthetic_words(count, length, alphabet='abcdef', seed=42):
+    """Returns the sorted list of distinct words drawn from count random words
+    of the given length over the letters of alphabet.
+    """
+    generator = random.Random(seed)
+    return sorted(set(u''.join(generator.choice(alphabet)
+                               for i in range(length))
+                      for j in range(count)))
+
+
+def dictionary_words(count, style='english-like', seed=42):
+    """Returns the sorted list of count distinct words looking like the words
+    of a dictionary in the given style.
+    """
+    onsets, nuclei, codas = _STYLES[style]
+    generator = random.Random(seed)
+    lengths = []
+    for length, frequency in sorted(_LENGTHS.items()):
+        lengths.extend([length] * frequency)
+    words = set()
+    # Give up on the unlikely lengths that cannot be formed
+    attempts = count * 100
+    while len(words) < count and attempts:
+        attempts -= 1
+        length = generator.choice(lengths)
+        word = u''
+        while len(word) < length:
+            word += (generator.choice(onsets) + generator.choice(nuclei) +
+                     generator.choice(codas))
+        if len(word) == length:
+            words.add(word)
+    return sorted(words)
+
+
+def encode(words):
+    """Returns the list of words as the content of a UTF-8 encoded file."""
+    return u''.join(word + u'\n' for word in words).encode('utf-8')
@@ -90,11 +90,18 @@ setup(
     ],
     entry_points={
         'console_scripts': [
+            'twanagram = tuxywords.anagram:main',
+            'twanalyze = tuxywords.analyze:main',
             'twcleanup = tuxywords.cleanup:main',
+            'twlookup = tuxywords.lookup:main',
+            'twpattern = tuxywords.pattern:main',
             'twtransform = tuxywords.transform:main',
         ],
     },
     install_requires=install_requires,
+    extras_require={
+        'numpy': ['numpy'],
+    },
     test_suite='nose.collector',
     tests_require=[
         'nose',
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import os
+import random
+import shutil
+import tempfile
+
+from io import BytesIO
+
+from tuxywords import anagram, index
+
+WORDS = [u'listen', u'silent', u'enlist', u'tinsel', u'inlets', u'list',
+         u'its', u'sit', u'tis', u'net', u'ten', u'sleet', u'été', u'tête']
+
+WORDLIST = u'\n'.join(WORDS).encode('utf-8')
+
+
+def setup_directory():
+    global directory
+    directory = tempfile.mkdtemp()
+
+
+def teardown_directory():
+    shutil.rmtree(directory)
+
+
+def can_build(word, letters):
+    letters = list(letters)
+    for letter in word:
+        if letter not in letters:
+            return False
+        letters.remove(letter)
+    return True
+
+
+def test_letters_key():
+    assert anagram.letters_key(u'listen') == u'eilnst'
+    assert anagram.letters_key(u'été') == u'téé'
+    assert anagram._successor(u'ab') == u'ac'
+
+
+def test_anagrams():
+    built = anagram.AnagramIndex.build(WORDS + [u'', u'its'])
+    assert len(built) == len(WORDS)
+    assert built.anagrams(u'silent') == [u'enlist', u'inlets', u'listen',
+                                         u'silent', u'tinsel']
+    assert built.anagrams(u'tsi') == [u'its', u'sit', u'tis']
+    assert built.anagrams(u'éét') == [u'été']
+    assert built.anagrams(u'abc') == []
+    assert built.anagrams(u'') == []
+
+
+def test_subanagrams():
+    built = anagram.AnagramIndex.build(WORDS)
+    assert built.subanagrams(u'listen') == [
+        u'enlist', u'inlets', u'listen', u'silent', u'tinsel', u'list',
+        u'its', u'net', u'sit', u'ten', u'tis']
+    assert built.subanagrams(u'listen', 4) == [
+        u'enlist', u'inlets', u'listen', u'silent', u'tinsel', u'list']
+    assert built.subanagrams(u'ééttêe') == [u'tête', u'été']
+    assert built.subanagrams(u'étêt') == []
+    assert built.subanagrams(u'tne') == [u'net', u'ten']
+    assert built.subanagrams(u'xyz') == []
+    assert built.subanagrams(u'') == []
+    assert built.visited > 0
+
+
+def test_random_subanagrams():
+    generator = random.Random(4)
+    words = set(''.join(generator.choice('abcde')
+                        for i in range(generator.randint(1, 6)))
+                for i in range(300))
+    built = anagram.AnagramIndex.build(words)
+    for i in range(30):
+        letters = ''.join(generator.choice('abcdef')
+                          for i in range(generator.randint(0, 8)))
+        expected = sorted((word for word in words if can_build(word, letters)),
+                          key=lambda word: (-len(word), word))
+        assert built.subanagrams(letters) == expected
+        assert built.anagrams(letters) == sorted(
+            word for word in words
+            if sorted(word) == sorted(letters))
+
+
+def test_save():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.an')
+        built = anagram.AnagramIndex.build(WORDS)
+        built.save(path, b'x' * 20)
+        mapped = anagram.MappedAnagramIndex(path)
+        assert mapped.checksum == b'x' * 20
+        assert list(mapped.keys) == built.keys
+        assert list(mapped.words) == built.words
+        for letters in [u'listen', u'tête', u'sit', u'abc']:
+            assert mapped.anagrams(letters) == built.anagrams(letters)
+            assert mapped.subanagrams(letters) == built.subanagrams(letters)
+        mapped.close()
+    finally:
+        teardown_directory()
+
+
+def test_open_anagram_index():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.an')
+        anagram.build_anagram_index(path, BytesIO(WORDLIST))
+        opened = anagram.open_anagram_index(path, BytesIO(WORDLIST))
+        assert opened.checksum == index.checksum(WORDLIST)
+        assert opened.anagrams(u'ent') == [u'net', u'ten']
+        opened.close()
+        wordlist = WORDLIST + b'\nnte\n'
+        opened = anagram.open_anagram_index(path, BytesIO(wordlist))
+        assert opened.checksum == index.checksum(wordlist)
+        assert opened.anagrams(u'ent') == [u'net', u'nte', u'ten']
+        opened.close()
+        with open(path, 'wb') as f:
+            f.write(b'garbage')
+        try:
+            anagram.MappedAnagramIndex(path)
+        except index.InvalidIndexError:
+            pass
+        else:
+            assert False
+        opened = anagram.open_anagram_index(path, BytesIO(WORDLIST))
+        assert len(opened) == len(WORDS)
+        opened.close()
+    finally:
+        teardown_directory()
+
+
+def test_anagram_index_stamp():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.an')
+        source = os.path.join(directory, 'words.txt')
+        with open(source, 'wb') as f:
+            f.write(WORDLIST)
+        os.utime(source, (1000, 1000))
+        with open(source, 'rb') as f:
+            anagram.build_anagram_index(path, f)
+        # The checksum detects a list rewritten with the same size and
+        # modification time
+        with open(source, 'wb') as f:
+            f.write(WORDLIST.replace(b'ten', b'nte'))
+        os.utime(source, (1000, 1000))
+        with open(source, 'rb') as f:
+            opened = anagram.open_anagram_index(path, f)
+        assert opened.anagrams(u'ent') == [u'net', u'nte']
+        opened.close()
+        # The stamp is only updated when it is trusted
+        os.utime(source, (2000, 2000))
+        for trust_stamp, mtime in [(False, 1000), (True, 2000)]:
+            with open(source, 'rb') as f:
+                opened = anagram.open_anagram_index(path, f, trust_stamp)
+            assert opened.stamp == (len(WORDLIST), mtime * 1000000000)
+            assert opened.anagrams(u'ent') == [u'net', u'nte']
+            opened.close()
+    finally:
+        teardown_directory()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+from tuxywords import analyze, transform
+
+WORDS = ['cat', 'cot', 'cog', 'dog', 'cag', 'dag', 'dot', 'emu', 'emo']
+
+
+def test_eccentricities():
+    for jobs in [1, 2]:
+        yield check_eccentricities, jobs
+
+def check_eccentricities(jobs):
+    results = sorted(analyze.eccentricities(WORDS, ['cat', 'cog', 'emu'],
+                                            jobs))
+    assert results == [('cat', 3, ['dog']), ('cog', 2, ['cat', 'dag', 'dot']),
+                       ('emu', 1, ['emo'])]
+
+
+def test_choose_sources():
+    members = [['a', 'b', 'c', 'd'], ['e', 'f'], ['g']]
+    assert analyze.choose_sources(members) == [['a', 'b', 'c', 'd'],
+                                               ['e', 'f'], []]
+    sources = analyze.choose_sources(members, sample=2, seed=1)
+    assert len(sources[0]) == 2 and set(sources[0]) <= set(members[0])
+    assert sources[1:] == [['e', 'f'], []]
+    assert sources == analyze.choose_sources(members, sample=2, seed=1)
+
+
+def test_analyze():
+    relations = transform.RelationsBuilder(WORDS + ['zzz']).lazy_relations()
+    summaries, results = analyze.analyze(relations, hardest=2)
+    assert [summary.size for summary in summaries] == [7, 2, 1]
+    assert summaries[0].diameter == 3
+    assert summaries[0].radius == 2
+    assert summaries[0].hardest == [('cag', 'dot'), ('cat', 'dog')]
+    assert summaries[1][2:] == (2, 1, 1, [('emo', 'emu')])
+    assert summaries[2][2:] == (0, 0, 0, [])
+    assert len(results) == 9
+    lines = list(analyze.describe(3, summaries))
+    assert lines[0] == 'length 3: 10 words in 3 components, 1 isolated word'
+    assert lines[1] == '  component 0: 7 words, diameter 3, radius 2'
+    assert len(lines) == 6
+
+
+def test_analyze_sample():
+    relations = transform.RelationsBuilder(WORDS).lazy_relations()
+    summaries, results = analyze.analyze(relations, sample=2)
+    assert summaries[0].sources == 2
+    assert 2 <= summaries[0].diameter <= 3
+    assert list(analyze.describe(3, summaries))[1].startswith(
+        '  component 0: 7 words, diameter at least')
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+from benchmarks import suite, wordlists
+from tuxywords import transform
+
+
+def test_synthetic_words():
+    words = wordlists.synthetic_words(50, 4, 'abc', seed=1)
+    assert words == sorted(set(words))
+    assert all(len(word) == 4 and set(word) <= set('abc') for word in words)
+    assert words == wordlists.synthetic_words(50, 4, 'abc', seed=1)
+    assert words != wordlists.synthetic_words(50, 4, 'abc', seed=2)
+
+
+def test_dictionary_words():
+    for style in wordlists.DICTIONARIES:
+        yield check_dictionary_words, style
+
+def check_dictionary_words(style):
+    words = wordlists.dictionary_words(200, style, seed=3)
+    assert len(words) == 200
+    assert words == sorted(set(words))
+    assert len(set(len(word) for word in words)) > 3
+    assert words == wordlists.dictionary_words(200, style, seed=3)
+
+
+def test_sample_pairs():
+    words = ['cat', 'cot', 'cog', 'dog', 'emu', 'ab', 'ac', 'zz']
+    builders = transform.MultiLengthRelationsBuilder(words).builders
+    graphs = dict((length, builder.relations())
+                  for length, builder in builders.items())
+    pairs = suite.sample_pairs(graphs, 10)
+    assert len(pairs['reachable']) == 10
+    for start, end in pairs['reachable']:
+        assert graphs[len(start)].get(end) is not None
+        assert transform.connected_components(
+            graphs[len(start)]).connected(start, end)
+    for start, end in pairs['unreachable']:
+        assert len(start) == len(end)
+        assert not transform.connected_components(
+            graphs[len(start)]).connected(start, end)
+    for start, end in pairs['long']:
+        if start in ['cat', 'dog']:
+            assert set([start, end]) == set(['cat', 'dog'])
+
+
+def test_run_dataset():
+    data = wordlists.encode(wordlists.synthetic_words(100, 3, 'abc'))
+    results = suite.run_dataset('tiny', data, repeat=1, pairs=2,
+                                searches=['astar'])
+    assert 'tiny/load' in results
+    assert 'tiny/relations' in results
+    assert 'tiny/search/reachable/astar' in results
+    assert all(seconds >= 0 for seconds in results.values())
+
+
+def test_compare():
+    baseline = {'a': 1.0, 'b': 2.0, 'c': 1.0, 'e': 0.0, 'f': 0.0}
+    results = {'a': 1.05, 'b': 3.0, 'd': 1.0, 'e': 0.0, 'f': 0.5}
+    comparisons, regressions = suite.compare(results, baseline, 0.1)
+    assert [name for name, before, after, ratio in comparisons] == [
+        'a', 'b', 'e', 'f']
+    assert comparisons[2] == ('e', 0.0, 0.0, 1.0)
+    assert regressions == ['b', 'f']
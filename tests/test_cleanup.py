@@ -22,7 +22,11 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
-from tuxywords import cleanup
+import codecs
+
+from io import BytesIO
+
+from tuxywords import cleanup, rules
 
 
 def test_is_valid():
@@ -44,3 +48,72 @@ def check_is_valid(word):
 
 def check_is_invalid(word):
     assert not cleanup.is_valid(word)
+
+
+WORDLIST = u"""abba
+Altux
+épée
+ it's
+hELLO  
+
+TuxyMAT
+foo\r
+bar""".encode('utf-8')
+
+
+def serial_cleanup(wordlist):
+    words = (word.strip()
+             for word in codecs.iterdecode(BytesIO(wordlist), 'utf-8'))
+    return u''.join(word + u'\n' for word in words if cleanup.is_valid(word))
+
+
+def test_iter_cleaned():
+    expected = serial_cleanup(WORDLIST)
+    assert expected == u'abba\népée\nhELLO\n\nfoo\nbar\n'
+    for jobs in [1, 2]:
+        for chunk_size in [1, 7, 1024]:
+            yield check_iter_cleaned, WORDLIST, jobs, chunk_size, expected
+    yield check_iter_cleaned, WORDLIST + b'\n', 2, 5, expected
+
+def check_iter_cleaned(wordlist, jobs, chunk_size, expected):
+    cleaned = cleanup.iter_cleaned(BytesIO(wordlist), jobs, chunk_size)
+    assert u''.join(cleaned) == expected
+
+
+def test_default_rules():
+    clean = rules.compile_rules()
+    words = [u'abba', u'épée', u'hELLO', u'FOOBAR', u'Épée', u"it's", u'']
+    assert clean(words) == [word for word in words if cleanup.is_valid(word)]
+
+
+def test_rules():
+    words = [u' abc ', u'Abc', u"a'b", u'abcdef', u'a-b', u'a1', u'éa', u'',
+             u'x']
+    yield check_rules, [rules.length_range(2, 4)], words, [
+        u'abc', u'Abc', u"a'b", u'a-b', u'a1', u'éa']
+    yield check_rules, [rules.length_range(maximum=1)], words, [u'', u'x']
+    yield check_rules, [rules.characters(['alpha'])], words, [
+        u'abc', u'Abc', u'abcdef', u'éa', u'', u'x']
+    yield check_rules, [rules.characters(['ascii'], u'é')], words, words[:]
+    yield check_rules, [rules.characters(extra=u'ab-')], words, [u'a-b', u'']
+    yield check_rules, [rules.matching(u'[a-z]+')], words, [
+        u'abc', u'abcdef', u'x']
+    yield check_rules, rules.DEFAULT_RULES + (rules.length_range(1),), words, [
+        u'abc', u'abcdef', u'a-b', u'a1', u'éa', u'x']
+
+def check_rules(selected, words, expected):
+    expected = [word.strip() for word in expected]
+    assert rules.compile_rules(selected)(words) == expected
+
+
+def test_lowercase_unique():
+    wordlist = u'abc\nAbc\n ABC\nabc\ndéf\nDÉF\n'.encode('utf-8')
+    for jobs in [1, 2]:
+        yield check_lowercase_unique, wordlist, jobs
+
+def check_lowercase_unique(wordlist, jobs):
+    cleaned = cleanup.iter_cleaned(BytesIO(wordlist), jobs, 6, rules=(),
+                                   lowercase=True, unique=True)
+    assert u''.join(cleaned) == u'abc\ndéf\n'
+    cleaned = cleanup.iter_cleaned(BytesIO(wordlist), jobs, 6, unique=True)
+    assert u''.join(cleaned) == u'abc\ndéf\n'
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import tempfile
+
+from io import BytesIO
+
+from tuxywords import index, transform
+
+WORDLIST = u'\n'.join([
+    u'ab', u'ac', u'bc', u'dd',
+    u'cat', u'cot', u'cog', u'dog', u'épée', u'épie', u'',
+]).encode('utf-8')
+
+
+def setup_directory():
+    global directory
+    directory = tempfile.mkdtemp()
+
+
+def teardown_directory():
+    shutil.rmtree(directory)
+
+
+def check_relations(path, length):
+    words = index.words_by_length(WORDLIST)[length]
+    expected_relations = transform.RelationsBuilder(words).relations()
+    relations = index.WordIndex(path).relations(length)
+    assert set(relations) == set(expected_relations)
+    for word in expected_relations:
+        assert relations[word] == expected_relations[word]
+    expected = transform.connected_components(expected_relations)
+    components = relations.components()
+    assert components.sizes() == expected.sizes()
+    for word in words:
+        assert components[word] == expected[word]
+    assert components.get(u'zzz') is None
+    for word in words:
+        related = set([word])
+        for key, bucket in relations.buckets(word):
+            assert word in bucket
+            related.update(bucket)
+        assert related == expected_relations[word]
+    builder = transform.RelationsBuilder(words)
+    for word in words:
+        for partition in builder.letter_partitions(word):
+            assert relations.partition_words(partition) == (
+                builder.partition_words(partition))
+    assert list(relations.buckets(u'zzz')) == []
+    assert relations.partition_words((u'z', u'z' * (length - 2))) == set()
+    assert relations.partition_words((u'', u'z' * length)) == set()
+
+
+def test_relations():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.idx')
+        index.build_index(path, BytesIO(WORDLIST))
+        assert index.WordIndex(path).lengths() == [2, 3, 4]
+        for length in [2, 3, 4]:
+            check_relations(path, length)
+        relations = index.WordIndex(path).relations(3)
+        assert u'cog' in relations
+        assert u'cut' not in relations
+        assert relations[u'cut'] == set()
+        assert index.WordIndex(path).relations(5) == {}
+    finally:
+        teardown_directory()
+
+
+def test_stale_index():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.idx')
+        index.build_index(path, BytesIO(WORDLIST))
+        wordlist = WORDLIST + b'\ncut\n'
+        assert index.WordIndex(path).checksum != index.checksum(wordlist)
+        relations = index.open_index(path, BytesIO(wordlist)).relations(3)
+        assert relations[u'cut'] == set([u'cat', u'cot', u'cut'])
+        assert index.WordIndex(path).checksum == index.checksum(wordlist)
+    finally:
+        teardown_directory()
+
+
+def test_parallel_index():
+    setup_directory()
+    try:
+        paths = [os.path.join(directory, name)
+                 for name in ['serial.idx', 'parallel.idx']]
+        index.build_index(paths[0], BytesIO(WORDLIST))
+        index.build_index(paths[1], BytesIO(WORDLIST), jobs=2)
+        contents = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                contents.append(f.read())
+        assert contents[0] == contents[1]
+    finally:
+        teardown_directory()
+
+
+def test_unchanged_stamp():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.idx')
+        source = os.path.join(directory, 'words.txt')
+        with open(source, 'wb') as f:
+            f.write(WORDLIST)
+        os.utime(source, (1000, 1000))
+        with open(source, 'rb') as f:
+            index.build_index(path, f)
+        assert index.WordIndex(path).stamp == (len(WORDLIST), 1000000000000)
+        # The checksum detects a list rewritten with the same size and
+        # modification time
+        with open(source, 'wb') as f:
+            f.write(WORDLIST.replace(b'cog', b'cut'))
+        os.utime(source, (1000, 1000))
+        with open(source, 'rb') as f:
+            opened = index.open_index(path, f)
+        assert u'cut' in opened.relations(3)
+        opened.close()
+        # Only the stamp is updated when the words did not change and the
+        # stamp is trusted
+        os.utime(source, (2000, 2000))
+        with open(source, 'rb') as f:
+            opened = index.open_index(path, f)
+        assert opened.stamp == (len(WORDLIST), 1000000000000)
+        opened.close()
+        with open(source, 'rb') as f:
+            opened = index.open_index(path, f, trust_stamp=True)
+        assert opened.stamp == (len(WORDLIST), 2000000000000)
+        assert u'cut' in opened.relations(3)
+        opened.close()
+        assert not os.path.exists(path + '.tmp')
+        # The list is then not read
+        checksum = index.checksum
+        index.checksum = None
+        try:
+            with open(source, 'rb') as f:
+                opened = index.open_index(path, f, trust_stamp=True)
+        finally:
+            index.checksum = checksum
+        assert u'cut' in opened.relations(3)
+        opened.close()
+    finally:
+        teardown_directory()
+
+
+def test_apply_delta():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.idx')
+        index.build_index(path, BytesIO(WORDLIST))
+        before = index.WordIndex(path)
+        two = before.section(2)
+        checksum = before.checksum
+        before.close()
+        index.apply_delta(path, added=[u'cut', u'hat'],
+                          removed=[u'cog', u'épie'])
+        after = index.WordIndex(path)
+        assert after.checksum == checksum
+        assert after.lengths() == [2, 3, 4]
+        # The section of the unchanged length is copied
+        assert after.section(2) == two
+        relations = after.relations(3)
+        assert set(relations) == set([u'cat', u'cot', u'cut', u'dog',
+                                      u'hat'])
+        assert relations[u'cat'] == set([u'cat', u'cot', u'cut', u'hat'])
+        assert relations[u'dog'] == set([u'dog'])
+        assert set(after.relations(4)) == set([u'épée'])
+        after.close()
+        index.apply_delta(path, removed=[u'épée'], digest=b'x' * 20)
+        after = index.WordIndex(path)
+        assert after.lengths() == [2, 3]
+        assert after.checksum == b'x' * 20
+        after.close()
+    finally:
+        teardown_directory()
+
+
+def test_stale_index_delta():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.idx')
+        index.build_index(path, BytesIO(WORDLIST))
+        two = index.WordIndex(path).section(2)
+        wordlist = WORDLIST.replace(b'cog', b'cut') + b'\nabcde\n'
+        opened = index.open_index(path, BytesIO(wordlist))
+        assert opened.checksum == index.checksum(wordlist)
+        assert opened.lengths() == [2, 3, 4, 5]
+        assert opened.section(2) == two
+        for length in [2, 3, 4, 5]:
+            expected = transform.RelationsBuilder(
+                index.words_by_length(wordlist)[length]).relations()
+            relations = opened.relations(length)
+            assert set(relations) == set(expected)
+            for word in expected:
+                assert relations[word] == expected[word]
+    finally:
+        teardown_directory()
+
+
+def test_invalid_index():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.idx')
+        with open(path, 'wb') as f:
+            f.write(b'garbage')
+        try:
+            index.WordIndex(path)
+        except index.InvalidIndexError:
+            pass
+        else:
+            assert False
+        relations = index.open_index(path, BytesIO(WORDLIST)).relations(2)
+        assert relations[u'ac'] == set([u'ab', u'ac', u'bc'])
+    finally:
+        teardown_directory()
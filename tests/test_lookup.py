@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import os
+import random
+import shutil
+import tempfile
+
+from io import BytesIO
+
+from tuxywords import index, lookup
+
+WORDLIST = u'\n'.join([
+    u'cat', u'cot', u'coat', u'boat', u'bat', u'at', u'beat', u'beast',
+    u'international', u'internationally', u'interaction', u'épée', u'épie',
+]).encode('utf-8')
+
+
+def setup_directory():
+    global directory
+    directory = tempfile.mkdtemp()
+
+
+def teardown_directory():
+    shutil.rmtree(directory)
+
+
+def reference_distance(a, b):
+    previous = list(range(len(a) + 1))
+    for j, y in enumerate(b, 1):
+        current = [j]
+        for i, x in enumerate(a, 1):
+            current.append(min(previous[i] + 1, current[i - 1] + 1,
+                               previous[i - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+def random_words(count, alphabet='abc', seed=42):
+    generator = random.Random(seed)
+    return [''.join(generator.choice(alphabet)
+                    for i in range(generator.randint(1, 9)))
+            for i in range(count)]
+
+
+def test_deletions():
+    assert lookup.deletions('cat', 0) == set(['cat'])
+    assert lookup.deletions('cat', 1) == set(['cat', 'at', 'ct', 'ca'])
+    assert lookup.deletions('cat', 2) == set(['cat', 'at', 'ct', 'ca', 'a',
+                                              'c', 't'])
+    assert lookup.deletions('aab', 1) == set(['aab', 'ab', 'aa'])
+    assert lookup.deletions('', 2) == set([''])
+
+
+def test_edit_distance():
+    words = random_words(60, seed=1) + ['']
+    for a in words:
+        for b in words:
+            expected = reference_distance(a, b)
+            assert lookup.edit_distance(a, b) == expected
+            for limit in [0, 1, 2]:
+                assert lookup.edit_distance(a, b, limit) == min(expected,
+                                                                limit + 1)
+    assert lookup.edit_distance(u'épée', u'épie') == 1
+
+
+def test_hamming_distance():
+    assert lookup.hamming_distance('cat', 'cot') == 1
+    assert lookup.hamming_distance('cat', 'dog') == 3
+    assert lookup.hamming_distance('cat', 'dog', 1) == 2
+    assert lookup.hamming_distance('cat', 'coat', 1) == 2
+
+
+def test_lookup():
+    words = random_words(300)
+    queries = random_words(20, 'abcd', seed=2)
+    for prefix_length in [3, 7]:
+        built = lookup.LookupIndex.build(words, 2, prefix_length)
+        for query in queries:
+            for distance in [0, 1, 2]:
+                yield check_lookup, built, words, query, distance
+
+def check_lookup(built, words, query, distance):
+    expected = sorted((reference_distance(query, word), word)
+                      for word in set(words)
+                      if reference_distance(query, word) <= distance)
+    assert built.lookup(query, distance) == expected
+    expected = sorted((lookup.hamming_distance(query, word), word)
+                      for word in set(words) if len(word) == len(query) and
+                      lookup.hamming_distance(query, word) <= distance)
+    assert built.lookup(query, distance, hamming=True) == expected
+
+
+def test_lookup_index():
+    built = lookup.LookupIndex.build(['cat', 'cot', 'coat', 'cat', 'dog'], 1)
+    assert len(built) == 4
+    assert 'cot' in built and 'cut' not in built
+    assert built.lookup('cut') == [(1, 'cat'), (1, 'cot')]
+    assert built.lookup('cut', hamming=True) == [(1, 'cat'), (1, 'cot')]
+    assert built.lookup('cat', 0) == [(0, 'cat')]
+    assert built.candidates > 0
+    for distance in [-1, 2]:
+        try:
+            built.lookup('cat', distance)
+        except ValueError:
+            pass
+        else:
+            assert False
+    try:
+        lookup.LookupIndex.build(['cat'], 2, 2)
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_save():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.lk')
+        words = random_words(200, 'abcé')
+        built = lookup.LookupIndex.build(words, 2, 4)
+        built.save(path, b'x' * 20)
+        mapped = lookup.MappedLookupIndex(path)
+        assert mapped.checksum == b'x' * 20
+        assert (mapped.max_distance, mapped.prefix_length) == (2, 4)
+        assert list(mapped.words) == built.words
+        assert mapped.words[-1] == built.words[-1]
+        for query in random_words(20, 'abcé', seed=3):
+            assert mapped.lookup(query, 2) == built.lookup(query, 2)
+            assert words[0] in mapped
+            assert query in mapped or query not in built
+        mapped.close()
+    finally:
+        teardown_directory()
+
+
+def test_open_lookup_index():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.lk')
+        lookup.build_lookup_index(path, BytesIO(WORDLIST))
+        opened = lookup.open_lookup_index(path, BytesIO(WORDLIST))
+        assert opened.checksum == index.checksum(WORDLIST)
+        assert opened.lookup(u'internationaly') == [
+            (1, u'international'), (1, u'internationally')]
+        assert opened.lookup(u'epée', 1) == [(1, u'épée')]
+        opened.close()
+        # The index is built again when its parameters change
+        opened = lookup.open_lookup_index(path, BytesIO(WORDLIST), 1, 5)
+        assert (opened.max_distance, opened.prefix_length) == (1, 5)
+        opened.close()
+        # Or when the list of words changes
+        wordlist = WORDLIST + b'\ncut\n'
+        opened = lookup.open_lookup_index(path, BytesIO(wordlist), 1, 5)
+        assert opened.checksum == index.checksum(wordlist)
+        assert opened.lookup(u'cit') == [(1, u'cat'), (1, u'cot'),
+                                         (1, u'cut')]
+        opened.close()
+    finally:
+        teardown_directory()
+
+
+def test_lookup_index_stamp():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.lk')
+        source = os.path.join(directory, 'words.txt')
+        with open(source, 'wb') as f:
+            f.write(WORDLIST)
+        os.utime(source, (1000, 1000))
+        with open(source, 'rb') as f:
+            lookup.build_lookup_index(path, f)
+        # The checksum detects a list rewritten with the same size and
+        # modification time
+        with open(source, 'wb') as f:
+            f.write(WORDLIST.replace(b'cot', b'cut'))
+        os.utime(source, (1000, 1000))
+        with open(source, 'rb') as f:
+            opened = lookup.open_lookup_index(path, f)
+        assert u'cut' in opened
+        opened.close()
+        # The stamp is only updated when it is trusted
+        os.utime(source, (2000, 2000))
+        for trust_stamp, mtime in [(False, 1000), (True, 2000)]:
+            with open(source, 'rb') as f:
+                opened = lookup.open_lookup_index(path, f,
+                                                  trust_stamp=trust_stamp)
+            assert opened.stamp == (len(WORDLIST), mtime * 1000000000)
+            assert u'cut' in opened
+            opened.close()
+    finally:
+        teardown_directory()
+
+
+def test_invalid_lookup_index():
+    setup_directory()
+    try:
+        path = os.path.join(directory, 'words.lk')
+        for content in [b'', b'garbage', b'TWIX' + b'\0' * 60]:
+            with open(path, 'wb') as f:
+                f.write(content)
+            try:
+                lookup.MappedLookupIndex(path)
+            except index.InvalidIndexError:
+                pass
+            else:
+                assert False
+        opened = lookup.open_lookup_index(path, BytesIO(WORDLIST))
+        assert u'beast' in opened
+        opened.close()
+    finally:
+        teardown_directory()
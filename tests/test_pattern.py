@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import os
+import random
+import re
+import shutil
+import tempfile
+
+from io import BytesIO
+
+from tuxywords import index, pattern, transform
+
+WORDS = ['cat', 'cot', 'cut', 'coat', 'boat', 'beat', 'best', 'at', 'a']
+
+
+def test_bitsets():
+    assert pattern._bitset([]) == 0
+    assert pattern._bitset([0, 3, 9]) == 0b1000001001
+    assert list(pattern._members(0)) == []
+    assert list(pattern._members(0b1000001001)) == [0, 3, 9]
+    members = random.Random(1).sample(range(1000), 100)
+    assert list(pattern._members(pattern._bitset(members))) == sorted(
+        members)
+
+
+def test_partition_words():
+    builder = transform.RelationsBuilder(['cat', 'cot', 'dog'])
+    assert builder.partition_words(('c', 't')) == set(['cat', 'cot'])
+    assert builder.partition_words(('x', 't')) == set()
+    assert sorted(builder) == ['cat', 'cot', 'dog']
+
+
+def test_match():
+    index = pattern.PatternIndex(WORDS)
+    assert index.match('c?t') == ['cat', 'cot', 'cut']
+    assert index.match('?') == ['a']
+    assert index.match('b??t') == ['beat', 'best', 'boat']
+    assert index.match('????') == ['beat', 'best', 'boat', 'coat']
+    assert index.match('?o?') == ['cot']
+    assert index.match('?x?') == []
+    assert index.match('cat') == ['cat']
+    assert index.match('dog') == []
+    assert index.match('?????') == []
+    assert index.match('') == []
+    assert (index.partition_queries, index.bitset_queries) == (2, 5)
+    index = pattern.PatternIndex(WORDS, wildcard='.')
+    assert index.match('c.t') == ['cat', 'cot', 'cut']
+    assert index.match('c??') == []
+
+
+def test_update():
+    index = pattern.PatternIndex(WORDS)
+    index.update(['cab', 'coat'])
+    assert index.match('ca?') == ['cab', 'cat']
+    assert index.match('c??') == ['cab', 'cat', 'cot', 'cut']
+    assert index.match('co??') == ['coat']
+
+
+def test_update_bitsets():
+    index = pattern.PatternIndex(['bat', 'cat'])
+    assert index.match('??t') == ['bat', 'cat']
+    letters = index._letters[3]
+    # The added words sort after the others, only their bits are set
+    index.update(['cot', 'dog', 'cat'])
+    assert index._letters[3] is letters
+    assert index.words[3] == ['bat', 'cat', 'cot', 'dog']
+    assert index.match('c?t') == ['cat', 'cot']
+    assert index.match('??t') == ['bat', 'cat', 'cot']
+    assert index.match('?o?') == ['cot', 'dog']
+    # The identifiers shift, the bitsets are computed again
+    index.update(['bot'])
+    assert 3 not in index._letters
+    assert index.match('?o?') == ['bot', 'cot', 'dog']
+    assert index._letters[3] is not letters
+    # The bitsets of the lengths without multiple wildcards are not computed
+    index.update(['boat'])
+    assert 4 not in index._letters
+    assert index.match('b??t') == ['boat']
+
+
+def test_source():
+    builder = transform.MultiLengthRelationsBuilder(WORDS)
+    index = pattern.PatternIndex(source=builder)
+    assert index.source is builder
+    assert index.match('c?t') == ['cat', 'cot', 'cut']
+    assert index.match('b??t') == ['beat', 'best', 'boat']
+    index.update(['cab'])
+    assert 'cab' in builder[3]
+    builder = transform.MultiLengthRelationsBuilder(lengths=[3])
+    index = pattern.PatternIndex(WORDS, source=builder)
+    assert index.match('c?t') == ['cat', 'cot', 'cut']
+    assert index.match('b??t') == []
+    assert 'coat' not in index
+
+
+def test_index_source():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'words.idx')
+        wordlist = u'\n'.join(WORDS + [u'épée', u'épie']).encode('utf-8')
+        index.build_index(path, BytesIO(wordlist))
+        expected = pattern.PatternIndex(WORDS + [u'épée', u'épie'])
+        indexed = pattern.PatternIndex(source=index.WordIndex(path))
+        for query in [u'c?t', u'?', u'b??t', u'????', u'?o?', u'?x?', u'cat',
+                      u'dog', u'?????', u'', u'ép?e', u'é??e', u'?at']:
+            assert indexed.match(query) == expected.match(query)
+        try:
+            indexed.update([u'cab'])
+        except TypeError:
+            pass
+        else:
+            assert False, 'the words of an index were updated'
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_random_patterns():
+    generator = random.Random(3)
+    words = set(''.join(generator.choice('abc')
+                        for i in range(generator.randint(1, 5)))
+                for i in range(200))
+    index = pattern.PatternIndex(words)
+    for i in range(50):
+        query = ''.join(generator.choice('abc??')
+                        for i in range(generator.randint(1, 5)))
+        expression = re.compile(query.replace('?', '.') + '$')
+        assert index.match(query) == sorted(word for word in words
+                                            if expression.match(word))
+
+
+def test_random_updates():
+    generator = random.Random(5)
+    words = set()
+    index = pattern.PatternIndex()
+    for i in range(20):
+        added = set(''.join(generator.choice('abc')
+                            for i in range(generator.randint(1, 4)))
+                    for i in range(generator.randint(1, 10)))
+        index.update(added)
+        words |= added
+        query = ''.join(generator.choice('abc??')
+                        for i in range(generator.randint(1, 4)))
+        expression = re.compile(query.replace('?', '.') + '$')
+        assert index.match(query) == sorted(word for word in words
+                                            if expression.match(word))
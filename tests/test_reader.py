@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import tempfile
+
+from io import BytesIO
+
+from tuxywords import reader
+
+
+def test_iter_buffer_blocks():
+    yield check_iter_buffer_blocks, b'', []
+    yield check_iter_buffer_blocks, b'ab\ncd\n', [b'ab\n', b'cd\n']
+    yield check_iter_buffer_blocks, b'ab\ncd', [b'ab\n', b'cd']
+    yield (check_iter_buffer_blocks, b'abcdefgh\nij\n',
+           [b'abcdefgh\n', b'ij\n'])
+    yield check_iter_buffer_blocks, b'a\nb\nc\nd', [b'a\n', b'b\n', b'c\nd']
+
+def check_iter_buffer_blocks(data, blocks):
+    assert list(reader.iter_buffer_blocks(data, 3)) == blocks
+    # Streams are cut the same way
+    assert b''.join(reader.iter_blocks(BytesIO(data), 3)) == data
+
+
+def test_iter_lines():
+    data = b'ab\n\n cd \r\nef'
+    lines = [b'ab', b'', b' cd \r', b'ef']
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'words.txt')
+        with open(path, 'wb') as f:
+            f.write(data)
+        with open(path, 'rb') as f:
+            assert reader.map_file(f) is not None
+            assert list(reader.iter_lines(f, 4)) == lines
+        with open(path, 'wb') as f:
+            pass
+        with open(path, 'rb') as f:
+            assert reader.map_file(f) is None
+            assert list(reader.iter_lines(f)) == []
+    finally:
+        shutil.rmtree(directory)
+    assert reader.map_file(BytesIO(data)) is None
+    assert list(reader.iter_lines(BytesIO(data), 4)) == lines
+    assert list(reader.iter_lines(BytesIO(data + b'\n'))) == lines
+
+
+def test_read_all():
+    data = b'ab\ncd\n'
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'words.txt')
+        with open(path, 'wb') as f:
+            f.write(data)
+        with open(path, 'rb') as f:
+            with reader.read_all(f) as content:
+                assert content[:] == data
+            # The memory map is closed with the context
+            assert content.closed
+            status = os.fstat(f.fileno())
+            assert reader.file_stamp(f)[0] == len(data)
+        os.utime(path, (status.st_atime, 1000))
+        with open(path, 'rb') as f:
+            assert reader.file_stamp(f) == (len(data), 1000000000000)
+    finally:
+        shutil.rmtree(directory)
+    with reader.read_all(BytesIO(data)) as content:
+        assert content == data
+    assert reader.file_stamp(BytesIO(data)) is None
+
+
+def test_iter_words():
+    lines = [u' épée'.encode('utf-8'), b'ab\r', b'abc']
+    assert list(reader.iter_words(lines)) == [u'épée', u'ab', u'abc']
+    accept = lambda line: len(line) < 4
+    assert list(reader.iter_words(lines, accept)) == [u'ab', u'abc']
+
+
+def test_length_filter():
+    accept = reader.length_filter([2, 3])
+    yield check_length_filter, accept, b'a', False
+    yield check_length_filter, accept, b'ab', True
+    yield check_length_filter, accept, u'éé'.encode('utf-8'), True
+    yield check_length_filter, accept, b'abcdefghijklm', False
+    yield check_length_filter, accept, b'  ab         \r', True
+    yield check_length_filter, accept, u'　ab　'.encode('utf-8'), True
+    yield check_length_filter, accept, u'ab　cdefghijkl'.encode('utf-8'), \
+        False
+
+def check_length_filter(accept, line, accepted):
+    assert accept(line) == accepted
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from tuxywords import server
+
+
+def write_words(path, words):
+    with open(path, 'wb') as f:
+        f.write(u'\n'.join(words).encode('utf-8'))
+
+
+def check_answer(service, query, answer):
+    assert service.answer(query) == answer
+
+
+def test_service():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'words.txt')
+        write_words(path, [u'cat', u'cot', u'cog', u'dog', u'ab', u'ac'])
+        service = server.TransformationService(path, cache_size=10)
+        check_answer(service, {'from': u'cat', 'to': u'dog'},
+                     {'transformation': [u'cat', u'cot', u'cog', u'dog']})
+        check_answer(service, {'from': u'cat', 'to': u'dog'},
+                     {'transformation': [u'cat', u'cot', u'cog', u'dog']})
+        check_answer(service, {'stats': True}, {'stats': {'3': {
+            'hits': 1, 'misses': 1, 'maxsize': 10, 'currsize': 1,
+        }}})
+        check_answer(service, {'from': u'ab', 'to': u'ac'},
+                     {'transformation': [u'ab', u'ac']})
+        check_answer(service, {'from': u'cat', 'to': u'emu'},
+                     {'error': "'emu' is not in the list of words"})
+        check_answer(service, {'from': u'cat'},
+                     {'error': 'a query must contain "from" and "to"'})
+        check_answer(service, {'from': 1, 'to': u'cat'},
+                     {'error': '"from" and "to" must be strings'})
+        check_answer(service, {'from': u'cat', 'to': [u'dog']},
+                     {'error': '"from" and "to" must be strings'})
+        assert not service.reload_if_changed()
+        write_words(path, [u'cat', u'cot', u'cog', u'dog', u'emu', u'ema',
+                           u'dma'])
+        assert service.reload_if_changed()
+        check_answer(service, {'from': u'cat', 'to': u'emu'},
+                     {'error': "no transformation is possible from 'cat' to "
+                               "'emu'"})
+        check_answer(service, {'from': u'ab', 'to': u'ac'},
+                     {'error': "'ab' is not in the list of words"})
+    finally:
+        shutil.rmtree(directory)
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_watch_errors():
+    directory = tempfile.mkdtemp()
+    handler = RecordingHandler()
+    server._logger.addHandler(handler)
+    stopped = threading.Event()
+    try:
+        path = os.path.join(directory, 'words.txt')
+        write_words(path, [u'cat', u'cot'])
+        service = server.TransformationService(path)
+        watcher = threading.Thread(target=server.watch,
+                                   args=(service, 0.01, stopped))
+        watcher.daemon = True
+        watcher.start()
+        # Invalid UTF-8
+        with open(path, 'wb') as f:
+            f.write(b'cat\ncot\n\xff\xfe\n')
+        wait_until(lambda: handler.records)
+        assert u'cot' in service.relations(3)
+        write_words(path, [u'cat', u'cot', u'cog', u'dog'])
+        wait_until(lambda: u'dog' in service.relations(3))
+        assert watcher.is_alive()
+        assert len(handler.records) == 1
+        assert handler.records[0].exc_info[0] is UnicodeDecodeError
+    finally:
+        stopped.set()
+        server._logger.removeHandler(handler)
+        shutil.rmtree(directory)
+
+
+def test_reload_errors():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'words.txt')
+        write_words(path, [u'cat', u'cot'])
+        service = server.TransformationService(path)
+        with open(path, 'wb') as f:
+            f.write(b'cat\ncot\n\xff\xfe\n')
+        try:
+            service.reload_if_changed()
+        except UnicodeDecodeError:
+            pass
+        else:
+            assert False, 'an invalid list of words was loaded'
+        # The same version of the list is not loaded again
+        assert not service.reload_if_changed()
+        assert u'cot' in service.relations(3)
+        write_words(path, [u'cat', u'cot', u'cog'])
+        assert service.reload_if_changed()
+        assert u'cog' in service.relations(3)
+    finally:
+        shutil.rmtree(directory)
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def run_server(instance):
+    thread = threading.Thread(target=instance.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def test_tcp_server():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'words.txt')
+        write_words(path, [u'cat', u'cot', u'cog', u'dog'])
+        service = server.TransformationService(path)
+        instance = server.TCPServer(('127.0.0.1', 0), service)
+        try:
+            run_server(instance)
+            address = instance.server_address
+            assert server.query(address, u'cat', u'dog') == {
+                'transformation': [u'cat', u'cot', u'cog', u'dog'],
+            }
+            assert 'error' in server.query(address, u'cat', u'do')
+        finally:
+            instance.shutdown()
+            instance.server_close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_unix_server():
+    if not hasattr(server, 'UnixServer'):
+        return
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'words.txt')
+        write_words(path, [u'cat', u'cot', u'cog', u'dog'])
+        service = server.TransformationService(path, graph='compact')
+        address = os.path.join(directory, 'socket')
+        instance = server.UnixServer(address, service)
+        try:
+            run_server(instance)
+            assert server.query(address, u'dog', u'cot') == {
+                'transformation': [u'dog', u'cog', u'cot'],
+            }
+        finally:
+            instance.shutdown()
+            instance.server_close()
+    finally:
+        shutil.rmtree(directory)
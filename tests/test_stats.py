@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import json
+import os
+import pstats
+import shutil
+import tempfile
+
+from io import StringIO
+
+from tuxywords import stats
+
+
+def test_phases_and_counters():
+    collected = stats.Stats()
+    with collected.phase('first'):
+        pass
+    try:
+        with collected.phase('second'):
+            raise ValueError()
+    except ValueError:
+        pass
+    collected.count('words')
+    collected.count('words', 2)
+    collected.set('sizes', {2: 1, 10: 3})
+    collected.set('names', {3: 'cat'})
+    collected.count('sizes', {2: 1, 3: 1})
+    collected.update('names', {4: 'emus'})
+    assert [phase['name'] for phase in collected.phases] == ['first',
+                                                             'second']
+    assert all(phase['seconds'] >= 0 for phase in collected.phases)
+    assert collected.counters == {'words': 3,
+                                  'sizes': {2: 2, 3: 1, 10: 3},
+                                  'names': {3: 'cat', 4: 'emus'}}
+    lines = list(collected.report())
+    assert lines[0].startswith('phase first')
+    assert lines[2:] == ['names:', '  3        cat', '  4        emus',
+                         'sizes:', '  2        2', '  3        1',
+                         '  10       3', 'words: 3']
+
+
+def test_trace_memory():
+    collected = stats.Stats(trace_memory=True)
+    with collected.phase('allocate'):
+        allocated = bytearray(8 << 20)
+        del allocated
+    with collected.phase('idle'):
+        pass
+    allocate, idle = collected.phases
+    if stats.tracemalloc is None:
+        assert 'peak_memory' not in allocate
+        return
+    assert allocate['peak_memory'] >= 8 << 20
+    assert idle['peak_memory'] < 1 << 20
+    assert ' MiB peak' in next(collected.report())
+    assert not stats.tracemalloc.is_tracing()
+    collected = stats.Stats()
+    with collected.phase('allocate'):
+        pass
+    assert 'peak_memory' not in collected.phases[0]
+    assert ' MiB peak' not in next(collected.report())
+
+
+def test_null_stats():
+    ignored = stats.NullStats()
+    with ignored.phase('first'):
+        ignored.count('words')
+        ignored.set('sizes', {})
+        ignored.count('sizes', {2: 1})
+        ignored.update('names', {3: 'cat'})
+    assert not ignored.enabled
+    assert ignored.record() == {'phases': [], 'counters': {}}
+
+
+def test_write():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'stats.json')
+        collected = stats.Stats()
+        with collected.phase('first'):
+            collected.set('sizes', {2: 1})
+        stream = StringIO()
+        collected.write(stream, path)
+        assert stream.getvalue().startswith(u'phase first')
+        with open(path) as f:
+            record = json.load(f)
+        assert record['phases'][0]['name'] == 'first'
+        assert record['counters'] == {'sizes': {'2': 1}}
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_profiled():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'profile')
+        with stats.profiled(path):
+            sorted(range(100))
+        assert pstats.Stats(path).total_calls > 0
+        with stats.profiled(None):
+            pass
+    finally:
+        shutil.rmtree(directory)
@@ -22,7 +22,14 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
-from tuxywords import transform
+import os
+import random
+import tempfile
+import threading
+
+from io import BytesIO
+
+from tuxywords import stats, transform
 
 
 def test_partitions():
@@ -64,6 +71,222 @@ def test_relations():
 def check_relations(wordlist, relations):
     builder = transform.RelationsBuilder(wordlist)
     assert builder.relations() == relations
+    for cache_size in [0, 2]:
+        lazy_relations = builder.lazy_relations(cache_size)
+        assert set(lazy_relations) == set(relations)
+        assert len(lazy_relations) == len(relations)
+        for word in relations:
+            assert word in lazy_relations
+            assert lazy_relations[word] == relations[word]
+            assert lazy_relations[word] == relations[word]
+    compact = builder.compact()
+    assert list(compact) == sorted(relations)
+    assert len(compact.offsets) == len(relations) + 1
+    for word in relations:
+        assert word in compact
+        assert compact[word] == relations[word]
+
+
+def test_parallel_relations():
+    words = random_words(300, 4, 'abcdef') + random_words(100, 3, 'abcdef')
+    builders = transform.MultiLengthRelationsBuilder(words).builders
+    expected_stats = stats.Stats()
+    transform._count_partitions(builders, expected_stats)
+    for jobs in [1, 3]:
+        collected = stats.Stats()
+        graphs = transform.load_relations(words, None, 'compact', jobs=jobs,
+                                          stats=collected)
+        assert sorted(graphs) == [3, 4]
+        for length in [3, 4]:
+            expected = builders[length].compact()
+            assert graphs[length].words == expected.words
+            assert graphs[length].offsets == expected.offsets
+            assert graphs[length].neighbors == expected.neighbors
+        assert collected.counters == expected_stats.counters
+    graphs = transform.load_relations(words + words, [4], 'compact', jobs=2)
+    assert sorted(graphs) == [4]
+    assert graphs[4].neighbors == builders[4].compact().neighbors
+
+
+def test_lazy_relations_unknown_words():
+    lazy_relations = transform.RelationsBuilder(['ab', 'ac']).lazy_relations()
+    assert 'bc' not in lazy_relations
+    assert lazy_relations['bc'] == set()
+    assert 'abc' not in lazy_relations
+    assert '' not in lazy_relations
+
+
+def test_lazy_relations_buckets():
+    builder = transform.RelationsBuilder(['cat', 'cot', 'cog', 'dog'])
+    lazy_relations = builder.lazy_relations()
+    buckets = dict(lazy_relations.buckets('cot'))
+    assert buckets[('c', 't')] == set(['cat', 'cot'])
+    assert buckets[('co', '')] == set(['cot', 'cog'])
+    assert buckets[('', 'ot')] == set(['cot'])
+    assert list(lazy_relations.buckets('cut')) == []
+    assert list(lazy_relations.buckets('cats')) == []
+
+
+def test_neighbor_strategies():
+    words = random_words(300, 4, 'abcdef') + [u'épée', u'été!']
+    builder = transform.RelationsBuilder(words)
+    expected = builder.relations()
+    for strategy in ['buckets', 'substitutions']:
+        relations = builder.lazy_relations(strategy=strategy)
+        assert relations.strategy == strategy
+        yield check_same_relations, relations, expected
+        assert relations['fffg'] == set()
+    try:
+        builder.lazy_relations(strategy='random')
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_neighbor_strategy():
+    # Many words over a small alphabet share each of their partitions
+    strategy = transform.RelationsBuilder(
+        random_words(1000, 10, 'ab')).neighbor_strategy()
+    assert strategy.name == 'substitutions'
+    assert strategy.alphabet == 2
+    assert strategy.density > 1
+    strategy = transform.RelationsBuilder(
+        ['cat', 'cot', 'dog', 'emu']).neighbor_strategy()
+    assert strategy == ('buckets', 9, 14 / 12.0)
+    builder = transform.RelationsBuilder(random_words(1000, 10, 'ab'))
+    assert builder.lazy_relations(strategy='auto').strategy == 'substitutions'
+    assert transform.RelationsBuilder().neighbor_strategy() == (
+        'buckets', 0, 0.0)
+
+
+def test_compact_relations():
+    compact = transform.RelationsBuilder(['ab', 'ac', 'bc', 'dd']).compact()
+    assert compact.words == ['ab', 'ac', 'bc', 'dd']
+    assert list(compact.offsets) == [0, 2, 5, 7, 8]
+    assert list(compact.neighbors) == [0, 1, 0, 1, 2, 1, 2, 3]
+    assert list(compact.adjacency[1]) == [0, 1, 2]
+    assert 'bb' not in compact
+    assert compact['bb'] == set()
+
+
+def test_components():
+    words = ['ab', 'ac', 'bc', 'dd', 'de', 'ff']
+    builder = transform.RelationsBuilder(words)
+    for relations in [builder, builder.relations(), builder.lazy_relations(),
+                      builder.compact()]:
+        yield check_components, transform.connected_components(relations)
+
+def check_components(components):
+    # Numbered by decreasing size, then by smallest word
+    assert len(components) == 3
+    assert components.sizes() == [3, 2, 1]
+    assert [components[word] for word in ['ab', 'bc', 'dd', 'ff']] == [
+        0, 0, 1, 2]
+    assert components.get('zz') is None
+    assert components.connected('ab', 'bc')
+    assert not components.connected('ab', 'de')
+    assert not components.connected('zz', 'zz')
+
+
+def test_components_update():
+    builder = transform.RelationsBuilder(['ab', 'cd'])
+    assert not builder.components().connected('ab', 'cd')
+    builder.connect('ad')
+    assert builder.components().connected('ab', 'cd')
+
+
+def test_union_find():
+    roots = transform._union_find([[1, 2], [3], [2, 4], [], [5, 3]])
+    assert roots[1] == roots[2] == roots[4]
+    assert roots[3] == roots[5]
+    assert roots[1] != roots[3]
+
+
+def test_plural():
+    assert transform.plural(0, 'word') == '0 words'
+    assert transform.plural(1, 'word') == '1 word'
+    assert transform.plural(2, 'isolated word') == '2 isolated words'
+
+
+def test_describe_components():
+    components = transform.RelationsBuilder(
+        ['cat', 'cot', 'cog', 'dog', 'emu']).components()
+    assert list(transform.describe_components(3, components)) == [
+        'length 3: 5 words in 2 components',
+        '  1 component of 4 words',
+        '  1 component of 1 word',
+    ]
+
+
+def test_add_remove():
+    words = random_words(80, 3, 'abcd', seed=11)
+    added = random_words(20, 3, 'abcde', seed=12)
+    builder = transform.RelationsBuilder(words)
+    relations = builder.relations()
+    lazy_relations = builder.lazy_relations(100)
+    substitutions = builder.lazy_relations(100, 'substitutions')
+    # Warm the cache of the lazy relations and the components
+    for word in words:
+        lazy_relations[word]
+        substitutions[word]
+    builder.components()
+    for word in added:
+        builder.add(word)
+    for word in words[::3]:
+        if word in builder:
+            builder.remove(word)
+    expected_words = (set(words) | set(added)) - set(words[::3])
+    expected = transform.RelationsBuilder(expected_words)
+    yield check_same_relations, relations, expected.relations()
+    yield check_same_relations, lazy_relations, expected.relations()
+    yield check_same_relations, substitutions, expected.relations()
+    yield check_same_relations, builder.relations(), expected.relations()
+    assert (builder.components().sizes() ==
+            expected.components().sizes())
+
+
+def check_same_relations(relations, expected):
+    assert set(relations) == set(expected)
+    for word in expected:
+        assert relations[word] == expected[word]
+
+
+def test_add_remove_unknown():
+    builder = transform.RelationsBuilder(['ab', 'ac'])
+    builder.add('ab')
+    assert builder.relations()['ab'] == set(['ab', 'ac'])
+    try:
+        builder.remove('zz')
+    except KeyError:
+        pass
+    else:
+        assert False
+    builder.remove('ab')
+    assert 'ab' not in builder
+    assert dict(builder.relations()) == {'ac': set(['ac'])}
+    assert builder.bucket_sizes() == {1: 2}
+    # Looking up an unknown word does not add it to the relations
+    assert builder.relations()['zz'] == set()
+    assert 'zz' not in builder.relations()
+    builder.add('ad')
+    assert builder.relations() == {'ac': set(['ac', 'ad']),
+                                   'ad': set(['ac', 'ad'])}
+
+
+def test_lru_cache():
+    cache = transform.LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    assert len(cache) == 2
+    cache = transform.LRUCache(0)
+    cache['a'] = 1
+    assert 'a' not in cache
 
 
 def test_transformations():
@@ -83,7 +306,566 @@ def test_transformations():
     yield check_transformations, relations, 4, 1, [4, 2, 1]
     yield check_transformations, relations, 1, 5, [1, 2, 3, 5]
     yield check_transformations, relations, 5, 1, [5, 3, 2, 1]
+    for search in transform.TransformationFinder.SEARCHES:
+        yield check_transformations, relations, 1, 5, [1, 2, 3, 5], search
+        yield check_transformations, relations, 4, 4, [4], search
+
+def check_transformations(relations, start, end, transformations,
+                          search='bidirectional'):
+    finder = transform.TransformationFinder(relations, search)
+    assert list(finder.find_transformation(start, end)) == transformations
+
+
+def test_no_transformation():
+    relations = {
+        1: set([1, 2]),
+        2: set([1, 2]),
+        3: set([3]),
+    }
+    for search in transform.TransformationFinder.SEARCHES:
+        yield check_no_transformation, relations, 1, 3, search
+        yield check_no_transformation, relations, 3, 2, search
+
+def check_no_transformation(relations, start, end, search):
+    finder = transform.TransformationFinder(relations, search)
+    try:
+        list(finder.find_transformation(start, end))
+    except transform.NoTransformationError:
+        pass
+    else:
+        assert False
+
+
+def test_rejected_by_components():
+    relations = transform.RelationsBuilder(['cat', 'cot', 'emu']).relations()
+    components = transform.connected_components(relations)
+    for search in transform.TransformationFinder.SEARCHES:
+        yield check_rejected_by_components, relations, components, search
+
+def check_rejected_by_components(relations, components, search):
+    finder = transform.TransformationFinder(relations, search, 1,
+                                            components=components)
+    try:
+        list(finder.find_transformation('cat', 'emu'))
+    except transform.NoTransformationError:
+        pass
+    else:
+        assert False
+    # Rejected without searching and remembered
+    assert finder.cache_info().misses == 0
+    assert finder._transformations.get(('cat', 'emu'), 0) is None
+    assert list(finder.find_transformation('emu', 'emu')) == ['emu']
+
+
+def test_astar_expands_fewer_elements():
+    words = random_words(400, 5)
+    relations = transform.RelationsBuilder(words).relations()
+    generator = random.Random(5)
+    astar = transform.TransformationFinder(relations, 'astar')
+    unidirectional = transform.TransformationFinder(relations,
+                                                    'unidirectional')
+    for i in range(20):
+        start, end = generator.choice(words), generator.choice(words)
+        try:
+            expected = list(unidirectional.find_transformation(start, end))
+        except transform.NoTransformationError:
+            continue
+        transformation = list(astar.find_transformation(start, end))
+        assert len(transformation) == len(expected)
+        check_ladder(transformation, words, start, end)
+    assert 0 < astar.expanded < unidirectional.expanded
+
+
+def test_bucket_search():
+    # Dense buckets, where the words of a bucket are all related
+    words = random_words(300, 3, 'abcdefgh', seed=3)
+    builder = transform.RelationsBuilder(words)
+    generator = random.Random(7)
+    buckets = transform.TransformationFinder(builder.lazy_relations(),
+                                             'buckets')
+    bidirectional = transform.TransformationFinder(builder.relations(),
+                                                   'bidirectional')
+    for i in range(30):
+        start, end = generator.choice(words), generator.choice(words)
+        try:
+            expected = list(bidirectional.find_transformation(start, end))
+        except transform.NoTransformationError:
+            try:
+                list(buckets.find_transformation(start, end))
+            except transform.NoTransformationError:
+                continue
+            assert False, 'transformation found'
+        transformation = list(buckets.find_transformation(start, end))
+        assert len(transformation) == len(expected)
+        check_ladder(transformation, words, start, end)
+
+
+def test_bucket_search_tree():
+    words = ['aa', 'ab', 'ac', 'ad', 'ba', 'bb']
+    lazy_relations = transform.RelationsBuilder(words).lazy_relations()
+    tree = transform._BucketSearchTree('aa', lazy_relations)
+    assert tree.expand_layer(lambda word: False) is None
+    assert set(tree.parents) == set(['aa', 'ab', 'ac', 'ad', 'ba'])
+    assert ('a', '') in tree.used and ('', 'a') in tree.used
+    tree.expand_layer(lambda word: False)
+    # The bucket of ab, ac and ad is only scanned from aa
+    assert set(tree.parents) == set(words)
+    assert tree.parents['bb'] in ('ab', 'ba')
+
+
+def test_hamming_distance():
+    assert transform.hamming_distance('cat', 'cat') == 0
+    assert transform.hamming_distance('cat', 'cot') == 1
+    assert transform.hamming_distance('cat', 'dog') == 3
+
+
+def test_all_transformations():
+    builder = transform.RelationsBuilder(['cat', 'cot', 'cog', 'dog', 'cag',
+                                          'dag', 'dot', 'emu'])
+    for relations in [builder.relations(), builder.lazy_relations(),
+                      builder.compact()]:
+        yield check_all_transformations, relations
+
+def check_all_transformations(relations):
+    finder = transform.TransformationFinder(relations)
+    expected = [['cat', 'cag', 'cog', 'dog'], ['cat', 'cag', 'dag', 'dog'],
+                ['cat', 'cot', 'cog', 'dog'], ['cat', 'cot', 'dot', 'dog']]
+    assert list(finder.find_all_transformations('cat', 'dog')) == expected
+    assert list(finder.find_all_transformations('cat', 'dog', 3)) == (
+        expected[:3])
+    assert finder.count_transformations('cat', 'dog') == 4
+    assert list(finder.find_all_transformations('cog', 'cog')) == [['cog']]
+    assert finder.count_transformations('cog', 'cog') == 1
+    assert finder.count_transformations('cat', 'emu') == 0
+    try:
+        list(finder.find_all_transformations('cat', 'emu'))
+    except transform.NoTransformationError:
+        pass
+    else:
+        assert False
+
+
+def test_shortest_transformations():
+    builder = transform.RelationsBuilder(['cat', 'cot', 'cog', 'dog', 'cag',
+                                          'dag', 'dot', 'emu'])
+    for relations in [builder.relations(), builder.lazy_relations(),
+                      builder.compact()]:
+        yield check_shortest_transformations, relations
 
-def check_transformations(relations, start, end, transformations):
+def check_shortest_transformations(relations):
     finder = transform.TransformationFinder(relations)
+    shortest = list(finder.find_all_transformations('cat', 'dog'))
+    assert list(finder.find_shortest_transformations('cat', 'dog', 3)) == (
+        shortest[:3])
+    # The longer transformations follow the shortest ones
+    assert list(finder.find_shortest_transformations('cat', 'dog', 20)) == (
+        shortest + [['cat', 'cag', 'cog', 'cot', 'dot', 'dog'],
+                    ['cat', 'cot', 'cog', 'cag', 'dag', 'dog']])
+    assert list(finder.find_shortest_transformations('cog', 'cog', 2)) == [
+        ['cog']]
+    try:
+        list(finder.find_shortest_transformations('cat', 'emu', 2))
+    except transform.NoTransformationError:
+        pass
+    else:
+        assert False
+
+
+def simple_paths(relations, start, end):
+    """Returns every transformation between two words in which no word
+    appears twice, sorted by length.
+    """
+    paths = []
+    pending = [[start]]
+    while pending:
+        path = pending.pop()
+        if path[-1] == end:
+            paths.append(path)
+            continue
+        for word in relations[path[-1]]:
+            if word not in path:
+                pending.append(path + [word])
+    return sorted(paths, key=len)
+
+
+def test_k_shortest_transformations():
+    words = random_words(16, 3, 'abc', seed=4)
+    relations = transform.RelationsBuilder(words).relations()
+    generator = random.Random(6)
+    for i in range(10):
+        start, end = generator.choice(words), generator.choice(words)
+        yield check_k_shortest_transformations, relations, start, end
+
+def check_k_shortest_transformations(relations, start, end):
+    expected = simple_paths(relations, start, end)
+    finder = transform.TransformationFinder(relations)
+    for k in [1, 5, 20, len(expected) + 1]:
+        try:
+            transformations = list(finder.find_shortest_transformations(
+                start, end, k))
+        except transform.NoTransformationError:
+            assert not expected
+            return
+        assert len(transformations) == min(k, len(expected))
+        assert len(set(map(tuple, transformations))) == len(transformations)
+        assert ([len(transformation) for transformation in transformations]
+                == [len(path) for path in expected[:k]])
+        for transformation in transformations:
+            assert len(set(transformation)) == len(transformation)
+            check_ladder(transformation, relations, start, end)
+    # Every transformation is eventually found
+    assert sorted(transformations) == sorted(expected)
+
+
+def test_distance_map():
+    builder = transform.RelationsBuilder(['cat', 'cot', 'cog', 'dog', 'emu'])
+    for relations in [builder.relations(), builder.lazy_relations(),
+                      builder.compact()]:
+        yield check_distance_map, transform.TransformationFinder(relations)
+
+def check_distance_map(finder):
+    distances = finder.distance_map('cat')
+    assert distances.distances == {'cat': 0, 'cot': 1, 'cog': 2, 'dog': 3}
+    assert distances.eccentricity == 3
+    assert distances.farthest() == ['dog']
+    assert distances.path('dog') == ['cat', 'cot', 'cog', 'dog']
+    assert distances.path('cat') == ['cat']
+    assert 'emu' not in distances
+    try:
+        distances.path('emu')
+    except transform.NoTransformationError:
+        pass
+    else:
+        assert False
+    assert finder.expanded == 4
+    assert len(finder.distance_map('emu')) == 1
+
+
+def test_count_transformations():
+    words = random_words(300, 5, 'abc', seed=8)
+    relations = transform.RelationsBuilder(words).relations()
+    finder = transform.TransformationFinder(relations)
+    generator = random.Random(9)
+    for i in range(10):
+        start, end = generator.choice(words), generator.choice(words)
+        yield check_count_transformations, finder, relations, start, end
+
+def check_count_transformations(finder, relations, start, end):
+    transformations = list(finder.find_all_transformations(start, end))
+    assert finder.count_transformations(start, end) == len(transformations)
+    assert len(set(map(tuple, transformations))) == len(transformations)
+    length = len(list(finder.find_transformation(start, end)))
+    for transformation in transformations:
+        assert len(transformation) == length
+        check_ladder(transformation, relations, start, end)
+
+
+def random_words(count, length, alphabet='abcd', seed=42):
+    generator = random.Random(seed)
+    return sorted(set(''.join(generator.choice(alphabet)
+                              for i in range(length))
+                      for j in range(count)))
+
+
+def check_ladder(transformation, words, start, end):
+    """Checks that a transformation goes from start to end through words of
+    the list, changing exactly one letter at each step.
+    """
+    assert transformation[0] == start and transformation[-1] == end
+    assert set(transformation) <= set(words)
+    for word, next_word in zip(transformation, transformation[1:]):
+        assert len(word) == len(next_word)
+        assert sum(a != b for a, b in zip(word, next_word)) == 1
+
+
+def test_searches_agree():
+    words = random_words(60, 4)
+    relations = transform.RelationsBuilder(words).relations()
+    lazy_relations = transform.RelationsBuilder(words).lazy_relations(10)
+    compact = transform.RelationsBuilder(words).compact()
+    generator = random.Random(7)
+    for i in range(20):
+        start, end = generator.choice(words), generator.choice(words)
+        yield check_searches_agree, relations, words, start, end
+        yield check_searches_agree, lazy_relations, words, start, end
+        yield check_searches_agree, compact, words, start, end
+
+def check_searches_agree(relations, words, start, end):
+    lengths = set()
+    for search in transform.TransformationFinder.SEARCHES:
+        finder = transform.TransformationFinder(relations, search)
+        try:
+            transformation = list(finder.find_transformation(start, end))
+        except transform.NoTransformationError:
+            lengths.add(None)
+            continue
+        check_ladder(transformation, words, start, end)
+        lengths.add(len(transformation))
+    assert len(lengths) == 1
+
+
+def test_compact_transformations():
+    compact = transform.RelationsBuilder(['cat', 'cot', 'cog', 'dog', 'bat',
+                                          'emu']).compact()
+    for search in transform.TransformationFinder.SEARCHES:
+        finder = transform.TransformationFinder(compact, search)
+        yield (check_transformation_list, finder, 'bat', 'dog',
+               ['bat', 'cat', 'cot', 'cog', 'dog'])
+        yield check_no_transformation, compact, 'bat', 'emu', search
+        yield check_no_transformation, compact, 'bat', 'cut', search
+
+def check_transformation_list(finder, start, end, transformations):
     assert list(finder.find_transformation(start, end)) == transformations
+
+
+def test_answer_queries():
+    words = {3: ['cat', 'cot', 'cog', 'dog', 'emu'], 2: ['ab', 'ac']}
+    def relations_of(length):
+        return transform.RelationsBuilder(words.get(length, ())).relations()
+    finder_of = transform.TransformationFinders(relations_of)
+    queries = [
+        'cat dog\n',
+        '\n',
+        'ab  ac\n',
+        'cat emu',
+        'cat cut',
+        'cat',
+        'cat ac',
+        'dog cat',
+    ]
+    answers = list(transform.answer_queries(queries, finder_of))
+    assert answers == [
+        'cat cot cog dog',
+        'ab ac',
+        "error: no transformation is possible from 'cat' to 'emu'",
+        "error: 'cut' is not in the list of words",
+        'error: a query must contain exactly two words',
+        'error: the words must have the same length',
+        'dog cog cot cat',
+    ]
+
+
+def test_query_lengths():
+    queries = u'cat dog\n\nab ac\népée épie\n'.encode('utf-8')
+    with tempfile.TemporaryFile() as f:
+        f.write(b'skipped\n' + queries)
+        f.seek(8)
+        assert transform._query_lengths(f) == set([2, 3, 4])
+        assert f.read() == queries
+    assert transform._query_lengths(BytesIO(queries)) is None
+    read, write = os.pipe()
+    try:
+        with os.fdopen(read, 'rb') as f:
+            assert transform._query_lengths(f) is None
+    finally:
+        os.close(write)
+
+
+def test_normalized_word_list():
+    wordlist = u'ab\nAc\ncat\n\n épée \nx\n'.encode('utf-8')
+    yield check_normalized_word_list, wordlist, 2, [u'ab', u'Ac']
+    yield check_normalized_word_list, wordlist, [3, 4], [u'cat', u'épée']
+    yield check_normalized_word_list, wordlist, set(), []
+    yield (check_normalized_word_list, wordlist, None,
+           [u'ab', u'Ac', u'cat', u'épée', u'x'])
+
+def check_normalized_word_list(wordlist, wordlength, words):
+    must_contain = [u'x', u'épée', u'dog']
+    normalized = transform.NormalizedWordList(BytesIO(wordlist), wordlength,
+                                              must_contain)
+    assert list(normalized) == words
+    assert normalized.contains == {u'x': True, u'épée': True, u'dog': False}
+
+
+def test_normalized_word_list_lines():
+    lines = [b'cat', b' dog ', b'horse', b'']
+    words = transform.NormalizedWordList(lines, 3, must_contain=['emu'])
+    assert list(words) == ['cat', 'dog']
+    assert words.contains == {'emu': False}
+
+
+def test_load_relations_stats():
+    collected = stats.Stats()
+    graphs = transform.load_relations(['ab', 'ac', 'bc', 'dd', 'cat'],
+                                      stats=collected)
+    assert sorted(graphs) == [2, 3]
+    assert [phase['name'] for phase in collected.phases] == [
+        'partition', 'strategy', 'relations']
+    # Only ('a', '') and ('', 'c') are shared by two words
+    assert collected.counters['bucket sizes'] == {1: 7, 2: 2}
+    assert collected.counters['buckets'] == 9
+    assert collected.counters['edges'] == 2
+    assert collected.counters['neighbor strategies'] == {2: 'buckets',
+                                                         3: 'buckets'}
+    assert collected.counters['alphabet sizes'] == {2: 4, 3: 3}
+    assert collected.counters['bucket densities'] == {2: 1.5, 3: 1.0}
+    graphs = transform.load_relations(['ab', 'ac'], neighbors='substitutions')
+    assert graphs[2].strategy == 'substitutions'
+    assert graphs[2]['ab'] == set(['ab', 'ac'])
+
+
+def test_multi_length_relations():
+    words = ['ab', 'ac', 'cat', 'cot', 'a', 'b']
+    builder = transform.MultiLengthRelationsBuilder(words)
+    assert sorted(builder.builders) == [1, 2, 3]
+    assert builder[3].relations() == {
+        'cat': set(['cat', 'cot']),
+        'cot': set(['cat', 'cot']),
+    }
+    assert builder[4].relations() == {}
+    builder = transform.MultiLengthRelationsBuilder(words, [1, 3])
+    assert sorted(builder.builders) == [1, 3]
+    assert builder[2].relations() == {}
+    for graph in ['lazy', 'full', 'compact']:
+        yield check_load_relations, words, graph, 'python'
+    yield check_load_relations, words, 'compact', 'numpy'
+
+def check_load_relations(words, graph, backend):
+    graphs = transform.load_relations(words, [2, 3], graph, backend=backend)
+    assert sorted(graphs) == [2, 3]
+    assert graphs[2]['ac'] == set(['ab', 'ac'])
+    assert graphs[3]['cot'] == set(['cat', 'cot'])
+
+
+def edit_distance_one(a, b):
+    if len(a) == len(b):
+        return transform.hamming_distance(a, b) <= 1
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) != len(a) + 1:
+        return False
+    return any(b[:i] + b[i+1:] == a for i in range(len(b)))
+
+
+def test_edit_relations():
+    words = (random_words(60, 2, 'abc') + random_words(80, 3, 'abc') +
+             random_words(60, 4, 'abc') + ['a'])
+    relations = transform.MultiLengthRelationsBuilder(words).edit_relations()
+    assert sorted(relations) == sorted(set(words))
+    assert len(relations) == len(set(words))
+    for word in set(words):
+        assert word in relations
+        assert relations[word] == set(other for other in words
+                                      if edit_distance_one(word, other))
+    assert 'abcabc' not in relations
+    assert relations['abcabc'] == set()
+    assert relations[''] == set()
+
+
+def test_edit_transformations():
+    words = ['cat', 'cot', 'coat', 'boat', 'bat', 'at', 'beat', 'beast']
+    relations = transform.load_edit_relations(words)
+    for search in transform.TransformationFinder.SEARCHES:
+        finder = transform.TransformationFinder(relations, search)
+        transformation = list(finder.find_transformation('cat', 'beast'))
+        assert transformation == ['cat', 'bat', 'beat', 'beast']
+        transformation = list(finder.find_transformation('at', 'coat'))
+        assert transformation == ['at', 'cat', 'coat']
+    finder = transform.TransformationFinder(relations)
+    assert list(finder.find_all_transformations('cot', 'beat')) == [
+        ['cot', 'cat', 'bat', 'beat'], ['cot', 'coat', 'boat', 'beat']]
+    assert relations.heuristic('at', 'beast') == 3
+    collected = stats.Stats()
+    transform.load_edit_relations(words, stats=collected)
+    assert [phase['name'] for phase in collected.phases] == ['partition']
+    assert collected.counters['buckets'] == 24
+
+
+def test_cached_transformations():
+    words = random_words(80, 4)
+    relations = transform.RelationsBuilder(words).relations()
+    generator = random.Random(3)
+    pairs = [(generator.choice(words), generator.choice(words))
+             for i in range(30)]
+    # Many queries sharing the same end word
+    pairs += [(word, words[0]) for word in words[:30]]
+    pairs += pairs[:10]
+    for search in transform.TransformationFinder.SEARCHES:
+        yield check_cached_transformations, relations, pairs, search
+
+def check_cached_transformations(relations, pairs, search):
+    finder = transform.TransformationFinder(relations, search, 20, 5)
+    uncached = transform.TransformationFinder(relations, search)
+    for start, end in pairs:
+        try:
+            expected = len(list(uncached.find_transformation(start, end)))
+        except transform.NoTransformationError:
+            expected = None
+        try:
+            transformation = list(finder.find_transformation(start, end))
+        except transform.NoTransformationError:
+            assert expected is None
+            continue
+        assert len(transformation) == expected
+        check_ladder(transformation, relations, start, end)
+    info = finder.cache_info()
+    assert info.hits + info.misses == len(pairs)
+    if search != 'astar':
+        # Only the breadth-first searches keep their search trees
+        assert info.hits >= 10
+    assert info.maxsize == 20
+    assert info.currsize <= 20
+
+
+class BlockingRelations(dict):
+    """Relations whose lookup of a given element waits for an event."""
+
+    def __init__(self, relations, element):
+        dict.__init__(self, relations)
+        self.element = element
+        self.reached = threading.Event()
+        self.released = threading.Event()
+
+    def __getitem__(self, element):
+        if element == self.element:
+            self.reached.set()
+            self.released.wait()
+        return dict.__getitem__(self, element)
+
+
+def test_concurrent_searches():
+    relations = BlockingRelations(transform.RelationsBuilder(
+        ['cat', 'cot', 'cog', 'dog', 'ab', 'ac']).relations(), 'cot')
+    for search in transform.TransformationFinder.SEARCHES:
+        yield check_concurrent_searches, relations, search
+
+def check_concurrent_searches(relations, search):
+    relations.reached.clear()
+    relations.released.clear()
+    finder = transform.TransformationFinder(relations, search, 10, 10)
+    blocked = threading.Thread(
+        target=lambda: list(finder.find_transformation('cat', 'dog')))
+    blocked.start()
+    try:
+        assert relations.reached.wait(5)
+        # Another search is not delayed by the blocked one
+        answered = []
+        other = threading.Thread(target=lambda: answered.append(
+            list(finder.find_transformation('ab', 'ac'))))
+        other.start()
+        other.join(5)
+        assert answered == [['ab', 'ac']]
+    finally:
+        relations.released.set()
+        blocked.join()
+    assert list(finder.find_transformation('cat', 'dog')) == [
+        'cat', 'cot', 'cog', 'dog']
+
+
+def test_cache_info():
+    relations = transform.RelationsBuilder(['cat', 'cot', 'cog',
+                                            'dog']).relations()
+    finder = transform.TransformationFinder(relations, cache_size=2)
+    for i in range(3):
+        assert list(finder.find_transformation('cat', 'dog')) == [
+            'cat', 'cot', 'cog', 'dog']
+    assert finder.cache_info() == (2, 1, 2, 1)
+    finder.clear_cache()
+    list(finder.find_transformation('cat', 'dog'))
+    assert finder.cache_info() == (2, 2, 2, 1)
+    finder = transform.TransformationFinder(relations, 'unidirectional',
+                                            tree_cache_size=1)
+    list(finder.find_transformation('cat', 'dog'))
+    # The search tree rooted at dog already reached cog
+    assert list(finder.find_transformation('cog', 'dog')) == ['cog', 'dog']
+    assert finder.cache_info() == (1, 1, 0, 0)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import random
+import warnings
+
+from nose.plugins.skip import SkipTest
+
+from tuxywords import transform, vectorized
+
+
+def random_words(count, seed=42):
+    generator = random.Random(seed)
+    alphabet = u'abcdé'
+    return [u''.join(generator.choice(alphabet)
+                     for i in range(generator.randint(0, 5)))
+            for j in range(count)]
+
+
+def test_backends_agree():
+    yield check_backends_agree, []
+    yield check_backends_agree, [u'']
+    yield check_backends_agree, [u'a', u'b', u'ab', u'ba']
+    yield check_backends_agree, [u'ab', u'ac', u'bc', u'dd', u'ab']
+    for seed in range(5):
+        yield check_backends_agree, random_words(200, seed)
+
+def check_backends_agree(words):
+    if vectorized.numpy is None:
+        raise SkipTest('NumPy is not installed')
+    python = transform.RelationsBuilder.build_compact(words, 'python')
+    numpy = transform.RelationsBuilder.build_compact(words, 'numpy')
+    assert numpy.words == python.words
+    assert numpy.offsets.tobytes() == python.offsets.tobytes()
+    assert numpy.neighbors.tobytes() == python.neighbors.tobytes()
+
+
+def test_missing_numpy():
+    module = vectorized.numpy
+    vectorized.numpy = None
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            compact = transform.RelationsBuilder.build_compact(
+                [u'ab', u'ac'], 'numpy')
+        assert len(caught) == 1
+        assert compact[u'ab'] == set([u'ab', u'ac'])
+    finally:
+        vectorized.numpy = module
+
+
+def test_unknown_backend():
+    try:
+        transform.RelationsBuilder.build_compact([u'ab'], 'fortran')
+    except ValueError:
+        pass
+    else:
+        assert False
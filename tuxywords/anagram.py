@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Finds the anagrams of words and the words that can be built from letters.
+
+Two words are anagrams when sorting their letters gives the same key. The
+anagram index maps each key with the words having that key, and the sorted
+list of keys is a flattened trie where the keys starting with the same
+letters are contiguous. The words that can be built from some letters are
+found by walking down that trie while counting the letters still available,
+so that the keys needing a letter that is not available are never visited.
+
+The index file starts with a header containing the stamp and the checksum of
+the list of words it was built from, followed by the keys and the words
+encoded as UTF-8 and the ranges of the words of each key. All the integers
+are stored as unsigned little-endian values.
+"""
+
+from __future__ import print_function
+
+import codecs
+import struct
+import sys
+
+from bisect import bisect_left
+from collections import defaultdict
+
+from .index import (NO_STAMP, InvalidIndexError, _encode_words,
+                    _MappedArrays, _to_bytes, _write_stamp, checksum,
+                    is_unchanged, words_by_length)
+from .reader import file_stamp, read_all
+from .stats import profiled
+from .stats import add_arguments as add_stats_arguments
+from .stats import from_arguments as stats_from_arguments
+from .transform import _read_words, word_argument
+
+try:
+    _letter = unichr
+except NameError:
+    # Python 3
+    _letter = chr
+
+MAGIC = b'TWAN'
+VERSION = 2
+
+# Magic, version, size and modification time in nanoseconds of the source,
+# SHA-1 checksum of the source, number of keys, size of the
+# UTF-8 encoded keys, number of words and size of the UTF-8 encoded words
+_HEADER = struct.Struct('<4sIQq20sIIII')
+
+
+def letters_key(word):
+    """Returns the key shared by a word and its anagrams."""
+    return u''.join(sorted(word))
+
+
+def _successor(prefix):
+    """Returns the first string following every string starting with a
+    prefix.
+    """
+    return prefix[:-1] + _letter(ord(prefix[-1]) + 1)
+
+
+class AnagramIndex(object):
+    """An index of words by their sorted letters.
+
+    keys is the sorted sequence of the keys of the words and the words having
+    the key keys[i] are words[offsets[i]:offsets[i + 1]], in sorted order. The
+    number of keys visited by the searches is counted in visited.
+    """
+
+    def __init__(self, keys, offsets, words):
+        self.keys = keys
+        self.offsets = offsets
+        self.words = words
+        self.visited = 0
+
+    @classmethod
+    def build(cls, words):
+        """Builds the index of the given words."""
+        groups = defaultdict(set)
+        for word in words:
+            if word:
+                groups[letters_key(word)].add(word)
+        keys = sorted(groups)
+        offsets = [0]
+        grouped = []
+        for key in keys:
+            grouped.extend(sorted(groups[key]))
+            offsets.append(len(grouped))
+        return cls(keys, offsets, grouped)
+
+    def __len__(self):
+        return len(self.words)
+
+    def _group(self, i):
+        """Returns the words of the key keys[i]."""
+        return [self.words[j]
+                for j in range(self.offsets[i], self.offsets[i + 1])]
+
+    def anagrams(self, letters):
+        """Returns the sorted list of the words made of exactly the given
+        letters.
+        """
+        key = letters_key(letters)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self._group(i)
+        return []
+
+    def subanagrams(self, letters, min_length=1):
+        """Returns the words of at least min_length letters that can be built
+        from the given letters, each letter being used at most as many times
+        as it is given, from the longest to the shortest word.
+        """
+        counts = defaultdict(int)
+        for letter in letters:
+            counts[letter] += 1
+        available = sorted(counts)
+        found = []
+        keys = self.keys
+        # The prefix of the keys, the range of the keys starting with it, the
+        # first letter that can follow it and the counts of the letters still
+        # available
+        stack = [(u'', 0, len(keys), 0,
+                  tuple(counts[letter] for letter in available))]
+        while stack:
+            prefix, low, high, first, remaining = stack.pop()
+            for j in range(first, len(available)):
+                if not remaining[j]:
+                    continue
+                extended = prefix + available[j]
+                start = bisect_left(keys, extended, low, high)
+                if start == high:
+                    # No key follows the extended prefix
+                    break
+                self.visited += 1
+                key = keys[start]
+                if not key.startswith(extended):
+                    continue
+                if key == extended and len(extended) >= min_length:
+                    found.extend(self._group(start))
+                end = bisect_left(keys, _successor(extended), start, high)
+                if end - start > (key == extended):
+                    stack.append((extended, start, end, j,
+                                  remaining[:j] + (remaining[j] - 1,) +
+                                  remaining[j + 1:]))
+        found.sort(key=lambda word: (-len(word), word))
+        return found
+
+    def save(self, path, digest=b'\0' * 20, stamp=NO_STAMP):
+        """Writes the index to the file at the given path, with the checksum
+        and the stamp of the list of words it was built from.
+        """
+        keys, keys_size = _encode_words(self.keys)
+        words, words_size = _encode_words(self.words)
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, stamp[0], stamp[1], digest,
+                                 len(self.keys), keys_size, len(self.words),
+                                 words_size))
+            for chunk in [keys, _to_bytes(self.offsets), words]:
+                f.write(chunk)
+
+
+class MappedAnagramIndex(AnagramIndex):
+    """An AnagramIndex stored in a memory-mapped file."""
+
+    def __init__(self, path):
+        self._file = _MappedArrays(path, _HEADER, MAGIC, VERSION)
+        self.stamp = self._file.stamp
+        try:
+            (self.checksum, count, keys_size, words_count,
+             words_size) = self._file.fields
+            keys = self._file.words(count, keys_size)
+            offsets = self._file.uints(count + 1)
+            words = self._file.words(words_count, words_size)
+        except InvalidIndexError:
+            self._file.close()
+            raise
+        AnagramIndex.__init__(self, keys, offsets, words)
+
+    def close(self):
+        """Releases the memory-mapped file."""
+        self._file.close()
+
+
+def _indexed_words(data):
+    """Generates the words of a UTF-8 encoded list of words."""
+    for length_words in words_by_length(data).values():
+        for word in length_words:
+            yield word
+
+
+def build_anagram_index(path, wordlist):
+    """Builds the anagram index of the list of words read from the wordlist
+    file.
+    """
+    stamp = file_stamp(wordlist) or NO_STAMP
+    with read_all(wordlist) as data:
+        AnagramIndex.build(_indexed_words(data)).save(path, checksum(data),
+                                                      stamp)
+
+
+def open_anagram_index(path, wordlist, trust_stamp=False):
+    """Opens the anagram index of the list of words read from the wordlist
+    file, which is built again when it does not exist yet or when its
+    checksum shows that it is stale. The stamp of the list is trusted like in
+    index.open_index() when trust_stamp is True.
+    """
+    stamp = file_stamp(wordlist)
+    try:
+        index = MappedAnagramIndex(path)
+    except (EnvironmentError, InvalidIndexError):
+        index = None
+    if trust_stamp and index is not None and is_unchanged(index, stamp):
+        return index
+    stamp = stamp or NO_STAMP
+    with read_all(wordlist) as data:
+        digest = checksum(data)
+        if index is not None:
+            if index.checksum == digest:
+                if not trust_stamp or stamp in (NO_STAMP, index.stamp):
+                    return index
+                # Only the stamp changed, the list is not read again next
+                # time
+                index.close()
+                _write_stamp(path, stamp)
+                return MappedAnagramIndex(path)
+            index.close()
+        AnagramIndex.build(_indexed_words(data)).save(path, digest, stamp)
+    return MappedAnagramIndex(path)
+
+
+def main():
+    """Module entry point."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="""finds the anagrams of the given words in a list of
+                       words, or the words that can be built from their
+                       letters""")
+    # Cannot import the version from the package when running this module as a
+    # script
+    try:
+        from . import __version__
+        parser.add_argument('--version', action='version',
+                            version='%(prog)s ' + __version__)
+    except SystemError:
+        pass
+    parser.add_argument('--sub', action='store_true',
+                        help="""find the words that can be built from some of
+                                the letters instead of the anagrams, from the
+                                longest to the shortest""")
+    parser.add_argument('--min-length', metavar='N', type=int, default=1,
+                        help="""only find the words of at least N letters with
+                                --sub (default: %(default)s)""")
+    parser.add_argument('--index', metavar='INDEX',
+                        help="""use the anagram index of the list of words
+                                stored in INDEX, which is built or rebuilt
+                                when it is missing or stale""")
+    parser.add_argument('--queries', metavar='FILE',
+                        type=argparse.FileType('rb'),
+                        help="""answer the queries read from FILE, or from the
+                                standard input if FILE is -, with the letters
+                                of one query per line""")
+    parser.add_argument('wordlist', type=argparse.FileType('rb'),
+                        help='a file containing a list of words')
+    parser.add_argument('queries_letters', metavar='LETTERS', nargs='*',
+                        type=word_argument, help='the letters of a query')
+    add_stats_arguments(parser)
+    args = parser.parse_args()
+    stats = stats_from_arguments(args)
+    try:
+        with profiled(args.profile):
+            _anagram(args, stats)
+    finally:
+        stats.write(sys.stderr if args.stats else None, args.stats_json)
+
+
+def _anagram(args, stats):
+    """Runs the command of the parsed arguments, recording its statistics."""
+    queries = list(args.queries_letters)
+    if args.queries is not None:
+        queries.extend(line.strip() for line in
+                       codecs.iterdecode(args.queries, 'utf-8')
+                       if line.strip())
+    if args.index is not None:
+        with stats.phase('index'):
+            index = open_anagram_index(args.index, args.wordlist)
+    else:
+        words = _read_words(args.wordlist, None, stats)[1]
+        with stats.phase('index'):
+            index = AnagramIndex.build(words)
+    matches = 0
+    with stats.phase('query'):
+        for letters in queries:
+            if args.sub:
+                found = index.subanagrams(letters, args.min_length)
+            else:
+                found = index.anagrams(letters)
+            matches += len(found)
+            print('%s: %s' % (letters, ' '.join(found)))
+    stats.set('queries', len(queries))
+    stats.set('matches', matches)
+    stats.set('keys visited', index.visited)
+
+
+if __name__ == '__main__':
+    main()
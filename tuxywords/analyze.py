@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Analyzes the distances between the words of the same length.
+
+The eccentricity of a word is its distance to the words the farthest from it.
+The diameter of a group of related words is the largest eccentricity of its
+words and the pairs of words at that distance are the hardest to transform
+into each other.
+"""
+
+from __future__ import print_function
+
+import heapq
+import random
+
+from collections import namedtuple
+
+from .transform import (CompactRelations, DistanceMap, NormalizedWordList,
+                        RelationsBuilder, load_relations, plural)
+
+Eccentricity = namedtuple('Eccentricity', ['word', 'eccentricity',
+                                           'farthest'])
+
+ComponentSummary = namedtuple('ComponentSummary', [
+    'number', 'size', 'sources', 'diameter', 'radius', 'hardest'])
+
+# The compact relations of the words analyzed by a worker process
+_relations = None
+
+
+def _set_relations(relations):
+    """Sets the compact relations of the words analyzed by a worker."""
+    global _relations
+    _relations = relations
+
+
+def _eccentricity(i):
+    """Returns the Eccentricity of the word with the given identifier."""
+    distances = DistanceMap(i, _relations.adjacency)
+    words = _relations.words
+    return Eccentricity(words[i], distances.eccentricity,
+                        [words[j] for j in distances.farthest()])
+
+
+def eccentricities(words, sources, jobs=1):
+    """Generates the Eccentricity of each source word among the words, in no
+    particular order.
+
+    The searches from the sources are spread over jobs worker processes. The
+    compact relations of the words are built once, unless words already are
+    CompactRelations.
+    """
+    if not isinstance(words, CompactRelations):
+        words = RelationsBuilder(words).compact()
+    sources = [words.ids[word] for word in sources]
+    if jobs <= 1:
+        _set_relations(words)
+        for source in sources:
+            yield _eccentricity(source)
+        return
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs, _set_relations, (words,))
+    try:
+        chunk_size = max(1, len(sources) // (jobs * 4))
+        for eccentricity in pool.imap_unordered(_eccentricity, sources,
+                                                chunk_size):
+            yield eccentricity
+    finally:
+        pool.close()
+        pool.join()
+
+
+def choose_sources(members, sample=None, seed=42):
+    """Returns the source words of each component whose eccentricities are
+    computed.
+
+    members is the list of the words of each component. Every word is a
+    source, unless sample is given and at most sample words of each
+    component are randomly chosen. The components of a single word have no
+    source as their diameter is known.
+    """
+    generator = random.Random(seed)
+    sources = []
+    for words in members:
+        if len(words) < 2:
+            sources.append([])
+        elif sample is None or len(words) <= sample:
+            sources.append(list(words))
+        else:
+            sources.append(generator.sample(sorted(words), sample))
+    return sources
+
+
+def analyze(relations, sample=None, jobs=1, hardest=10, seed=42):
+    """Analyzes the distances between related words.
+
+    Returns the list of the ComponentSummary of each component of the
+    relations, by decreasing size, and the list of the Eccentricity of the
+    source words. The diameter of a component is exact when all its words are
+    sources, otherwise it is a lower bound. Up to hardest pairs of words are
+    given for each component.
+    """
+    components = relations.components()
+    members = [[] for size in components.sizes()]
+    for word in relations:
+        members[components[word]].append(word)
+    sources = choose_sources(members, sample, seed)
+    results = list(eccentricities(
+        relations, [word for words in sources for word in words], jobs))
+    by_component = [[] for words in members]
+    for result in results:
+        by_component[components[result.word]].append(result)
+    summaries = []
+    for number, words in enumerate(members):
+        found = by_component[number]
+        if found:
+            diameter = max(result.eccentricity for result in found)
+            radius = min(result.eccentricity for result in found)
+            pairs = set()
+            for result in found:
+                if result.eccentricity == diameter:
+                    for word in result.farthest:
+                        pairs.add(tuple(sorted([result.word, word])))
+            pairs = heapq.nsmallest(hardest, pairs)
+        else:
+            diameter = radius = 0
+            pairs = []
+        summaries.append(ComponentSummary(number, len(words), len(found),
+                                          diameter, radius, pairs))
+    return summaries, results
+
+
+def describe(length, summaries, components=10):
+    """Generates the lines of the report of the analysis of the words of a
+    given length, detailing up to components components of several words.
+    """
+    isolated = sum(1 for summary in summaries if summary.size == 1)
+    yield 'length %d: %s in %s, %s' % (
+        length, plural(sum(summary.size for summary in summaries), 'word'),
+        plural(len(summaries), 'component'),
+        plural(isolated, 'isolated word'))
+    for summary in summaries[:components]:
+        if summary.size == 1:
+            break
+        if summary.sources == summary.size:
+            diameter = 'diameter %d, radius %d' % (summary.diameter,
+                                                   summary.radius)
+        else:
+            # Only the eccentricities of the sources are known
+            diameter = 'diameter at least %d from %s' % (
+                summary.diameter, plural(summary.sources, 'source'))
+        yield '  component %d: %s, %s' % (
+            summary.number, plural(summary.size, 'word'), diameter)
+        for start, end in summary.hardest:
+            yield '    %s %s' % (start, end)
+
+
+def main():
+    """Module entry point."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="""computes the eccentricity of the words, the diameter
+                       of the groups of words that can be transformed into
+                       each other and the pairs of words the hardest to
+                       transform""")
+    # Cannot import the version from the package when running this module as a
+    # script
+    try:
+        from . import __version__
+        parser.add_argument('--version', action='version',
+                            version='%(prog)s ' + __version__)
+    except SystemError:
+        pass
+    parser.add_argument('--length', metavar='N', type=int, action='append',
+                        help="""length of the words to analyze, can be
+                                repeated (default: every length)""")
+    parser.add_argument('--sample', metavar='N', type=int,
+                        help="""only search from N random words of each group
+                                of related words, which gives a lower bound of
+                                the diameters""")
+    parser.add_argument('--seed', type=int, default=42,
+                        help="""seed of the sampling of the words
+                                (default: %(default)s)""")
+    parser.add_argument('--hardest', metavar='N', type=int, default=10,
+                        help="""number of the hardest pairs of words printed
+                                for each group (default: %(default)s)""")
+    parser.add_argument('--components', metavar='N', type=int, default=10,
+                        help="""number of the largest groups of words detailed
+                                for each length (default: %(default)s)""")
+    parser.add_argument('--eccentricities', action='store_true',
+                        help="""print the eccentricity of each analyzed word
+                                instead of the summary""")
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=1,
+                        help="""number of worker processes building the
+                                relations and searching from the words
+                                (default: %(default)s)""")
+    parser.add_argument('wordlist', type=argparse.FileType('rb'),
+                        help='a file containing a list of words')
+    args = parser.parse_args()
+    graphs = load_relations(NormalizedWordList(args.wordlist, args.length),
+                            args.length, 'compact', jobs=args.jobs)
+    for length in sorted(graphs):
+        summaries, results = analyze(graphs[length], args.sample, args.jobs,
+                                     args.hardest, args.seed)
+        if args.eccentricities:
+            for result in sorted(results):
+                print('%s %d' % (result.word, result.eccentricity))
+        else:
+            for line in describe(length, summaries, args.components):
+                print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -23,14 +23,20 @@
 #
 """Clean the content of a file consisting of a list of words."""
 
-from __future__ import print_function
-
-import codecs
 import sys
 
+from collections import deque
+from functools import partial
+
 if sys.version_info[0] == 2:
-    # Use the generator version of filter in Python 2
-    from itertools import ifilter as filter
+    # Use the generator version of map in Python 2
+    from itertools import imap as map
+
+from . import rules as _rules
+from .reader import BLOCK_SIZE, iter_blocks
+from .stats import profiled
+from .stats import add_arguments as add_stats_arguments
+from .stats import from_arguments as stats_from_arguments
 
 
 def is_valid(word):
@@ -46,12 +52,112 @@ def is_valid(word):
     return True
 
 
+def clean_chunk(chunk, rules=_rules.DEFAULT_RULES, lowercase=False):
+    """Returns the words of a block of the list of words satisfying the rules.
+
+    The block is decoded as UTF-8 and the valid words are returned as a single
+    string, each followed by a newline. Decoding the whole block at once is
+    faster than checking the bytes of each line before decoding it. The words
+    are converted to lowercase when lowercase is true.
+    """
+    lines = chunk.decode('utf-8').split(u'\n')
+    if chunk.endswith(b'\n'):
+        # Nothing follows the last newline
+        lines.pop()
+    words = _rules.compile_rules(rules, lowercase)(lines)
+    if not words:
+        return u''
+    words.append(u'')
+    return u'\n'.join(words)
+
+
+def _unique(cleaned):
+    """Generates the blocks of valid words without the words found earlier
+    in the same or in a previous block.
+    """
+    seen = set()
+    for words in cleaned:
+        words = words.split(u'\n')
+        # Nothing follows the last newline
+        words.pop()
+        words = [word for word in words
+                 if not (word in seen or seen.add(word))]
+        if words:
+            words.append(u'')
+        yield u'\n'.join(words)
+
+
+def _ordered_map(pool, function, iterable, window):
+    """Generates the results of a function applied to each item of an
+    iterable by a pool of worker processes, in the order of the items.
+
+    At most window items are processed at the same time, so that the iterable
+    is not read faster than the results are consumed.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(function, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def iter_cleaned(source, jobs=1, chunk_size=BLOCK_SIZE,
+                 rules=_rules.DEFAULT_RULES, lowercase=False, unique=False):
+    """Generates the blocks of valid words of the list of words read from
+    source, in their original order.
+
+    The blocks are filtered by jobs worker processes. The other arguments are
+    the ones of clean_chunks().
+    """
+    return clean_chunks(iter_blocks(source, chunk_size), jobs, rules,
+                        lowercase, unique)
+
+
+def clean_chunks(chunks, jobs=1, rules=_rules.DEFAULT_RULES, lowercase=False,
+                 unique=False):
+    """Generates the valid words of each block of a list of words, in their
+    original order, in a single pass.
+
+    The blocks are filtered by jobs worker processes with the rules and the
+    lowercase conversion of clean_chunk(). Only the first occurrence of a
+    word is kept when unique is true.
+    """
+    clean = partial(clean_chunk, rules=tuple(rules), lowercase=lowercase)
+    cleaned = _clean_chunks(chunks, jobs, clean)
+    if unique:
+        # The words already seen are only known by the parent process
+        cleaned = _unique(cleaned)
+    return cleaned
+
+
+def _clean_chunks(chunks, jobs, clean):
+    """Generates the result of clean for each block, computed by jobs worker
+    processes.
+    """
+    if jobs <= 1:
+        for cleaned in map(clean, chunks):
+            yield cleaned
+        return
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for cleaned in _ordered_map(pool, clean, chunks, 2 * jobs):
+            yield cleaned
+    finally:
+        pool.terminate()
+        pool.join()
+
+
 def main():
     """Module entry point."""
     import argparse
     parser = argparse.ArgumentParser(
         description="""filters out words starting with an uppercase letters or
-                       containing an apostrophe from a list of words""")
+                       containing an apostrophe from a list of words, and
+                       the words breaking the other rules given, in a
+                       single pass""")
     # Cannot import the version from the package when running this module as a
     # script
     try:
@@ -60,15 +166,106 @@ def main():
                             version='%(prog)s ' + __version__)
     except SystemError:
         pass
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=1,
+                        help="""number of worker processes filtering the list
+                                of words (default: %(default)s)""")
+    parser.add_argument('--chunk-size', metavar='BYTES', type=int,
+                        default=BLOCK_SIZE,
+                        help="""size of the blocks of the list of words
+                                filtered at once (default: %(default)s)""")
+    parser.add_argument('--allow-uppercase', action='store_true',
+                        help="""keep the words starting with an uppercase
+                                letter""")
+    parser.add_argument('--allow-apostrophe', action='store_true',
+                        help='keep the words containing an apostrophe')
+    parser.add_argument('--min-length', metavar='N', type=int,
+                        help='only keep the words of at least N characters')
+    parser.add_argument('--max-length', metavar='N', type=int,
+                        help='only keep the words of at most N characters')
+    parser.add_argument('--characters', metavar='CLASS', action='append',
+                        choices=sorted(_rules.CHARACTER_CLASSES),
+                        help="""only keep the words made of characters of
+                                CLASS, can be repeated""")
+    parser.add_argument('--extra-characters', metavar='CHARS',
+                        type=_text_argument, default=u'',
+                        help="""characters allowed in addition to the classes
+                                of --characters""")
+    parser.add_argument('--match', metavar='REGEX', type=_text_argument,
+                        help="""only keep the words entirely matched by the
+                                regular expression REGEX""")
+    parser.add_argument('--lowercase', action='store_true',
+                        help='convert the kept words to lowercase')
+    parser.add_argument('--unique', action='store_true',
+                        help="""only keep the first occurrence of each word,
+                                after its conversion to lowercase""")
     parser.add_argument('source', type=argparse.FileType('rb'),
                         help='a file containing a list of words')
     parser.add_argument('destination', type=argparse.FileType('w'),
                         help='destination of the filtered list of words')
+    add_stats_arguments(parser)
     args = parser.parse_args()
-    # Decode the list of words as UTF-8 and remove the trailing \n
-    words = (word.strip() for word in codecs.iterdecode(args.source, 'utf-8'))
-    for word in filter(is_valid, words):
-        print(word, file=args.destination)
+    if args.chunk_size < 1:
+        parser.error('the --chunk-size argument must be at least 1')
+    stats = stats_from_arguments(args)
+    try:
+        with profiled(args.profile):
+            _cleanup(args, stats)
+    finally:
+        stats.write(sys.stderr if args.stats else None, args.stats_json)
+
+
+def _text_argument(value):
+    """Converts a command-line argument into text, decoding the byte strings
+    of Python 2 as UTF-8.
+    """
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
+
+
+def rules_from_arguments(args):
+    """Returns the rules selected by the parsed arguments."""
+    rules = []
+    if not args.allow_uppercase:
+        rules.append(_rules.no_leading_uppercase())
+    if not args.allow_apostrophe:
+        rules.append(_rules.no_apostrophe())
+    if args.min_length is not None or args.max_length is not None:
+        rules.append(_rules.length_range(args.min_length, args.max_length))
+    if args.characters or args.extra_characters:
+        rules.append(_rules.characters(args.characters or (),
+                                       args.extra_characters))
+    if args.match is not None:
+        rules.append(_rules.matching(args.match))
+    return tuple(rules)
+
+
+def _cleanup(args, stats):
+    """Filters the list of words of the parsed arguments, recording the
+    statistics of each phase.
+    """
+    rules = rules_from_arguments(args)
+    if not stats.enabled:
+        # The blocks are decoded as UTF-8 and the trailing \n of the words
+        # are removed before filtering
+        for cleaned in iter_cleaned(args.source, args.jobs, args.chunk_size,
+                                    rules, args.lowercase, args.unique):
+            args.destination.write(cleaned)
+        return
+    with stats.phase('read'):
+        chunks = list(iter_blocks(args.source, args.chunk_size))
+    stats.set('blocks', len(chunks))
+    stats.set('bytes read', sum(len(chunk) for chunk in chunks))
+    # The last line may not end with a newline
+    stats.set('lines read', sum(chunk.count(b'\n') for chunk in chunks) +
+              (1 if chunks and not chunks[-1].endswith(b'\n') else 0))
+    with stats.phase('clean'):
+        cleaned = list(clean_chunks(chunks, args.jobs, rules, args.lowercase,
+                                    args.unique))
+    stats.set('words kept', sum(words.count(u'\n') for words in cleaned))
+    with stats.phase('write'):
+        for words in cleaned:
+            args.destination.write(words)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,639 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Stores the relations between words in a file that can be memory-mapped.
+
+The index file starts with a header containing the stamp and the checksum of
+the list of words it was built from, followed by a table of the word lengths
+it contains. The stamp is the size and the modification time of the list,
+which can be trusted to recognize an unchanged list without computing its
+checksum.
+For each word length, the index stores the sorted list of words encoded as
+UTF-8 and, for each position of a letter, the partition buckets containing more
+than one word. A bucket is stored as a range of word identifiers and each word
+knows the bucket it belongs to, so that the relations of a word can be found
+without reading the whole index. The section ends with the sizes of the
+connected components of the relations and the component of each word.
+
+All the integers are stored as unsigned little-endian values.
+"""
+
+import hashlib
+import mmap
+import os
+import shutil
+import struct
+import sys
+
+from array import array
+from collections import defaultdict
+
+from .reader import (file_stamp, iter_buffer_blocks, iter_words, read_all,
+                     split_lines)
+from .transform import (NO_BUCKET, Components, _bucket_components,
+                        _build_buckets)
+
+MAGIC = b'TWIX'
+VERSION = 3
+
+# Magic, version, size and modification time in nanoseconds of the source,
+# number of word lengths and SHA-1 checksum of the source
+_HEADER = struct.Struct('<4sIQqI20s')
+# Every header starts with the magic, the version and the stamp of the source
+_STAMP = struct.Struct('<Qq')
+_STAMP_OFFSET = 8
+# Stamp of a source that is not a regular file
+NO_STAMP = (0, 0)
+# Word length and offset of its section
+_ENTRY = struct.Struct('<IQ')
+# Number of words and size of the UTF-8 encoded words
+_SECTION = struct.Struct('<II')
+_UINT = struct.Struct('<I')
+
+
+class InvalidIndexError(Exception):
+    """Exception raised when a file is not a valid index."""
+    pass
+
+
+def checksum(data):
+    """Returns the checksum identifying the content of a list of words."""
+    return hashlib.sha1(data).digest()
+
+
+def _replace(temporary, path):
+    """Replaces the file at path by the file at temporary."""
+    try:
+        os.replace(temporary, path)
+    except AttributeError:
+        # Python 2 compatibility
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(temporary, path)
+
+
+def _write_stamp(path, stamp):
+    """Replaces the stamp of the source of the index file at the given path.
+
+    The index is copied with the new stamp to a temporary file that replaces
+    it, so that a reader never sees a partial index.
+    """
+    temporary = path + '.tmp'
+    with open(path, 'rb') as source:
+        with open(temporary, 'wb') as f:
+            f.write(source.read(_STAMP_OFFSET))
+            f.write(_STAMP.pack(*stamp))
+            source.seek(_STAMP_OFFSET + _STAMP.size)
+            shutil.copyfileobj(source, f)
+    _replace(temporary, path)
+
+
+def words_by_length(data):
+    """Returns a dictionnary that maps a word length with the set of words of
+    that length found in the UTF-8 encoded list of words.
+    """
+    words = defaultdict(set)
+    for block in iter_buffer_blocks(data):
+        for word in iter_words(split_lines(block)):
+            if word:
+                words[len(word)].add(word)
+    return words
+
+
+def _to_bytes(values):
+    """Encodes a sequence of integers as unsigned little-endian values."""
+    values = array('I', values)
+    if values.itemsize != _UINT.size:
+        # Unusual platform, fallback on struct
+        return struct.pack('<%dI' % len(values), *values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    try:
+        return values.tobytes()
+    except AttributeError:
+        # Python 2 compatibility
+        return values.tostring()
+
+
+def _pad(data):
+    """Pads some data so that its size is a multiple of 4 bytes."""
+    return data + b'\0' * (-len(data) % 4)
+
+
+def _encode_words(words):
+    """Encodes a sequence of words as the offsets of their UTF-8 encodings
+    followed by the padded encoded words.
+
+    Returns the encoded words and the size of the encoded words without the
+    padding.
+    """
+    encoded = [word.encode('utf-8') for word in words]
+    offsets = [0]
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    blob = b''.join(encoded)
+    return _to_bytes(offsets) + _pad(blob), len(blob)
+
+
+def _encode_section(words, positions, components):
+    """Encodes the sorted words of the same length, their buckets at each
+    position computed by _position_buckets() and their components computed
+    by _bucket_components().
+    """
+    encoded = [word.encode('utf-8') for word in words]
+    offsets = [0]
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    blob = b''.join(encoded)
+    chunks = [_SECTION.pack(len(words), len(blob)), _to_bytes(offsets),
+              _pad(blob)]
+    for bucket_offsets, members, bucket_of in positions:
+        chunks.extend([_UINT.pack(len(bucket_offsets) - 1),
+                       _to_bytes(bucket_offsets), _to_bytes(members),
+                       _to_bytes(bucket_of)])
+    sizes, component_of = components
+    chunks.extend([_UINT.pack(len(sizes)), _to_bytes(sizes),
+                   _to_bytes(component_of)])
+    return b''.join(chunks)
+
+
+def _write_sections(path, sections, digest, stamp):
+    """Writes an index made of the encoded sections of each word length to
+    the file at the given path.
+    """
+    lengths = sorted(sections)
+    offset = _HEADER.size + _ENTRY.size * len(lengths)
+    table = []
+    for length in lengths:
+        table.append(_ENTRY.pack(length, offset))
+        offset += len(sections[length])
+    # Write to a temporary file first so that a reader never sees a partial
+    # index
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, stamp[0], stamp[1],
+                             len(lengths), digest))
+        for chunk in table + [sections[length] for length in lengths]:
+            f.write(chunk)
+    _replace(temporary, path)
+
+
+def _encode_sections(words, jobs=1):
+    """Returns a dictionnary that maps each word length with the encoded
+    section of the words of that length.
+
+    When jobs is greater than 1, the buckets of each position and the
+    components of each length are computed by that many worker processes.
+    """
+    lengths = sorted(length for length in words if words[length])
+    words = dict((length, sorted(words[length])) for length in lengths)
+    pool = None
+    imap = map
+    if jobs > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs)
+        imap = pool.imap
+    try:
+        buckets = _build_buckets(words, imap)
+        components = imap(_bucket_components, [
+            (len(words[length]),
+             [(bucket_offsets, members)
+              for bucket_offsets, members, bucket_of in buckets[length]])
+            for length in lengths])
+        return dict((length, _encode_section(words[length], buckets[length],
+                                             length_components))
+                    for length, length_components in zip(lengths, components))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def write_index(path, words, digest, jobs=1, stamp=NO_STAMP):
+    """Writes the index of the words to the file at the given path.
+
+    words is a dictionnary that maps a word length with the words of that
+    length, digest and stamp are the checksum and the stamp of the list the
+    words come from. The relations between the words are built by jobs
+    worker processes.
+    """
+    _write_sections(path, _encode_sections(words, jobs), digest, stamp)
+
+
+def _rewrite_index(path, index, words, digest, stamp, jobs=1):
+    """Replaces the sections of an open index by the sections of the given
+    words and closes the index.
+
+    words is a dictionnary that maps a word length with the new words of that
+    length. The sections of the other lengths are copied unchanged.
+    """
+    try:
+        sections = dict((length, index.section(length))
+                        for length in index.lengths() if length not in words)
+    finally:
+        index.close()
+    sections.update(_encode_sections(words, jobs))
+    _write_sections(path, sections, digest, stamp)
+
+
+def apply_delta(path, added=(), removed=(), digest=None, jobs=1,
+                stamp=NO_STAMP):
+    """Adds words to and removes words from the index at the given path.
+
+    Only the sections of the word lengths of the added and removed words are
+    encoded again. digest and stamp are the checksum and the stamp of the
+    updated list of words, those of the index are kept unless digest is
+    given.
+    """
+    index = WordIndex(path)
+    changes = defaultdict(lambda: (set(), set()))
+    for word in added:
+        changes[len(word)][0].add(word)
+    for word in removed:
+        changes[len(word)][1].add(word)
+    words = {}
+    for length, (length_added, length_removed) in changes.items():
+        words[length] = ((set(index.relations(length)) - length_removed) |
+                         length_added)
+    if digest is None:
+        digest, stamp = index.checksum, index.stamp
+    _rewrite_index(path, index, words, digest, stamp, jobs)
+
+
+def build_index(path, wordlist, jobs=1):
+    """Builds the index of the list of words read from the wordlist file."""
+    stamp = file_stamp(wordlist) or NO_STAMP
+    with read_all(wordlist) as data:
+        write_index(path, words_by_length(data), checksum(data), jobs, stamp)
+
+
+def is_unchanged(index, stamp):
+    """Returns whether the source of an index is known to be unchanged from
+    its stamp, without computing its checksum.
+    """
+    return stamp is not None and stamp != NO_STAMP and index.stamp == stamp
+
+
+def open_index(path, wordlist, jobs=1, trust_stamp=False):
+    """Opens the index of the list of words read from the wordlist file.
+
+    The index is built when it does not exist yet. When its checksum shows
+    that it is stale, only the sections of the word lengths whose words
+    changed are encoded again. When trust_stamp is True, the list is not read
+    when its stamp did not change, even though a list rewritten with the
+    same size and modification time is then not detected.
+    """
+    stamp = file_stamp(wordlist)
+    try:
+        index = WordIndex(path)
+    except (EnvironmentError, InvalidIndexError):
+        index = None
+    if trust_stamp and index is not None and is_unchanged(index, stamp):
+        return index
+    stamp = stamp or NO_STAMP
+    with read_all(wordlist) as data:
+        digest = checksum(data)
+        if index is None:
+            write_index(path, words_by_length(data), digest, jobs, stamp)
+        elif index.checksum != digest:
+            words = words_by_length(data)
+            changed = dict(
+                (length, words.get(length, set()))
+                for length in set(words) | set(index.lengths())
+                if set(index.relations(length)) != words.get(length))
+            _rewrite_index(path, index, changed, digest, stamp, jobs)
+        elif trust_stamp and stamp not in (NO_STAMP, index.stamp):
+            # Only the stamp changed, the list is not read again next time
+            index.close()
+            _write_stamp(path, stamp)
+        else:
+            return index
+    return WordIndex(path)
+
+
+class _UIntArray(object):
+    """A read-only array of unsigned integers stored in a buffer."""
+
+    def __init__(self, buffer, offset, length):
+        self._buffer = buffer
+        self._offset = offset
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._length:
+            raise IndexError('index out of range')
+        return _UINT.unpack_from(self._buffer, self._offset + 4 * i)[0]
+
+    @property
+    def end(self):
+        """Offset of the end of the array in the buffer."""
+        return self._offset + 4 * self._length
+
+
+class _EncodedWords(object):
+    """A read-only sequence of the words encoded as UTF-8 in a buffer."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        # The offsets raise the IndexError past the last word
+        offsets = self._offsets
+        return self._blob[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8')
+
+
+class _MappedArrays(object):
+    """A memory-mapped file made of a header followed by arrays of unsigned
+    integers and of words encoded by _encode_words().
+
+    The header is a struct starting with the magic and the version of the
+    file and the stamp of its source, which is available in stamp, and its
+    other fields are available in fields. The arrays are read in order,
+    without copying them when possible.
+    """
+
+    def __init__(self, path, header, magic, version):
+        self._path = path
+        self._views = []
+        with open(path, 'rb') as f:
+            try:
+                self._buffer = mmap.mmap(f.fileno(), 0,
+                                         access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                raise InvalidIndexError('%s is empty' % path)
+        try:
+            fields = header.unpack_from(self._buffer, 0)
+        except struct.error:
+            self.close()
+            raise InvalidIndexError('%s is truncated' % path)
+        if fields[0] != magic or fields[1] != version:
+            self.close()
+            raise InvalidIndexError('%s is not a valid index' % path)
+        self.stamp = fields[2:4]
+        self.fields = fields[4:]
+        self._offset = header.size
+
+    def _view(self, size):
+        """Returns a view of the next size bytes of the file."""
+        if self._offset + size > len(self._buffer):
+            raise InvalidIndexError('%s is truncated' % self._path)
+        view = memoryview(self._buffer)[self._offset:self._offset + size]
+        self._views.append(view)
+        self._offset += size + (-size % _UINT.size)
+        return view
+
+    def uints(self, length):
+        """Returns the next array of unsigned integers of the file."""
+        view = self._view(_UINT.size * length)
+        if (sys.byteorder == 'little' and hasattr(view, 'cast') and
+                array('I').itemsize == _UINT.size):
+            view = view.cast('I')
+            self._views.append(view)
+            return view
+        values = array('I')
+        try:
+            values.frombytes(view.tobytes())
+        except AttributeError:
+            # Python 2 compatibility
+            values.fromstring(view.tobytes())
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values
+
+    def words(self, count, size):
+        """Returns the next sequence of count words of the file, whose
+        encoded size is size.
+        """
+        offsets = self.uints(count + 1)
+        return _EncodedWords(offsets, self._view(size))
+
+    def close(self):
+        """Releases the memory-mapped file."""
+        # The views are released from the last one, the casts first
+        while self._views:
+            self._views.pop().release()
+        self._buffer.close()
+
+
+class IndexedRelations(object):
+    """The relations between the words of the same length stored in an index.
+
+    It behaves like the dictionnary returned by RelationsBuilder.relations()
+    but only decodes the words whose relations are requested.
+    """
+
+    def __init__(self, buffer, offset):
+        self._buffer = buffer
+        count, size = _SECTION.unpack_from(buffer, offset)
+        self._offsets = _UIntArray(buffer, offset + _SECTION.size, count + 1)
+        self._blob = self._offsets.end
+        self._positions = []
+        offset = self._blob + size + (-size % 4)
+        length = len(self.word(0)) if count else 0
+        for position in range(length):
+            buckets = _UINT.unpack_from(buffer, offset)[0]
+            bucket_offsets = _UIntArray(buffer, offset + _UINT.size,
+                                        buckets + 1)
+            members = _UIntArray(buffer, bucket_offsets.end,
+                                 bucket_offsets[buckets])
+            bucket_of = _UIntArray(buffer, members.end, count)
+            self._positions.append((bucket_offsets, members, bucket_of))
+            offset = bucket_of.end
+        sizes = _UINT.unpack_from(buffer, offset)[0]
+        self._sizes = _UIntArray(buffer, offset + _UINT.size, sizes)
+        self._component_of = _UIntArray(buffer, self._sizes.end, count)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.word(i)
+
+    def __contains__(self, word):
+        return self.find(word) is not None
+
+    def __getitem__(self, word):
+        i = self.find(word)
+        if i is None:
+            return set()
+        return set(self.word(j) for j in self.neighbors(i))
+
+    def buckets(self, word):
+        """Generates an identifier of each bucket of a word with the set of
+        words of the bucket, or nothing if the word is unknown.
+        """
+        i = self.find(word)
+        if i is None:
+            return
+        for position, (bucket_offsets, members, bucket_of) in enumerate(
+                self._positions):
+            bucket = bucket_of[i]
+            if bucket != NO_BUCKET:
+                yield (position, bucket), set(
+                    self.word(members[j])
+                    for j in range(bucket_offsets[bucket],
+                                   bucket_offsets[bucket + 1]))
+
+    def word(self, i):
+        """Returns the word with the given identifier."""
+        start = self._blob + self._offsets[i]
+        end = self._blob + self._offsets[i + 1]
+        return self._buffer[start:end].decode('utf-8')
+
+    def partition_words(self, partition):
+        """Returns the set of the words having the given partition like
+        RelationsBuilder.partition_words().
+
+        The words starting with the prefix of the partition are sorted
+        together, so a word of the partition is found by trying each of the
+        letters following the prefix once. The other words of the partition
+        are the words of its bucket.
+        """
+        prefix, suffix = partition
+        position = len(prefix)
+        if position + len(suffix) + 1 != len(self._positions):
+            return set()
+        i = self._lower_bound(prefix.encode('utf-8'))
+        while i < len(self):
+            word = self.word(i)
+            if not word.startswith(prefix):
+                break
+            j = self.find(word[:position + 1] + suffix)
+            if j is not None:
+                bucket_offsets, members, bucket_of = self._positions[position]
+                bucket = bucket_of[j]
+                if bucket == NO_BUCKET:
+                    return set([self.word(j)])
+                return set(self.word(members[k])
+                           for k in range(bucket_offsets[bucket],
+                                          bucket_offsets[bucket + 1]))
+            # Skip the other words having the same letter after the prefix,
+            # no UTF-8 encoded character starts with the byte 0xFF
+            i = self._lower_bound(
+                word[:position + 1].encode('utf-8') + b'\xff')
+        return set()
+
+    def _lower_bound(self, encoded):
+        """Returns the identifier of the first word whose UTF-8 encoding is
+        not lower than encoded.
+        """
+        low, high = 0, len(self)
+        # Binary search over the sorted words
+        while low < high:
+            middle = (low + high) // 2
+            start = self._blob + self._offsets[middle]
+            end = self._blob + self._offsets[middle + 1]
+            if self._buffer[start:end] < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, word):
+        """Returns the identifier of a word or None if it is not indexed."""
+        encoded = word.encode('utf-8')
+        low = self._lower_bound(encoded)
+        if low < len(self):
+            start = self._blob + self._offsets[low]
+            end = self._blob + self._offsets[low + 1]
+            if self._buffer[start:end] == encoded:
+                return low
+        return None
+
+    def components(self):
+        """Returns the connected components of the relations."""
+        def component_of(word):
+            i = self.find(word)
+            return None if i is None else self._component_of[i]
+        return Components(component_of, list(self._sizes))
+
+    def neighbors(self, i):
+        """Returns the set of identifiers of the words related to a word."""
+        neighbors = set([i])
+        for bucket_offsets, members, bucket_of in self._positions:
+            bucket = bucket_of[i]
+            if bucket != NO_BUCKET:
+                for j in range(bucket_offsets[bucket],
+                               bucket_offsets[bucket + 1]):
+                    neighbors.add(members[j])
+        return neighbors
+
+
+class WordIndex(object):
+    """A memory-mapped index of the relations between words."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            try:
+                self._buffer = mmap.mmap(f.fileno(), 0,
+                                         access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                raise InvalidIndexError('%s is empty' % path)
+        try:
+            (magic, version, size, mtime, count,
+             self.checksum) = _HEADER.unpack_from(self._buffer, 0)
+        except struct.error:
+            self.close()
+            raise InvalidIndexError('%s is truncated' % path)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise InvalidIndexError('%s is not a valid index' % path)
+        self.stamp = (size, mtime)
+        self._sections = {}
+        for i in range(count):
+            length, offset = _ENTRY.unpack_from(
+                self._buffer, _HEADER.size + _ENTRY.size * i)
+            self._sections[length] = offset
+
+    def lengths(self):
+        """Returns the sorted list of the word lengths in the index."""
+        return sorted(self._sections)
+
+    def section(self, length):
+        """Returns the encoded section of the words of the given length."""
+        offset = self._sections[length]
+        end = min([other for other in self._sections.values()
+                   if other > offset] or [len(self._buffer)])
+        return self._buffer[offset:end]
+
+    def relations(self, length):
+        """Returns the relations between the words of the given length."""
+        if length not in self._sections:
+            return {}
+        return IndexedRelations(self._buffer, self._sections[length])
+
+    def close(self):
+        """Releases the memory-mapped file."""
+        self._buffer.close()
@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Finds the words within a Hamming or edit distance of a word.
+
+Removing a letter from a word joins one of the partitions returned by
+RelationsBuilder.letter_partitions(). Two words within edit distance k have a
+common string formed by removing at most k letters from each of them, so the
+lookup index maps the strings formed by removing up to k letters from each
+word with the words they come from. Only the beginnings of the words are
+indexed, which is enough to find the candidates while keeping the index
+small: the strings formed by removing up to k letters from the prefix_length
+first letters of two such words also have one in common. The candidates are
+then checked against the actual distance.
+
+The strings are identified by their CRC-32 in a sorted array, whose entries
+point to the identifiers of the words in the sorted list of words. The
+index file starts with a header containing the stamp and the checksum of the
+list of words it was built from and the parameters of the index, followed by
+the words encoded as UTF-8 and the arrays. All the integers are stored as
+unsigned little-endian values.
+"""
+
+from __future__ import print_function
+
+import codecs
+import struct
+import sys
+import zlib
+
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from .index import (NO_STAMP, InvalidIndexError, _encode_words,
+                    _MappedArrays, _to_bytes, _write_stamp, checksum,
+                    is_unchanged, words_by_length)
+from .reader import file_stamp, read_all
+from .stats import profiled
+from .stats import add_arguments as add_stats_arguments
+from .stats import from_arguments as stats_from_arguments
+from .transform import RelationsBuilder, word_argument
+
+MAGIC = b'TWLK'
+VERSION = 2
+
+# Magic, version, size and modification time in nanoseconds of the source,
+# SHA-1 checksum of the source, maximum distance, prefix
+# length, number of words, size of the UTF-8 encoded words, number of keys and
+# number of word identifiers
+_HEADER = struct.Struct('<4sIQq20sIIIIII')
+
+
+def deletions(word, distance):
+    """Returns the set of the strings formed by removing up to distance
+    letters from a word, including the word itself.
+    """
+    variants = layer = set([word])
+    for i in range(distance):
+        layer = set(prefix + suffix for variant in layer
+                    for prefix, suffix in
+                    RelationsBuilder.letter_partitions(variant))
+        variants |= layer
+    return variants
+
+
+def _bit_vectors(word):
+    """Returns a dictionnary that maps each letter of a word with the bits set
+    at the positions of the letter in the word.
+    """
+    vectors = {}
+    for i, letter in enumerate(word):
+        vectors[letter] = vectors.get(letter, 0) | (1 << i)
+    return vectors
+
+
+def _bit_parallel_distance(vectors, length, other, limit):
+    """Returns the edit distance between the word of the given bit vectors
+    and length and another word, or limit + 1 if it is more than limit.
+
+    The columns of the dynamic programming matrix are computed with the bit
+    operations of Myers' algorithm, as explained by Hyyrö, where bit i of pv
+    and mv tells whether the distance increases or decreases between rows i
+    and i + 1 of the current column.
+    """
+    if not length:
+        return min(len(other), limit + 1)
+    mask = (1 << length) - 1
+    last = 1 << (length - 1)
+    pv, mv, distance = mask, 0, length
+    remaining = len(other)
+    for letter in other:
+        eq = vectors.get(letter, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last:
+            distance += 1
+        elif mh & last:
+            distance -= 1
+        # The first row is the number of letters of the other word
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        remaining -= 1
+        if distance - remaining > limit:
+            # Each remaining letter decreases the distance by at most one
+            return limit + 1
+    return min(distance, limit + 1)
+
+
+def edit_distance(a, b, limit=None):
+    """Returns the number of letters to change, insert or remove to transform
+    a word into another, or limit + 1 if it is more than limit.
+    """
+    if limit is None:
+        limit = max(len(a), len(b))
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    return _bit_parallel_distance(_bit_vectors(a), len(a), b, limit)
+
+
+def hamming_distance(a, b, limit=None):
+    """Returns the number of positions at which two words of the same length
+    differ, or limit + 1 if it is more than limit or if the lengths of the
+    words differ.
+    """
+    if limit is None:
+        limit = len(a)
+    if len(a) != len(b):
+        return limit + 1
+    distance = 0
+    for x, y in zip(a, b):
+        if x != y:
+            distance += 1
+            if distance > limit:
+                break
+    return distance
+
+
+def _key(variant):
+    """Returns the key identifying a string in the index."""
+    return zlib.crc32(variant.encode('utf-8')) & 0xFFFFFFFF
+
+
+class LookupIndex(object):
+    """An index of the strings formed by removing letters from the beginning
+    of words, finding the words within a distance of a word.
+
+    The words are a sorted sequence of words. The identifiers of the words
+    having the strings identified by keys[i] are stored in
+    postings[offsets[i]:offsets[i + 1]]. The number of candidates checked by
+    the lookups is counted in candidates.
+    """
+
+    def __init__(self, words, max_distance, prefix_length, keys, offsets,
+                 postings):
+        self.words = words
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.keys = keys
+        self.offsets = offsets
+        self.postings = postings
+        self.candidates = 0
+
+    @classmethod
+    def build(cls, words, max_distance=2, prefix_length=10):
+        """Builds the index of the given words, finding the words up to
+        max_distance from a word.
+        """
+        if prefix_length <= max_distance:
+            raise ValueError('the prefix length must be greater than the '
+                             'maximum distance')
+        words = sorted(set(words))
+        postings = defaultdict(list)
+        for i, word in enumerate(words):
+            for variant in deletions(word[:prefix_length], max_distance):
+                postings[_key(variant)].append(i)
+        keys = array('I', sorted(postings))
+        offsets = array('I', [0])
+        identifiers = array('I')
+        for key in keys:
+            identifiers.extend(postings[key])
+            offsets.append(len(identifiers))
+        return cls(words, max_distance, prefix_length, keys, offsets,
+                   identifiers)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        i = bisect_left(self.words, word)
+        return i < len(self.words) and self.words[i] == word
+
+    def lookup(self, word, distance=1, hamming=False):
+        """Returns the sorted list of the (distance, word) pairs of the words
+        within the given edit distance of a word, or within the given Hamming
+        distance if hamming is true.
+
+        A ValueError is raised if the distance is greater than the maximum
+        distance of the index.
+        """
+        if not 0 <= distance <= self.max_distance:
+            raise ValueError('the distance must be between 0 and %d' %
+                             self.max_distance)
+        keys, offsets, postings = self.keys, self.offsets, self.postings
+        candidates = set()
+        for variant in deletions(word[:self.prefix_length], distance):
+            key = _key(variant)
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                candidates.update(postings[offsets[i]:offsets[i + 1]])
+        self.candidates += len(candidates)
+        found = []
+        # The bit vectors of the word are shared by all the candidates
+        vectors = _bit_vectors(word)
+        length = len(word)
+        for i in candidates:
+            other = self.words[i]
+            if hamming:
+                found_distance = hamming_distance(word, other, distance)
+            elif abs(len(other) - length) > distance:
+                continue
+            else:
+                found_distance = _bit_parallel_distance(vectors, length,
+                                                        other, distance)
+            if found_distance <= distance:
+                found.append((found_distance, other))
+        found.sort()
+        return found
+
+    def save(self, path, digest=b'\0' * 20, stamp=NO_STAMP):
+        """Writes the index to the file at the given path, with the checksum
+        and the stamp of the list of words it was built from.
+        """
+        words, size = _encode_words(self.words)
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, stamp[0], stamp[1], digest,
+                                 self.max_distance, self.prefix_length,
+                                 len(self.words), size, len(self.keys),
+                                 len(self.postings)))
+            for chunk in [words, _to_bytes(self.keys),
+                          _to_bytes(self.offsets), _to_bytes(self.postings)]:
+                f.write(chunk)
+
+
+class MappedLookupIndex(LookupIndex):
+    """A LookupIndex stored in a memory-mapped file."""
+
+    def __init__(self, path):
+        self._file = _MappedArrays(path, _HEADER, MAGIC, VERSION)
+        self.stamp = self._file.stamp
+        try:
+            (self.checksum, max_distance, prefix_length, count, size, keys,
+             postings) = self._file.fields
+            words = self._file.words(count, size)
+            arrays = [self._file.uints(length)
+                      for length in [keys, keys + 1, postings]]
+        except InvalidIndexError:
+            self._file.close()
+            raise
+        LookupIndex.__init__(self, words, max_distance, prefix_length,
+                             *arrays)
+
+    def close(self):
+        """Releases the memory-mapped file."""
+        self._file.close()
+
+
+def build_lookup_index(path, wordlist, max_distance=2, prefix_length=10):
+    """Builds the lookup index of the list of words read from the wordlist
+    file.
+    """
+    stamp = file_stamp(wordlist) or NO_STAMP
+    with read_all(wordlist) as data:
+        digest = checksum(data)
+        words = [word for length_words in words_by_length(data).values()
+                 for word in length_words]
+    LookupIndex.build(words, max_distance, prefix_length).save(
+        path, digest, stamp)
+
+
+def open_lookup_index(path, wordlist, max_distance=2, prefix_length=10,
+                      trust_stamp=False):
+    """Opens the lookup index of the list of words read from the wordlist
+    file.
+
+    The index is built again when it does not exist yet, when its checksum
+    shows that it is stale or when its parameters differ. The stamp of the
+    list is trusted like in index.open_index() when trust_stamp is True.
+    """
+    stamp = file_stamp(wordlist)
+    try:
+        index = MappedLookupIndex(path)
+    except (EnvironmentError, InvalidIndexError):
+        index = None
+    if index is not None and (index.max_distance != max_distance or
+                              index.prefix_length != prefix_length):
+        index.close()
+        index = None
+    if trust_stamp and index is not None and is_unchanged(index, stamp):
+        return index
+    stamp = stamp or NO_STAMP
+    with read_all(wordlist) as data:
+        digest = checksum(data)
+        if index is not None and index.checksum == digest:
+            if not trust_stamp or stamp in (NO_STAMP, index.stamp):
+                return index
+            # Only the stamp changed, the list is not read again next time
+            index.close()
+            _write_stamp(path, stamp)
+            return MappedLookupIndex(path)
+        words = [word for length_words in words_by_length(data).values()
+                 for word in length_words]
+    if index is not None:
+        index.close()
+    LookupIndex.build(words, max_distance, prefix_length).save(
+        path, digest, stamp)
+    return MappedLookupIndex(path)
+
+
+def main():
+    """Module entry point."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="""finds the words of a list of words within a Hamming or
+                       edit distance of the given words""")
+    # Cannot import the version from the package when running this module as a
+    # script
+    try:
+        from . import __version__
+        parser.add_argument('--version', action='version',
+                            version='%(prog)s ' + __version__)
+    except SystemError:
+        pass
+    parser.add_argument('-k', '--distance', metavar='K', type=int, default=1,
+                        help="""find the words within K changes, insertions
+                                or removals of letters (default: %(default)s)
+                                """)
+    parser.add_argument('--hamming', action='store_true',
+                        help="""only change letters, finding the words of the
+                                same length within a Hamming distance of K""")
+    parser.add_argument('--max-distance', metavar='K', type=int, default=2,
+                        help="""largest distance that can be looked up with
+                                the index (default: %(default)s)""")
+    parser.add_argument('--prefix-length', metavar='N', type=int, default=10,
+                        help="""number of letters at the beginning of the
+                                words that are indexed, a longer prefix makes
+                                a larger but more selective index
+                                (default: %(default)s)""")
+    parser.add_argument('--index', metavar='INDEX',
+                        help="""use the lookup index of the list of words
+                                stored in INDEX, which is built or rebuilt
+                                when it is missing, stale or built with other
+                                parameters""")
+    parser.add_argument('--queries', metavar='FILE',
+                        type=argparse.FileType('rb'),
+                        help="""look up the words read from FILE, or from the
+                                standard input if FILE is -, one per line""")
+    parser.add_argument('wordlist', type=argparse.FileType('rb'),
+                        help='a file containing a list of words')
+    parser.add_argument('words', metavar='WORD', nargs='*',
+                        type=word_argument, help='a word to look up')
+    add_stats_arguments(parser)
+    args = parser.parse_args()
+    if not 0 <= args.distance <= args.max_distance:
+        parser.error('the --distance argument must be between 0 and the '
+                     '--max-distance argument')
+    if args.prefix_length <= args.max_distance:
+        parser.error('the --prefix-length argument must be greater than the '
+                     '--max-distance argument')
+    stats = stats_from_arguments(args)
+    try:
+        with profiled(args.profile):
+            _lookup(args, stats)
+    finally:
+        stats.write(sys.stderr if args.stats else None, args.stats_json)
+
+
+def _lookup(args, stats):
+    """Runs the command of the parsed arguments, recording its statistics."""
+    words = list(args.words)
+    if args.queries is not None:
+        words.extend(line.strip() for line in
+                     codecs.iterdecode(args.queries, 'utf-8') if line.strip())
+    with stats.phase('index'):
+        if args.index is not None:
+            index = open_lookup_index(args.index, args.wordlist,
+                                      args.max_distance, args.prefix_length)
+        else:
+            with read_all(args.wordlist) as data:
+                index = LookupIndex.build(
+                    [word for length_words in words_by_length(data).values()
+                     for word in length_words],
+                    args.max_distance, args.prefix_length)
+    with stats.phase('lookup'):
+        for word in words:
+            found = index.lookup(word, args.distance, args.hamming)
+            print('%s: %s' % (word, ' '.join(other for distance, other
+                                             in found)))
+    stats.set('queries', len(words))
+    stats.set('candidates', index.candidates)
+
+
+if __name__ == '__main__':
+    main()
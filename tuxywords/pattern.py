@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Finds the words matching patterns where wildcards stand for any letter.
+
+A partition of RelationsBuilder.letter_partitions() is a pattern with a single
+wildcard: ('c', 't') groups the words matching 'c?t', so these patterns are
+answered by looking up the group of words of the partition. The other
+patterns are answered by intersecting the sets of words having a given letter
+at a given position, stored as bitsets of word identifiers.
+"""
+
+from __future__ import print_function
+
+import binascii
+import codecs
+import sys
+
+from collections import defaultdict
+
+from .stats import profiled
+from .stats import add_arguments as add_stats_arguments
+from .stats import from_arguments as stats_from_arguments
+from .transform import (MultiLengthRelationsBuilder, RelationsBuilder,
+                        _read_words, word_argument)
+
+WILDCARD = u'?'
+
+
+def _bitset(members):
+    """Returns an integer whose bits are set at the given positions."""
+    members = list(members)
+    if not members:
+        return 0
+    bits = bytearray(max(members) // 8 + 1)
+    for i in members:
+        bits[i >> 3] |= 1 << (i & 7)
+    bits.reverse()
+    return int(binascii.hexlify(bits), 16)
+
+
+def _members(bits):
+    """Generates the positions of the bits set in an integer, in increasing
+    order.
+    """
+    # The binary digits from the least significant one
+    digits = bin(bits)[:1:-1]
+    i = digits.find('1')
+    while i >= 0:
+        yield i
+        i = digits.find('1', i + 1)
+
+
+class PatternIndex(object):
+    """An index of words answering pattern queries.
+
+    The partitions answering the patterns with a single wildcard are looked
+    up in the source of the index, either a MultiLengthRelationsBuilder or a
+    WordIndex whose buckets are read from its file. The words of each length
+    are identified by their position in the sorted list of the words of that
+    length. For each position of a letter, the index maps each letter with
+    the bitset of the words having that letter at that position. The bitsets
+    of a length are computed the first time a pattern of that length has
+    several wildcards. The number of patterns answered by looking up a
+    partition and by intersecting bitsets are counted in partition_queries
+    and bitset_queries.
+    """
+
+    def __init__(self, words=None, wildcard=WILDCARD, source=None):
+        """Creates an index of the words of source and of the given words.
+
+        A new MultiLengthRelationsBuilder is used when source is None.
+        """
+        self.wildcard = wildcard
+        if source is None:
+            source = MultiLengthRelationsBuilder()
+        self.source = source
+        self.words = {}
+        self._letters = {}
+        self._indexed = {}
+        self.partition_queries = 0
+        self.bitset_queries = 0
+        if words is not None:
+            self.update(words)
+
+    def update(self, words):
+        """Adds words to the builder of the index.
+
+        The bits of the added words are set in the bitsets already computed
+        when the words sort after the words of their length. Otherwise the
+        identifiers of the words shift and the bitsets of their length are
+        computed again when they are needed. The words of a WordIndex cannot
+        be updated.
+        """
+        if not isinstance(self.source, MultiLengthRelationsBuilder):
+            raise TypeError('the words of an index cannot be updated')
+        added = defaultdict(set)
+        for word in words:
+            if word and word not in self:
+                self.source.add(word)
+                # The builder may only keep the words of some lengths
+                if word in self:
+                    added[len(word)].add(word)
+        for length, length_words in added.items():
+            words = self.words.get(length)
+            if words is None:
+                continue
+            length_words = sorted(length_words)
+            if words and length_words[0] < words[-1]:
+                del self.words[length]
+                del self._letters[length]
+                continue
+            letters = self._letters[length]
+            for i, word in enumerate(length_words, len(words)):
+                for position, letter in enumerate(word):
+                    letters[position][letter] = (
+                        letters[position].get(letter, 0) | 1 << i)
+            words.extend(length_words)
+
+    def __contains__(self, word):
+        return word in self._partitions(len(word))
+
+    def _partitions(self, length):
+        """Returns the builder or the indexed relations of the words of the
+        given length.
+        """
+        if isinstance(self.source, MultiLengthRelationsBuilder):
+            return self.source[length]
+        partitions = self._indexed.get(length)
+        if partitions is None:
+            partitions = self._indexed[length] = (
+                self.source.relations(length) or RelationsBuilder())
+        return partitions
+
+    def _bitsets(self, length):
+        """Returns the sorted list of the words of the given length and the
+        bitsets of each position, computing them if needed.
+        """
+        letters = self._letters.get(length)
+        if letters is None:
+            words = sorted(self._partitions(length))
+            positions = [defaultdict(list) for i in range(length)]
+            for i, word in enumerate(words):
+                for position, letter in enumerate(word):
+                    positions[position][letter].append(i)
+            letters = [dict((letter, _bitset(members))
+                            for letter, members in position.items())
+                       for position in positions]
+            self.words[length] = words
+            self._letters[length] = letters
+        return self.words[length], letters
+
+    def match(self, pattern):
+        """Returns the sorted list of the words matching a pattern, where each
+        wildcard matches any letter.
+        """
+        wildcards = [i for i, letter in enumerate(pattern)
+                     if letter == self.wildcard]
+        if len(wildcards) == 1:
+            self.partition_queries += 1
+            i = wildcards[0]
+            return sorted(self._partitions(len(pattern)).partition_words(
+                (pattern[:i], pattern[i+1:])))
+        if not wildcards:
+            return [pattern] if pattern in self else []
+        self.bitset_queries += 1
+        words, letters = self._bitsets(len(pattern))
+        bits = (1 << len(words)) - 1
+        for position, letter in zip(letters, pattern):
+            if letter != self.wildcard:
+                bits &= position.get(letter, 0)
+                if not bits:
+                    return []
+        return [words[i] for i in _members(bits)]
+
+
+def main():
+    """Module entry point."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="""finds the words of a list of words matching patterns
+                       where a wildcard stands for any letter, such as
+                       c?t""")
+    # Cannot import the version from the package when running this module as a
+    # script
+    try:
+        from . import __version__
+        parser.add_argument('--version', action='version',
+                            version='%(prog)s ' + __version__)
+    except SystemError:
+        pass
+    parser.add_argument('--wildcard', metavar='CHAR', type=word_argument,
+                        default=WILDCARD,
+                        help="""character standing for any letter in the
+                                patterns (default: %(default)s)""")
+    parser.add_argument('--index', metavar='INDEX',
+                        help="""use the partitions of the index of the list of
+                                words stored in INDEX, which is built or
+                                rebuilt when it is missing or stale""")
+    parser.add_argument('--queries', metavar='FILE',
+                        type=argparse.FileType('rb'),
+                        help="""match the patterns read from FILE, or from
+                                the standard input if FILE is -, one per line;
+                                the words of all the lengths of the patterns
+                                are read in a single pass""")
+    parser.add_argument('wordlist', type=argparse.FileType('rb'),
+                        help='a file containing a list of words')
+    parser.add_argument('patterns', metavar='PATTERN', nargs='*',
+                        type=word_argument, help='a pattern to match')
+    add_stats_arguments(parser)
+    args = parser.parse_args()
+    if len(args.wildcard) != 1:
+        parser.error('the --wildcard argument must be a single character')
+    stats = stats_from_arguments(args)
+    try:
+        with profiled(args.profile):
+            _match(args, stats)
+    finally:
+        stats.write(sys.stderr if args.stats else None, args.stats_json)
+
+
+def _match(args, stats):
+    """Runs the command of the parsed arguments, recording its statistics."""
+    patterns = list(args.patterns)
+    if args.queries is not None:
+        patterns.extend(line.strip() for line in
+                        codecs.iterdecode(args.queries, 'utf-8')
+                        if line.strip())
+    if args.index is not None:
+        from .index import open_index
+        with stats.phase('index'):
+            index = PatternIndex(wildcard=args.wildcard,
+                                 source=open_index(args.index, args.wordlist))
+    else:
+        # Only read the words of the lengths of the patterns
+        lengths = set(len(pattern) for pattern in patterns)
+        words = _read_words(args.wordlist, lengths, stats)[1]
+        with stats.phase('index'):
+            index = PatternIndex(words, args.wildcard)
+    matches = 0
+    with stats.phase('match'):
+        for pattern in patterns:
+            found = index.match(pattern)
+            matches += len(found)
+            print('%s: %s' % (pattern, ' '.join(found)))
+    stats.set('patterns', len(patterns))
+    stats.set('matches', matches)
+    stats.set('partition queries', index.partition_queries)
+    stats.set('bitset queries', index.bitset_queries)
+
+
+if __name__ == '__main__':
+    main()
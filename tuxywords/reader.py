@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Reads lists of words, memory-mapping the files when possible.
+
+A list of words is read by blocks that end on a line boundary. When the list
+is a regular file, the blocks are sliced from a memory map of the file instead
+of being read, and the lines are only decoded once they pass cheap checks on
+their bytes. Other files, such as the standard input, are read as a stream.
+"""
+
+import contextlib
+import io
+import mmap
+import os
+import stat
+
+# Default size of the blocks of a list of words
+BLOCK_SIZE = 1 << 20
+
+
+def map_file(source):
+    """Returns a read-only memory map of the content of a file object.
+
+    None is returned when the file cannot be memory-mapped, like a pipe, an
+    in-memory file or an empty file.
+    """
+    try:
+        fileno = source.fileno()
+        status = os.fstat(fileno)
+        if not stat.S_ISREG(status.st_mode) or status.st_size == 0:
+            return None
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (AttributeError, ValueError, EnvironmentError,
+            io.UnsupportedOperation):
+        return None
+
+
+def file_stamp(source):
+    """Returns the size and the modification time in nanoseconds of a file
+    object, or None when it is not a regular file.
+
+    A list of words whose stamp did not change since an index was built from
+    it can only be assumed to be unchanged: it may have been rewritten with
+    the same size within the resolution of the modification times.
+    """
+    try:
+        status = os.fstat(source.fileno())
+    except (AttributeError, ValueError, EnvironmentError,
+            io.UnsupportedOperation):
+        return None
+    if not stat.S_ISREG(status.st_mode):
+        return None
+    try:
+        mtime = status.st_mtime_ns
+    except AttributeError:
+        # Python 2 compatibility
+        mtime = int(status.st_mtime * 1000000000)
+    return status.st_size, mtime
+
+
+@contextlib.contextmanager
+def read_all(source):
+    """Returns a context manager giving the whole content of a file object,
+    memory-mapped when possible.
+
+    The memory map is closed when the context exits, so the content must not
+    be used afterwards.
+    """
+    buffer = map_file(source)
+    if buffer is None:
+        yield source.read()
+        return
+    try:
+        yield buffer
+    finally:
+        buffer.close()
+
+
+def iter_buffer_blocks(buffer, size=BLOCK_SIZE):
+    """Generates blocks of about size bytes sliced from a buffer.
+
+    Each block ends with a complete line, except the last block when the
+    buffer does not end with a newline.
+    """
+    start, length = 0, len(buffer)
+    while start < length:
+        end = start + size
+        if end < length:
+            newline = buffer.rfind(b'\n', start, end)
+            if newline < 0:
+                # The line is longer than a block
+                newline = buffer.find(b'\n', end)
+            end = length if newline < 0 else newline + 1
+        yield buffer[start:end]
+        start = end
+
+
+def _iter_stream_blocks(source, size):
+    """Generates blocks of about size bytes read from a stream."""
+    remainder = b''
+    while True:
+        block = source.read(size)
+        if not block:
+            if remainder:
+                yield remainder
+            return
+        block = remainder + block
+        end = block.rfind(b'\n') + 1
+        remainder = block[end:]
+        if end:
+            yield block[:end]
+
+
+def iter_blocks(source, size=BLOCK_SIZE):
+    """Generates blocks of about size bytes of the content of a file object.
+
+    Each block ends with a complete line, except the last block when the file
+    does not end with a newline.
+    """
+    buffer = map_file(source)
+    if buffer is None:
+        for block in _iter_stream_blocks(source, size):
+            yield block
+        return
+    try:
+        for block in iter_buffer_blocks(buffer, size):
+            yield block
+    finally:
+        buffer.close()
+
+
+def split_lines(block):
+    """Returns the lines of a block without their trailing newline."""
+    lines = block.split(b'\n')
+    if block.endswith(b'\n'):
+        # Nothing follows the last newline
+        lines.pop()
+    return lines
+
+
+def iter_lines(source, size=BLOCK_SIZE):
+    """Generates the lines of the content of a file object without their
+    trailing newline.
+    """
+    for block in iter_blocks(source, size):
+        for line in split_lines(block):
+            yield line
+
+
+def iter_words(lines, accept=None):
+    """Generates the words of UTF-8 encoded lines, stripped of the surrounding
+    whitespace.
+
+    accept is a function telling from the bytes of a line whether it may
+    contain an interesting word. The rejected lines are not decoded.
+    """
+    if accept is None:
+        for line in lines:
+            yield line.decode('utf-8').strip()
+    else:
+        for line in lines:
+            if accept(line):
+                yield line.decode('utf-8').strip()
+
+
+def _is_graphic(byte):
+    """Returns whether a byte is a printable ASCII character other than
+    space, and thus cannot be part of whitespace.
+    """
+    return b'!' <= byte <= b'~'
+
+
+def length_filter(lengths):
+    """Returns a function accepting the lines that may contain a word whose
+    length is in lengths.
+
+    A character is encoded with 1 to 4 bytes in UTF-8, so a line with fewer
+    bytes than the smallest length cannot contain a word of that length. A line
+    with more than 4 bytes per character of the largest length is only
+    accepted when it may be surrounded by whitespace.
+    """
+    minimum, maximum = min(lengths), 4 * max(lengths)
+
+    def accept(line):
+        size = len(line)
+        if size < minimum:
+            return False
+        if size <= maximum:
+            return True
+        line = line.strip()
+        return (len(line) <= maximum or not _is_graphic(line[:1]) or
+                not _is_graphic(line[-1:]))
+    return accept
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Rules deciding which words of a list are kept by the cleanup.
+
+A rule is a condition on the stripped word w, written as a Python expression,
+and the values it refers to. The rules of a cleanup are compiled together into
+a single function filtering a list of lines, so that each word is checked by
+one fused expression instead of one function call per rule.
+"""
+
+import re
+
+from collections import namedtuple
+
+# condition is an expression on the word w where {0}, {1}... stand for the
+# values
+Rule = namedtuple('Rule', ['condition', 'values'])
+
+# Regular expressions matching a character of each class
+CHARACTER_CLASSES = {
+    'alpha': r'[^\W\d_]',
+    'alnum': r'[^\W_]',
+    'digit': r'\d',
+    'ascii': r'[\x00-\x7f]',
+    'space': r' ',
+    'hyphen': r'-',
+    'apostrophe': r"'",
+}
+
+
+def no_leading_uppercase():
+    """Rejects the words starting with an uppercase letter."""
+    return Rule('not w[:1].isupper()', ())
+
+
+def no_apostrophe():
+    """Rejects the words containing an apostrophe."""
+    return Rule('"\'" not in w', ())
+
+
+def length_range(minimum=None, maximum=None):
+    """Only keeps the words whose length is between minimum and maximum,
+    included.
+    """
+    conditions = []
+    if minimum is not None:
+        conditions.append('%d <= len(w)' % minimum)
+    if maximum is not None:
+        conditions.append('len(w) <= %d' % maximum)
+    return Rule(' and '.join(conditions) or 'True', ())
+
+
+def characters(classes=(), extra=u''):
+    """Only keeps the words made of characters of the given classes, named in
+    CHARACTER_CLASSES, or among the extra characters.
+    """
+    alternatives = [CHARACTER_CLASSES[name] for name in classes]
+    if extra:
+        alternatives.append(u'[%s]' % u''.join(
+            u'\\' + character if character in u'\\]^-[' else character
+            for character in extra))
+    if not alternatives:
+        return Rule('not w', ())
+    pattern = re.compile(u'(?:%s)*\\Z' % u'|'.join(alternatives), re.UNICODE)
+    return Rule('{0}(w) is not None', (pattern.match,))
+
+
+def matching(pattern):
+    """Only keeps the words entirely matched by a regular expression."""
+    return Rule('{0}(w) is not None',
+                (re.compile(u'(?:%s)\\Z' % pattern, re.UNICODE).match,))
+
+
+# The rules of the original cleanup
+DEFAULT_RULES = (no_leading_uppercase(), no_apostrophe())
+
+_compiled = {}
+
+
+def compile_rules(rules=DEFAULT_RULES, lowercase=False):
+    """Returns a function returning the list of the stripped words of a list
+    of lines that satisfy all the rules.
+
+    The words are converted to lowercase after being checked when lowercase
+    is true.
+    """
+    key = (tuple(rules), lowercase)
+    function = _compiled.get(key)
+    if function is None:
+        function = _compiled[key] = _compile(rules, lowercase)
+    return function
+
+
+def _compile(rules, lowercase):
+    """Generates the code of the function returned by compile_rules()."""
+    namespace = {'_strip': type(u'').strip}
+    conditions = []
+    for rule in rules:
+        names = []
+        for value in rule.values:
+            names.append('_value%d' % len(namespace))
+            namespace[names[-1]] = value
+        conditions.append('(%s)' % rule.condition.format(*names))
+    source = ('def clean(lines):\n'
+              '    return [%s for w in map(_strip, lines)%s]\n' % (
+                  'w.lower()' if lowercase else 'w',
+                  ' if ' + ' and '.join(conditions) if conditions else ''))
+    exec(source, namespace)
+    return namespace['clean']
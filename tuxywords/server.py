@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Serves the transformations between words from a long-running process.
+
+The server keeps the relations between the words of every length in memory
+and reloads the list of words when the file changes. Clients send one JSON
+object per line, such as {"from": "cat", "to": "dog"}, and receive one JSON
+object per line, either {"transformation": ["cat", "cot", "cog", "dog"]} or
+{"error": "..."}. The query {"stats": true} returns the statistics of the
+caches of each word length. Queries are answered concurrently by separate
+threads.
+"""
+
+from __future__ import print_function
+
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+
+from gettext import gettext as _
+
+try:
+    import socketserver
+except ImportError:
+    # Python 2 compatibility
+    import SocketServer as socketserver
+
+from .transform import (NormalizedWordList, QueryError,
+                        TransformationFinders, load_relations,
+                        query_transformation, word_argument)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8421
+
+_logger = logging.getLogger(__name__)
+
+
+class TransformationService(object):
+    """Answers queries for transformations with the relations between the
+    words of a list kept in memory.
+    """
+
+    def __init__(self, path, graph='lazy', neighbor_cache=0,
+                 search='bidirectional', jobs=1, cache_size=0,
+                 tree_cache_size=0):
+        """Creates a service answering queries about the words listed in the
+        file at the given path.
+
+        The other arguments are the ones of transform.load_relations() and
+        transform.TransformationFinder.
+        """
+        self.path = path
+        self.graph = graph
+        self.neighbor_cache = neighbor_cache
+        self.search = search
+        self.jobs = jobs
+        self.cache_size = cache_size
+        self.tree_cache_size = tree_cache_size
+        self._signature = None
+        # The version of the list that could not be loaded
+        self._failed_signature = None
+        self._finders = None
+        self.reload()
+
+    def _file_signature(self):
+        """Returns what identifies a version of the list of words."""
+        status = os.stat(self.path)
+        return (status.st_mtime, status.st_size)
+
+    def reload(self):
+        """Loads the list of words and builds the relations between them.
+
+        The previous relations keep answering the queries until the new ones
+        are built. The caches are emptied.
+        """
+        signature = self._file_signature()
+        with open(self.path, 'rb') as wordlist:
+            words = NormalizedWordList(wordlist, None)
+            graphs = load_relations(words, None, self.graph,
+                                    self.neighbor_cache, jobs=self.jobs)
+        finders = TransformationFinders(lambda length: graphs.get(length, {}),
+                                        self.search, self.cache_size,
+                                        self.tree_cache_size,
+                                        components=True)
+        self._finders, self._signature = finders, signature
+
+    def reload_if_changed(self):
+        """Reloads the list of words if the file changed since it was loaded.
+
+        Returns whether the list was reloaded. When the list cannot be
+        loaded, the exception is raised, the previous relations keep
+        answering the queries and the list is only loaded again once it
+        changes again.
+        """
+        try:
+            signature = self._file_signature()
+        except EnvironmentError:
+            # The file is being replaced, try again later
+            return False
+        if signature in (self._signature, self._failed_signature):
+            return False
+        try:
+            self.reload()
+        except Exception:
+            self._failed_signature = signature
+            raise
+        return True
+
+    def relations(self, length):
+        """Returns the relations between the words of the given length."""
+        return self._finders(length).relations
+
+    def answer(self, query):
+        """Returns the answer to a query decoded from JSON."""
+        if isinstance(query, dict) and query.get('stats'):
+            return {'stats': dict((str(length), info._asdict())
+                                  for length, info in
+                                  self._finders.cache_info().items())}
+        if (not isinstance(query, dict) or 'from' not in query or
+                'to' not in query):
+            return {'error': 'a query must contain "from" and "to"'}
+        if not all(isinstance(query[key], type(u''))
+                   for key in ['from', 'to']):
+            return {'error': '"from" and "to" must be strings'}
+        try:
+            # Use the same version of the relations for the whole query
+            transformation = query_transformation(query['from'], query['to'],
+                                                  self._finders)
+        except QueryError as e:
+            return {'error': str(e)}
+        return {'transformation': transformation}
+
+
+class _QueryHandler(socketserver.StreamRequestHandler):
+    """Answers the queries sent on a connection, one per line."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                query = json.loads(line.decode('utf-8'))
+            except ValueError:
+                answer = {'error': 'a query must be a JSON object'}
+            else:
+                answer = self.server.service.answer(query)
+            self.wfile.write(json.dumps(answer).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """A server answering queries on a TCP socket."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        socketserver.TCPServer.__init__(self, address, _QueryHandler)
+        self.service = service
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class UnixServer(socketserver.ThreadingMixIn,
+                     socketserver.UnixStreamServer):
+        """A server answering queries on a Unix socket."""
+
+        daemon_threads = True
+
+        def __init__(self, path, service):
+            socketserver.UnixStreamServer.__init__(self, path, _QueryHandler)
+            self.service = service
+
+
+def watch(service, interval, stopped):
+    """Reloads the list of words of a service when it changes, checking every
+    interval seconds until the stopped event is set.
+
+    The errors raised while reloading the list are logged and the previous
+    relations keep answering the queries.
+    """
+    while not stopped.wait(interval):
+        try:
+            service.reload_if_changed()
+        except Exception:
+            _logger.exception('cannot reload %s', service.path)
+
+
+def query(address, start, end):
+    """Sends a query to a server and returns its decoded answer.
+
+    address is either the path of a Unix socket or a (host, port) tuple.
+    """
+    if isinstance(address, tuple):
+        connection = socket.create_connection(address)
+    else:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(address)
+    try:
+        stream = connection.makefile('rwb')
+        stream.write(json.dumps({'from': start, 'to': end}).encode('utf-8') +
+                     b'\n')
+        stream.flush()
+        answer = stream.readline()
+        stream.close()
+    finally:
+        connection.close()
+    if not answer:
+        raise EnvironmentError('the server closed the connection')
+    return json.loads(answer.decode('utf-8'))
+
+
+def _add_address_arguments(parser):
+    """Adds the arguments giving the address of the server."""
+    parser.add_argument('--socket', metavar='PATH',
+                        help='use the Unix socket at PATH instead of TCP')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help='host of the server (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='port of the server (default: %(default)s)')
+
+
+def main():
+    """Entry point of the 'twtransform serve' and 'twtransform client'
+    commands.
+    """
+    import argparse
+    from .transform import TransformationFinder
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]),
+        description="""answers queries for transformations from a
+                       long-running server""")
+    subparsers = parser.add_subparsers(dest='command')
+    serve = subparsers.add_parser(
+        'serve', help='serve the transformations between words')
+    _add_address_arguments(serve)
+    serve.add_argument('--search', choices=TransformationFinder.SEARCHES,
+                       default='bidirectional',
+                       help='search algorithm (default: %(default)s)')
+    serve.add_argument('--graph', choices=['lazy', 'full', 'compact'],
+                       default='lazy',
+                       help='form of the relations (default: %(default)s)')
+    serve.add_argument('--neighbor-cache', metavar='SIZE', type=int,
+                       default=0,
+                       help="""number of sets of relations kept in memory by
+                               the lazy graph (default: %(default)s)""")
+    serve.add_argument('--cache-size', metavar='SIZE', type=int, default=0,
+                       help="""number of transformations kept in memory for
+                               each word length (default: %(default)s)""")
+    serve.add_argument('--tree-cache-size', metavar='SIZE', type=int,
+                       default=0,
+                       help="""number of search trees kept in memory for each
+                               word length (default: %(default)s)""")
+    serve.add_argument('-j', '--jobs', metavar='N', type=int, default=1,
+                       help="""number of worker processes used to build the
+                               compact graph (default: %(default)s)""")
+    serve.add_argument('--reload-interval', metavar='SECONDS', type=float,
+                       default=2.0,
+                       help="""delay between the checks for changes of the
+                               list of words (default: %(default)s)""")
+    serve.add_argument('wordlist',
+                       help='a file containing a list of words')
+    client = subparsers.add_parser(
+        'client', help='query a server for a transformation')
+    _add_address_arguments(client)
+    client.add_argument('--from', dest='start', required=True,
+                        type=word_argument, help='word to transform from')
+    client.add_argument('--to', dest='end', required=True,
+                        type=word_argument, help='word to transform to')
+    args = parser.parse_args()
+    if args.command == 'serve' and args.jobs > 1 and args.graph != 'compact':
+        serve.error('the --jobs argument requires the --graph compact '
+                    'argument')
+    address = args.socket or (args.host, args.port)
+    if args.command == 'client':
+        try:
+            answer = query(address, args.start, args.end)
+        except EnvironmentError as e:
+            parser.exit(1, _('%s: error: %s\n') % (parser.prog, e))
+        if 'error' in answer:
+            parser.exit(1, _('%s: error: %s\n') % (parser.prog,
+                                                   answer['error']))
+        for word in answer['transformation']:
+            print(word)
+        return
+    service = TransformationService(args.wordlist, args.graph,
+                                    args.neighbor_cache, args.search,
+                                    args.jobs, args.cache_size,
+                                    args.tree_cache_size)
+    if args.socket:
+        server = UnixServer(args.socket, service)
+    else:
+        server = TCPServer(address, service)
+    stopped = threading.Event()
+    watcher = threading.Thread(target=watch,
+                               args=(service, args.reload_interval, stopped))
+    watcher.daemon = True
+    watcher.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopped.set()
+        server.server_close()
+        if args.socket:
+            os.remove(args.socket)
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Collects the wall time and memory of the phases of a command and counters
+describing its work.
+
+The statistics are reported either as text or as a JSON record, and the whole
+command can be profiled with cProfile.
+"""
+
+import json
+import sys
+
+from contextlib import contextmanager
+from timeit import default_timer
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    # Only available on Python 3.4 and later
+    tracemalloc = None
+
+
+def max_rss():
+    """Returns the high-water mark of the resident memory of the process in
+    bytes, or None when it is unknown.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak
+    # Kilobytes on the other platforms
+    return peak * 1024
+
+
+class Stats(object):
+    """The statistics of a run of a command.
+
+    Each phase records its wall time and the high-water mark of the resident
+    memory of the process at its end, which is the same for every phase once
+    a phase used more memory than the following ones. When the memory is
+    traced, each phase also records the peak of the memory allocated during
+    the phase, but tracing the allocations slows the phases down. The
+    counters map a name with a value or with a dictionnary mapping numbers
+    with values, such as a histogram.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=False):
+        """Creates empty statistics, tracing the memory allocated by the
+        phases with tracemalloc when trace_memory is True and tracemalloc is
+        available.
+        """
+        self.trace_memory = trace_memory and tracemalloc is not None
+        self.phases = []
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Records the time spent in the with statement as the given phase."""
+        # The memory allocated before the phase is not traced, unless the
+        # allocations were already traced by an enclosing phase
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        start = default_timer()
+        try:
+            yield
+        finally:
+            phase = {'name': name, 'seconds': default_timer() - start,
+                     'max_rss': max_rss()}
+            if tracing:
+                phase['peak_memory'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self.phases.append(phase)
+
+    def count(self, name, value=1):
+        """Adds a value to a counter.
+
+        The values of a dictionnary mapping numbers with values are added to
+        the matching values of the counter.
+        """
+        if isinstance(value, dict):
+            counter = self.counters.setdefault(name, {})
+            for key, key_value in value.items():
+                counter[key] = counter.get(key, 0) + key_value
+        else:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        """Sets the value of a counter."""
+        self.counters[name] = value
+
+    def update(self, name, values):
+        """Sets some values of a counter mapping numbers with values."""
+        self.counters.setdefault(name, {}).update(values)
+
+    def record(self):
+        """Returns the statistics as a dictionnary that can be encoded as
+        JSON.
+        """
+        return {'phases': self.phases, 'counters': self.counters}
+
+    def report(self):
+        """Generates the lines of the statistics as text."""
+        for phase in self.phases:
+            memory = ''
+            if phase.get('peak_memory') is not None:
+                memory += '  %8.1f MiB peak' % (
+                    phase['peak_memory'] / 1048576.0)
+            if phase['max_rss'] is not None:
+                memory += '  %8.1f MiB max rss' % (
+                    phase['max_rss'] / 1048576.0)
+            yield 'phase %-16s %10.6f s%s' % (phase['name'],
+                                               phase['seconds'], memory)
+        for name in sorted(self.counters):
+            value = self.counters[name]
+            if isinstance(value, dict):
+                yield '%s:' % name
+                for key in sorted(value, key=int):
+                    yield '  %-8s %s' % (key, value[key])
+            else:
+                yield '%s: %s' % (name, value)
+
+    def write(self, stream=None, path=None):
+        """Writes the statistics as text to stream and as a JSON record to the
+        file at path, when they are given.
+        """
+        if stream is not None:
+            for line in self.report():
+                stream.write(line + '\n')
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(self.record(), f, indent=2, sort_keys=True)
+
+
+class NullStats(Stats):
+    """Statistics that ignore everything, used when they are not wanted."""
+
+    enabled = False
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def count(self, name, value=1):
+        pass
+
+    def set(self, name, value):
+        pass
+
+    def update(self, name, values):
+        pass
+
+    def write(self, stream=None, path=None):
+        pass
+
+
+@contextmanager
+def profiled(path):
+    """Profiles the with statement with cProfile and dumps the profile to the
+    file at path, unless path is None.
+    """
+    if path is None:
+        yield
+        return
+    import cProfile
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+
+
+def add_arguments(parser):
+    """Adds the arguments controlling the statistics to an argument parser."""
+    parser.add_argument('--stats', action='store_true',
+                        help="""report the time of each phase, the
+                                high-water mark of the resident memory of the
+                                process at its end and what was processed on
+                                the standard error; the phases are run one
+                                after the other""")
+    parser.add_argument('--stats-json', metavar='FILE',
+                        help="""also write the statistics of --stats as JSON
+                                to FILE""")
+    parser.add_argument('--stats-memory', action='store_true',
+                        help="""also report the peak of the memory allocated
+                                during each phase with --stats and
+                                --stats-json, traced with tracemalloc on
+                                Python 3.4 and later, which slows the phases
+                                down""")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="""profile the command with cProfile and dump the
+                                profile to FILE""")
+
+
+def from_arguments(args):
+    """Returns the statistics to collect according to parsed arguments."""
+    if args.stats or args.stats_json is not None:
+        return Stats(args.stats_memory)
+    return NullStats()
@@ -24,10 +24,41 @@
 """Transforms words into other words by changing one letter at a time."""
 
 import codecs
+import heapq
+import os
+import stat
+import threading
+import warnings
+import weakref
 
-from collections import defaultdict, deque
+from array import array
+from collections import OrderedDict, defaultdict, deque, namedtuple
 from gettext import gettext as _
 
+from .reader import iter_lines, iter_words, length_filter
+from .stats import NullStats, profiled
+from .stats import add_arguments as add_stats_arguments
+from .stats import from_arguments as stats_from_arguments
+
+
+# Marks a word that does not share a partition with any other word
+NO_BUCKET = 0xFFFFFFFF
+
+NeighborStrategy = namedtuple('NeighborStrategy',
+                              ['name', 'alphabet', 'density'])
+
+
+class _Relations(dict):
+    """A dictionnary that maps a word with the set of words with which it has
+    a relation.
+
+    An unknown word has no relation, and looking it up does not add it to the
+    dictionnary.
+    """
+
+    def __missing__(self, word):
+        return set()
+
 
 class RelationsBuilder(object):
     """Constructs the relations between a set of words.
@@ -49,6 +80,28 @@ class RelationsBuilder(object):
         for i in range(length):
             yield (word[0:i], word[i+1:length])
 
+    BACKENDS = ('python', 'numpy')
+
+    NEIGHBOR_STRATEGIES = ('auto', 'buckets', 'substitutions')
+
+    @classmethod
+    def build_compact(cls, words, backend='python'):
+        """Returns the compact relations between the given words.
+
+        The python backend connects the words one at a time while the numpy
+        backend computes all the relations with vectorized operations. Both
+        backends return identical relations and the python backend is used
+        when NumPy is not installed.
+        """
+        if backend not in cls.BACKENDS:
+            raise ValueError('unknown backend: %r' % backend)
+        if backend == 'numpy':
+            from . import vectorized
+            if vectorized.numpy is not None:
+                return CompactRelations(*vectorized.compact_relations(words))
+            warnings.warn('NumPy is not installed, using the python backend')
+        return cls(words).compact()
+
     def __init__(self, words=None):
         """Creates a new builder that establishes the relations between words.
 
@@ -56,6 +109,11 @@ class RelationsBuilder(object):
         we want to establish the relations.
         """
         self._relations = defaultdict(set)
+        self._components = None
+        # The relations materialized by relations() and the views created by
+        # lazy_relations(), kept up to date by add() and remove()
+        self._graph = None
+        self._views = weakref.WeakSet()
         if words is not None:
             for word in words:
                 self.connect(word)
@@ -64,19 +122,808 @@ class RelationsBuilder(object):
         """Computes the relations of the given word with the words that were
         previously added.
         """
+        if self._graph is not None or self._views:
+            self.add(word)
+            return
+        self._components = None
         for partition in self.letter_partitions(word):
             # Group together the words having a common partition
             self._relations[partition].add(word)
 
+    def __contains__(self, word):
+        for partition in self.letter_partitions(word):
+            return word in self._relations.get(partition, ())
+        return False
+
+    def __iter__(self):
+        # Every word has exactly one partition with an empty prefix
+        for partition, words in self._relations.items():
+            if not partition[0]:
+                for word in words:
+                    yield word
+
+    def add(self, word):
+        """Adds a word, updating in place the partitions of the word and the
+        relations of its neighbors already materialized by relations() or
+        cached by the views returned by lazy_relations().
+
+        Nothing is done if the word was already added.
+        """
+        if word in self:
+            return
+        self._components = None
+        relations = set()
+        for partition in self.letter_partitions(word):
+            bucket = self._relations[partition]
+            bucket.add(word)
+            relations |= bucket
+        self._touch(word, relations)
+        if self._graph is not None:
+            self._graph[word] = relations
+            for neighbor in relations:
+                self._graph[neighbor].add(word)
+
+    def remove(self, word):
+        """Removes a word, updating in place the partitions of the word and
+        the relations of its neighbors like add().
+
+        A KeyError is raised if the word is unknown.
+        """
+        if word not in self:
+            raise KeyError(word)
+        self._components = None
+        relations = set()
+        for partition in self.letter_partitions(word):
+            bucket = self._relations[partition]
+            relations |= bucket
+            bucket.discard(word)
+            if not bucket:
+                del self._relations[partition]
+        self._touch(word, relations)
+        if self._graph is not None:
+            for neighbor in relations:
+                self._graph[neighbor].discard(word)
+            del self._graph[word]
+
+    def _touch(self, word, relations):
+        """Drops the relations of a word and of its neighbors from the caches
+        of the views.
+        """
+        for view in self._views:
+            view.clear_cache(relations)
+
+    def partition_words(self, partition):
+        """Returns the set of the words having the given partition, which are
+        the words matching the pattern formed by the prefix, any letter and
+        the suffix of the partition.
+        """
+        return set(self._relations.get(partition, ()))
+
+    def bucket_sizes(self):
+        """Returns a dictionnary that maps a number of words with the number
+        of partitions shared by that many words.
+        """
+        sizes = defaultdict(int)
+        for words in self._relations.values():
+            sizes[len(words)] += 1
+        return dict(sizes)
+
+    def neighbor_strategy(self):
+        """Returns the NeighborStrategy the lazy relations should use to find
+        the relations of a word, with the measures it is based on.
+
+        The buckets strategy reads the words of the partition of the word at
+        each position, that is density words on average, while the
+        substitutions strategy looks up every other letter of the alphabet at
+        each position in the set of words. The strategy doing the fewest
+        operations per position is chosen: the substitutions are worth it for
+        small alphabets and dense partitions.
+        """
+        alphabet = set()
+        total = squares = 0
+        for partition, words in self._relations.items():
+            if not partition[0]:
+                for word in words:
+                    alphabet.update(word)
+            total += len(words)
+            squares += len(words) * len(words)
+        # The average size of the partition of a word, each word weighing in
+        # each of its partitions
+        density = float(squares) / total if total else 0.0
+        name = 'buckets'
+        if alphabet and len(alphabet) - 1 < density:
+            name = 'substitutions'
+        return NeighborStrategy(name, len(alphabet), density)
+
+    def components(self):
+        """Returns the connected components of the relations.
+
+        The components are computed once by merging the words of each
+        partition and computed again after words are added or removed.
+        """
+        if self._components is None:
+            self._components = Components.of_groups(self._relations.values())
+        return self._components
+
     def relations(self):
         """Returns a dictionnary that maps a word with the set of words with
         which it has a relation.
+
+        The dictionnary is computed once and then kept up to date by add()
+        and remove(), so it must not be modified. Looking up an unknown word
+        returns an empty set without adding the word.
+        """
+        if self._graph is None:
+            graph = _Relations()
+            for relation in self._relations.values():
+                for word in relation:
+                    graph.setdefault(word, set()).update(relation)
+            self._graph = graph
+        return self._graph
+
+    def lazy_relations(self, cache_size=0, strategy='buckets'):
+        """Returns a view of the relations that computes the relations of a
+        word when they are requested.
+
+        Up to cache_size sets of relations are kept in a cache, which is kept
+        up to date by add() and remove(). The relations of a word are found
+        with the given strategy, either 'buckets' or 'substitutions' (see
+        LazyRelations), or the one returned by neighbor_strategy() if it is
+        'auto'.
+        """
+        if strategy not in self.NEIGHBOR_STRATEGIES:
+            raise ValueError('unknown neighbor strategy: %r' % strategy)
+        if strategy == 'auto':
+            strategy = self.neighbor_strategy().name
+        view = LazyRelations(self._relations, cache_size, strategy)
+        self._views.add(view)
+        return view
+
+    def compact(self):
+        """Returns the relations between the words stored as arrays of word
+        identifiers.
+
+        The compact relations are a snapshot that is not updated when words
+        are added or removed.
+        """
+        words = sorted(set().union(*self._relations.values()))
+        ids = dict((word, i) for i, word in enumerate(words))
+        buckets = dict((partition, [ids[word] for word in relation])
+                       for partition, relation in self._relations.items())
+        offsets = array('I', [0])
+        neighbors = array('I')
+        for word in words:
+            relations = set()
+            for partition in self.letter_partitions(word):
+                relations.update(buckets[partition])
+            neighbors.extend(sorted(relations))
+            offsets.append(len(neighbors))
+        return CompactRelations(words, offsets, neighbors)
+
+
+class MultiLengthRelationsBuilder(object):
+    """Constructs the relations between words of several lengths at once.
+
+    The words are dispatched to one RelationsBuilder for each word length.
+    """
+
+    def __init__(self, words=None, lengths=None):
+        """Creates a new builder that establishes the relations between words.
+
+        words is an iterable that contains the initial list of words. Only the
+        words whose length is in lengths are kept, unless lengths is None.
+        """
+        self.lengths = None if lengths is None else frozenset(lengths)
+        self.builders = {}
+        if words is not None:
+            for word in words:
+                self.connect(word)
+
+    def __getitem__(self, length):
+        """Returns the builder of the words of the given length."""
+        builder = self.builders.get(length)
+        if builder is None:
+            builder = RelationsBuilder()
+        return builder
+
+    def connect(self, word):
+        """Computes the relations of the given word with the words of the same
+        length that were previously added.
+        """
+        length = len(word)
+        if self.lengths is not None and length not in self.lengths:
+            return
+        self._builder(length).connect(word)
+
+    def add(self, word):
+        """Adds a word to the builder of its length, updating the relations
+        in place like RelationsBuilder.add().
+        """
+        length = len(word)
+        if self.lengths is not None and length not in self.lengths:
+            return
+        self._builder(length).add(word)
+
+    def remove(self, word):
+        """Removes a word from the builder of its length like
+        RelationsBuilder.remove().
+        """
+        builder = self.builders.get(len(word))
+        if builder is None:
+            raise KeyError(word)
+        builder.remove(word)
+
+    def edit_relations(self):
+        """Returns a view of the relations between the words of every length
+        where a word can also be transformed by inserting or removing one of
+        its letters.
+        """
+        return EditRelations(self.builders)
+
+    def _builder(self, length):
+        """Returns the builder of the words of the given length, creating it
+        if needed.
+        """
+        builder = self.builders.get(length)
+        if builder is None:
+            builder = self.builders[length] = RelationsBuilder()
+        return builder
+
+
+def _position_buckets(task):
+    """Groups the words of the same length having the same letters except at
+    one position, in a worker process.
+
+    task is the newline-separated UTF-8 encoding of the sorted words and the
+    position of the removed letter. Returns the offsets of the buckets of
+    several words in members, the identifiers of the words of each bucket and
+    the number of the bucket of each word, or NO_BUCKET, as arrays of
+    unsigned integers. The buckets are ordered by partition.
+    """
+    data, position = task
+    words = data.decode('utf-8').split('\n')
+    groups = defaultdict(list)
+    for i, word in enumerate(words):
+        groups[word[:position] + word[position + 1:]].append(i)
+    bucket_offsets = array('I', [0])
+    members = array('I')
+    bucket_of = array('I', [NO_BUCKET]) * len(words)
+    # The prefixes have the same length, so the keys sort like the partitions
+    for key in sorted(key for key, ids in groups.items() if len(ids) > 1):
+        for i in groups[key]:
+            bucket_of[i] = len(bucket_offsets) - 1
+        members.extend(groups[key])
+        bucket_offsets.append(len(members))
+    return bucket_offsets, members, bucket_of
+
+
+def _neighbor_rows(task):
+    """Computes consecutive rows of compact relations from the buckets of
+    every position, in a worker process.
+
+    task is the identifier of the first word of the rows and, for each
+    position, the offsets and the members of its buckets and the numbers of
+    the buckets of the words of the rows. Returns the offsets of the rows in
+    neighbors, starting at 0, and the neighbors.
+    """
+    start, positions = task
+    offsets = array('I', [0])
+    neighbors = array('I')
+    for i in range(len(positions[0][2])):
+        related = set([start + i])
+        for bucket_offsets, members, bucket_of in positions:
+            bucket = bucket_of[i]
+            if bucket != NO_BUCKET:
+                related.update(members[bucket_offsets[bucket]:
+                                       bucket_offsets[bucket + 1]])
+        neighbors.extend(sorted(related))
+        offsets.append(len(neighbors))
+    return offsets, neighbors
+
+
+def _bucket_components(task):
+    """Computes the connected components of words from the buckets of every
+    position.
+
+    task is the number of words and, for each position, the offsets and the
+    members of its buckets. Returns the list of the sizes of the components
+    and the number of the component of each word as an array, numbered like
+    RelationsBuilder.components().
+    """
+    count, positions = task
+    groups = [[i] for i in range(count)]
+    for bucket_offsets, members in positions:
+        groups.extend(members[bucket_offsets[bucket]:
+                              bucket_offsets[bucket + 1]]
+                      for bucket in range(len(bucket_offsets) - 1))
+    components = Components.of_groups(groups)
+    return (components.sizes(),
+            array('I', [components[i] for i in range(count)]))
+
+
+def _build_buckets(words_of, imap=map):
+    """Returns a dictionnary that maps a word length with the list of the
+    buckets of each position computed by _position_buckets().
+
+    words_of is a dictionnary that maps a word length with the sorted list of
+    the words of that length. imap applies _position_buckets() to the tasks
+    in order, like the imap() of a multiprocessing.Pool spreading the
+    positions over its worker processes.
+    """
+    lengths = sorted(words_of)
+    tasks = []
+    for length in lengths:
+        data = u'\n'.join(words_of[length]).encode('utf-8')
+        tasks.extend((data, position) for position in range(length))
+    results = iter(imap(_position_buckets, tasks))
+    return dict((length, [next(results) for position in range(length)])
+                for length in lengths)
+
+
+def _compact_relations(words_of, jobs, stats):
+    """Returns a dictionnary that maps a word length with the CompactRelations
+    between the words of that length.
+
+    The words of each position of each length are grouped first, then
+    consecutive rows of the relations are computed from these groups. When
+    jobs is greater than 1, both steps are spread over that many worker
+    processes that send arrays back, which the parent process only
+    concatenates.
+    """
+    words_of = dict((length, sorted(set(words)))
+                    for length, words in words_of.items() if length)
+    pool = None
+    imap = map
+    if jobs > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs)
+        imap = pool.imap
+    try:
+        with stats.phase('partition'):
+            buckets = _build_buckets(words_of, imap)
+        if stats.enabled:
+            _count_buckets(words_of, buckets, stats)
+        with stats.phase('relations'):
+            # Several tasks per worker to balance the load
+            size = max(1, -(-sum(len(words) for words in words_of.values())
+                            // (jobs * 4)))
+            tasks = [(start, [(bucket_offsets, members,
+                               bucket_of[start:start + size])
+                              for bucket_offsets, members, bucket_of
+                              in buckets[length]])
+                     for length in sorted(words_of)
+                     for start in range(0, len(words_of[length]), size)]
+            rows = iter(imap(_neighbor_rows, tasks))
+            relations = {}
+            for length in sorted(words_of):
+                offsets = array('I', [0])
+                neighbors = array('I')
+                for start in range(0, len(words_of[length]), size):
+                    row_offsets, row_neighbors = next(rows)
+                    base = len(neighbors)
+                    offsets.extend(base + offset
+                                   for offset in row_offsets[1:])
+                    neighbors.extend(row_neighbors)
+                relations[length] = CompactRelations(words_of[length],
+                                                     offsets, neighbors)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return relations
+
+
+class LRUCache(object):
+    """A cache holding a bounded number of items that evicts the least
+    recently used item when it is full.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        # The cache can be shared by the threads of a server
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """Returns the item with the given key, or default if the key is not
+        in the cache.
+        """
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+            # Mark the item as the most recently used
+            self._items[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            if len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def discard(self, key):
+        """Removes the item with the given key, if it is in the cache."""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        """Removes all the items from the cache."""
+        with self._lock:
+            self._items.clear()
+
+
+class LazyRelations(object):
+    """The relations between words computed on demand from the groups of
+    words having a common partition.
+
+    It behaves like the dictionnary returned by RelationsBuilder.relations()
+    without having to compute the relations of every word. The builder drops
+    the sets of relations kept in the cache when they change.
+
+    The relations of a word are either the union of the groups of its
+    partitions (buckets strategy), or the words found by replacing each of
+    its letters by every letter of the alphabet (substitutions strategy),
+    which needs a set of the words.
+    """
+
+    def __init__(self, partitions, cache_size=0, strategy='buckets'):
+        if strategy not in ('buckets', 'substitutions'):
+            raise ValueError('unknown neighbor strategy: %r' % strategy)
+        self._partitions = partitions
+        self._cache = LRUCache(cache_size)
+        self._components = None
+        self.strategy = strategy
+        # The set of words and their letters, used by the substitutions
+        self._words = None
+        self._alphabet = None
+
+    def __contains__(self, word):
+        for partition in RelationsBuilder.letter_partitions(word):
+            return word in self._partitions.get(partition, ())
+        return False
+
+    def __iter__(self):
+        # Every word has exactly one partition with an empty prefix
+        for partition, words in self._partitions.items():
+            if not partition[0]:
+                for word in words:
+                    yield word
+
+    def __len__(self):
+        return sum(len(words) for partition, words in self._partitions.items()
+                   if not partition[0])
+
+    def __getitem__(self, word):
+        relations = self._cache.get(word)
+        if relations is not None:
+            return relations
+        if self.strategy == 'substitutions':
+            relations = self._substitutions(word)
+            if relations:
+                self._cache[word] = relations
+            return relations
+        relations = set()
+        for partition in RelationsBuilder.letter_partitions(word):
+            words = self._partitions.get(partition)
+            if words is None or word not in words:
+                # Unknown word
+                return set()
+            relations |= words
+        self._cache[word] = relations
+        return relations
+
+    def _substitutions(self, word):
+        """Returns the relations of a word found by substituting each of its
+        letters.
+        """
+        if self._words is None:
+            self._words = set(self)
+            self._alphabet = set()
+            for known in self._words:
+                self._alphabet.update(known)
+        words = self._words
+        if word not in words:
+            return set()
+        relations = set([word])
+        alphabet = self._alphabet
+        for i in range(len(word)):
+            prefix, suffix = word[:i], word[i+1:]
+            for letter in alphabet:
+                candidate = prefix + letter + suffix
+                if candidate in words:
+                    relations.add(candidate)
+        return relations
+
+    def buckets(self, word):
+        """Generates the partitions of a word with the set of words sharing
+        each of them, or nothing if the word is unknown.
+        """
+        if word not in self:
+            return
+        for partition in RelationsBuilder.letter_partitions(word):
+            yield partition, self._partitions[partition]
+
+    def clear_cache(self, words=None):
+        """Removes the relations of the given words from the cache, or all
+        the cached relations and components if words is None.
+        """
+        self._components = None
+        if words is None:
+            self._cache.clear()
+            self._words = self._alphabet = None
+        else:
+            for word in words:
+                self._cache.discard(word)
+                if self._words is None:
+                    continue
+                # The alphabet is only used to find candidates, it does not
+                # matter that it keeps the letters of removed words
+                if word in self:
+                    self._words.add(word)
+                    self._alphabet.update(word)
+                else:
+                    self._words.discard(word)
+
+    def components(self):
+        """Returns the connected components of the relations."""
+        if self._components is None:
+            self._components = Components.of_groups(
+                self._partitions.values())
+        return self._components
+
+
+class EditRelations(object):
+    """The relations between words of any length, where a word is related to
+    the words formed by changing, inserting or removing one of its letters.
+
+    The groups of words having a common partition are shared by the three
+    kinds of transformations: the partition ('ca', 't') of the words of four
+    letters groups the words formed by inserting a letter in 'cat' after 'ca',
+    while 'ct' is formed by removing a letter from 'cat' and is a word if it
+    is in the group of its own partition ('', 't'). The relations of a word
+    are thus found by looking up the partitions of the words of its length
+    and of the next length, without storing any relation.
+
+    builders is a dictionnary that maps a word length with the
+    RelationsBuilder of the words of that length, and the words added to the
+    builders are visible in the relations.
+    """
+
+    def __init__(self, builders):
+        self._builders = builders
+
+    def heuristic(self, a, b):
+        """Returns the difference between the lengths of two words, which
+        never overestimates the number of transformations between them since
+        a transformation changes the length of a word by at most one letter.
+        """
+        return abs(len(a) - len(b))
+
+    def _partitions(self, length):
+        builder = self._builders.get(length)
+        return {} if builder is None else builder._relations
+
+    def __contains__(self, word):
+        builder = self._builders.get(len(word))
+        return builder is not None and word in builder
+
+    def __iter__(self):
+        for length in sorted(self._builders):
+            # Every word has exactly one partition with an empty prefix
+            for partition, words in self._partitions(length).items():
+                if not partition[0]:
+                    for word in words:
+                        yield word
+
+    def __len__(self):
+        return sum(len(words) for length in self._builders
+                   for partition, words in self._partitions(length).items()
+                   if not partition[0])
+
+    def __getitem__(self, word):
+        length = len(word)
+        if not length:
+            # The empty word has no partition and is never a word
+            return set()
+        partitions = self._partitions(length)
+        shorter = self._builders.get(length - 1)
+        relations = set()
+        for partition in RelationsBuilder.letter_partitions(word):
+            words = partitions.get(partition)
+            if words is None or word not in words:
+                # Unknown word
+                return set()
+            relations |= words
+            # Removing the letter
+            removed = partition[0] + partition[1]
+            if shorter is not None and removed in shorter:
+                relations.add(removed)
+        # Inserting a letter at each position
+        longer = self._partitions(length + 1)
+        for i in range(length + 1):
+            words = longer.get((word[:i], word[i:]))
+            if words is not None:
+                relations |= words
+        return relations
+
+
+class CompactRelations(object):
+    """The relations between words stored in compressed sparse row form.
+
+    Each word is identified by its position in the sorted list of words and
+    the identifiers of the words related to the word i are stored in
+    neighbors[offsets[i]:offsets[i + 1]].
+
+    It behaves like the dictionnary returned by RelationsBuilder.relations()
+    and the relations between identifiers are available through adjacency.
+    """
+
+    def __init__(self, words, offsets, neighbors):
+        self.words = words
+        self.ids = dict((word, i) for i, word in enumerate(words))
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.adjacency = _Adjacency(offsets, neighbors)
+        self._components = None
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, word):
+        i = self.ids.get(word)
+        if i is None:
+            return set()
+        return set(self.words[j] for j in self.adjacency[i])
+
+    def components(self):
+        """Returns the connected components of the relations."""
+        if self._components is None:
+            adjacency = self.adjacency
+            roots = _union_find(adjacency[i] for i in range(len(self.words)))
+            self._components = Components.of_roots(
+                dict((self.words[i], root) for i, root in roots.items()))
+        return self._components
+
+
+class _Adjacency(object):
+    """Maps an identifier with the identifiers it is related to."""
+
+    def __init__(self, offsets, neighbors):
+        self.offsets = offsets
+        self.neighbors = neighbors
+
+    def __getitem__(self, i):
+        return self.neighbors[self.offsets[i]:self.offsets[i + 1]]
+
+
+def _union_find(groups):
+    """Merges the groups of elements sharing an element.
+
+    Returns a dictionnary that maps each element with the representative of
+    the merged group it belongs to.
+    """
+    parents = {}
+    sizes = {}
+
+    def find(element):
+        root = parents.setdefault(element, element)
+        while root != parents[root]:
+            # Path halving keeps the trees flat
+            parents[root] = root = parents[parents[root]]
+        return root
+
+    for group in groups:
+        group = iter(group)
+        for first in group:
+            break
+        else:
+            continue
+        root = find(first)
+        for element in group:
+            other = find(element)
+            if other == root:
+                continue
+            # Attach the smallest tree to the largest one
+            if sizes.get(root, 1) < sizes.get(other, 1):
+                root, other = other, root
+            parents[other] = root
+            sizes[root] = sizes.get(root, 1) + sizes.pop(other, 1)
+    return dict((element, find(element)) for element in parents)
+
+
+class Components(object):
+    """The connected components of the relations between elements.
+
+    Two elements are in the same component when there is a transformation
+    between them. The components are numbered by decreasing size, the ties
+    being broken by their smallest element.
+    """
+
+    def __init__(self, component_of, sizes):
+        """Creates the components from a function returning the number of
+        the component of an element, or None for an unknown element, and the
+        list of the sizes of the components.
+        """
+        self._component_of = component_of
+        self._sizes = sizes
+
+    @classmethod
+    def of_groups(cls, groups):
+        """Returns the components of the relations in which all the elements
+        of a group are related.
+        """
+        return cls.of_roots(_union_find(groups))
+
+    @classmethod
+    def of_roots(cls, roots):
+        """Returns the components from a dictionnary that maps each element
+        with the representative of its component.
+        """
+        members = defaultdict(list)
+        for element, root in roots.items():
+            members[root].append(element)
+        ordered = sorted(members.values(),
+                         key=lambda elements: (-len(elements), min(elements)))
+        component_of = {}
+        for number, elements in enumerate(ordered):
+            for element in elements:
+                component_of[element] = number
+        return cls(component_of.get, [len(elements) for elements in ordered])
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def __getitem__(self, element):
+        number = self._component_of(element)
+        if number is None:
+            raise KeyError(element)
+        return number
+
+    def get(self, element, default=None):
+        """Returns the number of the component of an element, or default if
+        the element is unknown.
         """
-        graph = defaultdict(set)
-        for relation in self._relations.values():
-            for word in relation:
-                graph[word] |= relation
-        return graph
+        number = self._component_of(element)
+        return default if number is None else number
+
+    def connected(self, a, b):
+        """Tells whether there is a transformation between two elements."""
+        number = self._component_of(a)
+        return number is not None and number == self._component_of(b)
+
+    def sizes(self):
+        """Returns the list of the sizes of the components, by number."""
+        return list(self._sizes)
+
+
+def connected_components(relations):
+    """Returns the connected components of any form of relations.
+
+    The relations computing their own components are asked for them, the
+    others are explored through their sets of relations.
+    """
+    components = getattr(relations, 'components', None)
+    if components is not None:
+        return components()
+    return Components.of_groups([word] + list(relations[word])
+                                for word in relations)
 
 
 class NoTransformationError(Exception):
@@ -85,44 +932,731 @@ class NoTransformationError(Exception):
     pass
 
 
+class _SearchTree(object):
+    """The state of a breadth-first search rooted at an element.
+
+    The search is done one layer of the tree at a time and can be interrupted
+    whenever an interesting element is discovered: an element is only removed
+    from the boundary once all its relations are known.
+    """
+
+    def __init__(self, root, relations):
+        self.relations = relations
+        self.parents = {root: None}
+        # Elements of the current layer whose relations are not all known
+        self.boundary = deque([root])
+        # Elements discovered while expanding the current layer
+        self.next_boundary = deque()
+        # Number of times the relations of an element were read
+        self.expanded = 0
+        # A cached tree is grown by a single thread at a time
+        self.lock = threading.Lock()
+
+    def frontier(self):
+        """Returns the elements of the layer to expand next."""
+        return self.boundary or self.next_boundary
+
+    def expand_layer(self, found):
+        """Discovers the relations of the elements in the current layer.
+
+        The expansion stops as soon as a discovered element satisfies found,
+        and that element is returned. None is returned when the whole layer has
+        been expanded.
+        """
+        if not self.boundary:
+            self.boundary, self.next_boundary = self.next_boundary, deque()
+        while self.boundary:
+            element = self.boundary[0]
+            self.expanded += 1
+            for relation in self.relations[element]:
+                # Ignore elements with a known parent
+                if relation not in self.parents:
+                    self.parents[relation] = element
+                    self.next_boundary.append(relation)
+                    if found(relation):
+                        return relation
+            self.boundary.popleft()
+        return None
+
+    def path(self, element):
+        """Generates the elements from the given element up to the root."""
+        while element is not None:
+            yield element
+            element = self.parents[element]
+
+
+class _BucketSearchTree(_SearchTree):
+    """The state of a breadth-first search over the groups of words having a
+    common partition.
+
+    The words of a group are all related to each other, so a group is only
+    scanned once: its words are all discovered by the first word of the group
+    that is expanded. A search thus reads each word of a group once instead of
+    reading every relation between the words of the group.
+    """
+
+    def __init__(self, root, relations):
+        _SearchTree.__init__(self, root, relations)
+        # Identifiers of the groups whose words have all been discovered
+        self.used = set()
+
+    def expand_layer(self, found):
+        """Discovers the words of the groups of the words in the current
+        layer, like _SearchTree.expand_layer().
+        """
+        if not self.boundary:
+            self.boundary, self.next_boundary = self.next_boundary, deque()
+        while self.boundary:
+            element = self.boundary[0]
+            self.expanded += 1
+            for key, bucket in self.relations.buckets(element):
+                if key in self.used:
+                    continue
+                for relation in bucket:
+                    if relation not in self.parents:
+                        self.parents[relation] = element
+                        self.next_boundary.append(relation)
+                        if found(relation):
+                            # The group is scanned again when resuming
+                            return relation
+                self.used.add(key)
+            self.boundary.popleft()
+        return None
+
+
+class DistanceMap(object):
+    """The distances from a source element to every element related to it,
+    directly or not, found by a single breadth-first search.
+
+    parents maps each reached element with the element it was reached from,
+    so that the shortest transformation from the source to any of them is
+    known without searching again.
+    """
+
+    def __init__(self, source, relations):
+        self.source = source
+        self.distances = {source: 0}
+        self.parents = {source: None}
+        # Number of times the relations of an element were read
+        self.expanded = 0
+        boundary = deque([source])
+        while boundary:
+            element = boundary.popleft()
+            self.expanded += 1
+            distance = self.distances[element] + 1
+            for relation in relations[element]:
+                if relation not in self.distances:
+                    self.distances[relation] = distance
+                    self.parents[relation] = element
+                    boundary.append(relation)
+        # The last element reached is one of the farthest
+        self.eccentricity = self.distances[element]
+
+    def __contains__(self, element):
+        return element in self.distances
+
+    def __len__(self):
+        return len(self.distances)
+
+    def path(self, target):
+        """Returns the shortest list of transformations from the source to
+        the target element.
+        """
+        if target not in self.parents:
+            raise NoTransformationError()
+        transformation = []
+        while target is not None:
+            transformation.append(target)
+            target = self.parents[target]
+        transformation.reverse()
+        return transformation
+
+    def farthest(self):
+        """Returns the sorted list of the elements the farthest from the
+        source.
+        """
+        return sorted(element for element, distance in self.distances.items()
+                      if distance == self.eccentricity)
+
+    def translate(self, elements):
+        """Returns the distance map with each element replaced by
+        elements[element], such as the word of an identifier.
+        """
+        translated = DistanceMap.__new__(DistanceMap)
+        translated.source = elements[self.source]
+        translated.distances = dict(
+            (elements[element], distance)
+            for element, distance in self.distances.items())
+        translated.parents = dict(
+            (elements[element], None if parent is None else elements[parent])
+            for element, parent in self.parents.items())
+        translated.expanded = self.expanded
+        translated.eccentricity = self.eccentricity
+        return translated
+
+
+class _ShortestPaths(object):
+    """The directed acyclic graph of all the shortest transformations between
+    two elements.
+
+    It is built by a single breadth-first search from the end element, one
+    layer of elements at the same distance at a time, that stops with the
+    layer of the start element. Each element only keeps the elements of the
+    previous layer it is related to, its successors on the way to the end
+    element, and only the elements reached from the start element are kept.
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.successors = None
+        # Number of times the relations of an element were read
+        self.expanded = 0
+
+    def search(self, relations):
+        """Builds the graph of the shortest transformations with the given
+        relations between the elements.
+        """
+        start, end = self.start, self.end
+        successors = {end: []}
+        layer = [end]
+        while start not in successors:
+            next_layer = {}
+            for element in layer:
+                self.expanded += 1
+                for relation in relations[element]:
+                    if relation not in successors:
+                        next_layer.setdefault(relation, []).append(element)
+            if not next_layer:
+                # The start and end elements are not related
+                raise NoTransformationError()
+            successors.update(next_layer)
+            layer = list(next_layer)
+        self.successors = {}
+        pending = [start]
+        while pending:
+            element = pending.pop()
+            if element not in self.successors:
+                self.successors[element] = sorted(successors[element])
+                pending.extend(self.successors[element])
+
+    def count(self):
+        """Returns the number of shortest transformations without listing
+        them.
+        """
+        counts = {self.end: 1}
+        pending = [self.start]
+        while pending:
+            element = pending[-1]
+            if element in counts:
+                # Already counted, or the end element
+                pending.pop()
+                continue
+            # Count the transformations from the successors first
+            missing = [successor for successor in self.successors[element]
+                       if successor not in counts]
+            if missing:
+                pending.extend(missing)
+            else:
+                pending.pop()
+                counts[element] = sum(counts[successor] for successor
+                                      in self.successors[element])
+        return counts[self.start]
+
+    def paths(self):
+        """Generates the shortest transformations from the start element to
+        the end element in lexicographic order, the first one being available
+        at once.
+        """
+        if self.start == self.end:
+            yield [self.start]
+            return
+        # Walk the graph depth-first from the start element
+        path = [self.start]
+        iterators = [iter(self.successors[self.start])]
+        while iterators:
+            element = next(iterators[-1], _MISSING)
+            if element is _MISSING:
+                iterators.pop()
+                path.pop()
+            elif element == self.end:
+                yield path + [element]
+            else:
+                path.append(element)
+                iterators.append(iter(self.successors[element]))
+
+
+class _RestrictedRelations(object):
+    """The relations between elements without some removed elements and
+    without the relations between a spur element and some cut elements.
+
+    Yen's algorithm searches the shortest transformations from a spur element
+    in these relations, to find the transformations that deviate from the
+    ones already found.
+    """
+
+    def __init__(self, relations, removed, spur, cut):
+        self.relations = relations
+        self.removed = removed
+        self.spur = spur
+        self.cut = cut
+
+    def __getitem__(self, element):
+        if element in self.removed:
+            return ()
+        related = [relation for relation in self.relations[element]
+                   if relation not in self.removed]
+        if element == self.spur:
+            return [relation for relation in related
+                    if relation not in self.cut]
+        if element in self.cut:
+            return [relation for relation in related
+                    if relation != self.spur]
+        return related
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# Marks a missing item of a cache
+_MISSING = object()
+
+
+def hamming_distance(a, b):
+    """Returns the number of positions at which two words of the same length
+    differ.
+
+    It never overestimates the number of transformations between the words,
+    as a transformation changes a single letter.
+    """
+    return sum(1 for x, y in zip(a, b) if x != y)
+
+
+def _no_estimate(a, b):
+    """A heuristic that knows nothing about the elements."""
+    return 0
+
+
 class TransformationFinder(object):
     """Finds the shortest list of transformations between elements based on the
     relations existing between them.
+
+    The search is either bidirectional, growing a search tree from both
+    elements, unidirectional, growing a single search tree from the end
+    element, buckets, growing search trees from both elements that scan each
+    group of words having a common partition once, or astar, expanding first
+    the elements that are estimated to be the closest to the end element by
+    the heuristic function. The buckets search needs relations providing the
+    groups of an element, like LazyRelations, and is bidirectional otherwise.
+    The heuristic must never overestimate the number of transformations
+    between two elements and defaults to the heuristic of the relations when
+    they have one, like EditRelations, then to the Hamming distance when the
+    elements are words, and to no estimate otherwise. The number of elements
+    whose relations were read by the searches is counted in expanded.
+
+    The finder can keep the cache_size most recently found transformations.
+    It can also keep the tree_cache_size most recently grown search trees: a
+    search tree knows the shortest transformation between its root and every
+    element it reached, and it can be grown further to reach other elements.
+
+    When the connected components of the relations are given, the elements
+    that are not in the same component are rejected without searching.
+
+    The finder can be shared by threads: their searches run concurrently and
+    only the growth of a cached search tree is done by one thread at a time.
     """
 
-    def __init__(self, relations):
+    SEARCHES = ('bidirectional', 'unidirectional', 'buckets', 'astar')
+
+    def __init__(self, relations, search='bidirectional', cache_size=0,
+                 tree_cache_size=0, components=None, heuristic=None):
+        if search not in self.SEARCHES:
+            raise ValueError('unknown search: %r' % search)
         self.relations = relations
+        self.search = search
+        self.components = components
+        self.heuristic = heuristic
+        self.hits = 0
+        self.misses = 0
+        self.expanded = 0
+        self._transformations = LRUCache(cache_size)
+        self._trees = LRUCache(tree_cache_size)
+
+    def cache_info(self):
+        """Returns the statistics of the cache of transformations.
+
+        A query is a hit when it is answered by a cached transformation or by
+        a cached search tree that already reached the elements.
+        """
+        return CacheInfo(self.hits, self.misses, self._transformations.size,
+                         len(self._transformations))
+
+    def clear_cache(self):
+        """Removes the cached transformations and search trees."""
+        self._transformations.clear()
+        self._trees.clear()
 
     def find_transformation(self, start, end):
         """Finds the shortest list of transformations between the start and end
         elements.
         """
-        next_transformation = {end: None}
-        boundary = deque([end])
-        # Iterates over the boundary of elements with a known transformation
-        # that are connected to elements with an unknown transformation
-        def iter_boundary():
+        for element in self._transformation(start, end):
+            yield element
+
+    def distance_map(self, source):
+        """Returns the DistanceMap of the shortest transformations from the
+        source element to every element related to it.
+        """
+        relations = self.relations
+        if isinstance(relations, CompactRelations):
+            if source not in relations.ids:
+                distances = DistanceMap(source, {source: ()})
+            else:
+                distances = DistanceMap(relations.ids[source],
+                                        relations.adjacency)
+                distances = distances.translate(relations.words)
+        else:
+            distances = DistanceMap(source, relations)
+        self.expanded += distances.expanded
+        return distances
+
+    def find_all_transformations(self, start, end, limit=None):
+        """Generates every shortest list of transformations between the start
+        and end elements, or only the first limit ones.
+
+        A single search finds all the shortest transformations, which are
+        then generated one at a time as they are requested.
+        """
+        paths, words = self._shortest_paths(start, end)[:2]
+        for i, transformation in enumerate(paths.paths()):
+            if limit is not None and i >= limit:
+                return
+            yield self._translate(transformation, words)
+
+    def find_shortest_transformations(self, start, end, k):
+        """Generates the k shortest lists of transformations between the
+        start and end elements, by increasing length, without an element
+        appearing twice in a list.
+
+        Every shortest transformation is generated first, from a single
+        search. When there are fewer than k of them, the longer ones are
+        found with Yen's algorithm: each transformation already found is
+        made to deviate at each of its elements, by searching the shortest
+        transformation from that element that neither goes back through the
+        previous elements nor follows a transformation already found.
+        """
+        paths, words, relations = self._shortest_paths(start, end)
+        found = []
+        for transformation in paths.paths():
+            if len(found) >= k:
+                return
+            found.append(transformation)
+            yield self._translate(transformation, words)
+        # Heap of the deviations sorted by length
+        candidates = []
+        seen = set(tuple(transformation) for transformation in found)
+        deviated = 0
+        while len(found) < k:
+            for transformation in found[deviated:]:
+                for candidate in self._deviations(transformation, found,
+                                                  relations):
+                    if tuple(candidate) not in seen:
+                        seen.add(tuple(candidate))
+                        heapq.heappush(candidates,
+                                       (len(candidate), candidate))
+            deviated = len(found)
+            if not candidates:
+                return
+            transformation = heapq.heappop(candidates)[1]
+            found.append(transformation)
+            yield self._translate(transformation, words)
+
+    def _deviations(self, transformation, found, relations):
+        """Generates the shortest transformations that share the beginning
+        of a transformation up to one of its elements, the spur element, and
+        then deviate from the transformations found with that beginning.
+        """
+        end = transformation[-1]
+        for i in range(len(transformation) - 1):
+            root, spur = transformation[:i], transformation[i]
+            cut = set(other[i + 1] for other in found
+                      if other[:i + 1] == transformation[:i + 1])
+            paths = _ShortestPaths(spur, end)
             try:
-                while True:
-                    yield boundary.popleft()
-            except IndexError:
-                pass
-        for pos, word in enumerate(iter_boundary()):
-            for relation in self.relations[word]:
-                # Ignore words with a known transformation
-                if relation not in next_transformation:
-                    next_transformation[relation] = word
-                    if relation == start:
-                        break
-                    else:
-                        boundary.append(relation)
-        if start not in next_transformation:
-            # The start and end elements are not related
+                paths.search(_RestrictedRelations(relations, set(root),
+                                                  spur, cut))
+            except NoTransformationError:
+                continue
+            finally:
+                self.expanded += paths.expanded
+            yield root + next(paths.paths())
+
+    @staticmethod
+    def _translate(transformation, words):
+        """Returns the words of a transformation between identifiers, or the
+        transformation itself if words is None.
+        """
+        if words is None:
+            return transformation
+        return [words[i] for i in transformation]
+
+    def count_transformations(self, start, end):
+        """Returns the number of shortest lists of transformations between
+        the start and end elements, without listing them.
+        """
+        try:
+            return self._shortest_paths(start, end)[0].count()
+        except NoTransformationError:
+            return 0
+
+    def _shortest_paths(self, start, end):
+        """Returns the _ShortestPaths between the start and end elements, the
+        list of the words of their identifiers, or None if the elements are
+        not identifiers, and the relations between the elements.
+        """
+        if (self.components is not None and start != end and
+                not self.components.connected(start, end)):
             raise NoTransformationError()
-        word = start
-        while word is not None:
-            yield word
-            word = next_transformation[word]
+        words = None
+        relations = self.relations
+        if isinstance(relations, CompactRelations):
+            # Search over the identifiers of the words
+            words, ids = relations.words, relations.ids
+            if start not in ids or end not in ids:
+                raise NoTransformationError()
+            start, end, relations = ids[start], ids[end], relations.adjacency
+        paths = _ShortestPaths(start, end)
+        try:
+            paths.search(relations)
+        finally:
+            self.expanded += paths.expanded
+        return paths, words, relations
+
+    def _transformation(self, start, end):
+        """Returns the shortest list of transformations between the start and
+        end elements, using the caches.
+        """
+        transformation = self._transformations.get((start, end), _MISSING)
+        if transformation is not _MISSING:
+            self.hits += 1
+            if transformation is None:
+                raise NoTransformationError()
+            return transformation
+        if (self.components is not None and start != end and
+                not self.components.connected(start, end)):
+            self._transformations[(start, end)] = None
+            raise NoTransformationError()
+        try:
+            transformation = tuple(self._search(start, end))
+        except NoTransformationError:
+            self._transformations[(start, end)] = None
+            raise
+        self._transformations[(start, end)] = transformation
+        return transformation
+
+    def _search(self, start, end):
+        """Searches the shortest list of transformations between the start and
+        end elements.
+        """
+        heuristic = self.heuristic
+        if heuristic is None:
+            heuristic = getattr(self.relations, 'heuristic', None)
+        if heuristic is None:
+            if isinstance(start, (str, type(u''))):
+                heuristic = hamming_distance
+            else:
+                heuristic = _no_estimate
+        if isinstance(self.relations, CompactRelations):
+            # Search over the identifiers of the words
+            words, ids = self.relations.words, self.relations.ids
+            if start not in ids or end not in ids:
+                raise NoTransformationError()
+
+            def distance(i, j):
+                return heuristic(words[i], words[j])
+            transformation = self._search_cached(ids[start], ids[end],
+                                                 self.relations.adjacency,
+                                                 distance)
+            return [words[i] for i in transformation]
+        return self._search_cached(start, end, self.relations, heuristic)
+
+    def _search_cached(self, start, end, relations, heuristic):
+        """Searches the shortest list of transformations, growing a cached
+        search tree rooted at one of the elements when there is one.
+        """
+        for root, target in [(end, start), (start, end)]:
+            tree = self._trees.get(root)
+            if tree is not None:
+                with tree.lock:
+                    if target in tree.parents:
+                        self.hits += 1
+                    else:
+                        self.misses += 1
+                    transformation = self._grow(tree, target)
+                if root == start:
+                    transformation.reverse()
+                return transformation
+        self.misses += 1
+        if self.search == 'bidirectional':
+            return self._search_bidirectional(start, end, relations)
+        if self.search == 'buckets':
+            tree = _SearchTree
+            if hasattr(relations, 'buckets'):
+                tree = _BucketSearchTree
+            return self._search_bidirectional(start, end, relations, tree)
+        if self.search == 'astar':
+            return self._search_astar(start, end, relations, heuristic)
+        return self._search_unidirectional(start, end, relations)
+
+    def _grow(self, tree, target):
+        """Grows a search tree until it reaches the target element and returns
+        the transformations from the target to the root.
+        """
+        expanded = tree.expanded
+        try:
+            while target not in tree.parents:
+                if not tree.frontier():
+                    # The target and root elements are not related
+                    raise NoTransformationError()
+                tree.expand_layer(lambda element: element == target)
+        finally:
+            self.expanded += tree.expanded - expanded
+        return list(tree.path(target))
+
+    def _search_unidirectional(self, start, end, relations):
+        """Grows a search tree from the end element until it reaches the start
+        element.
+        """
+        tree = _SearchTree(end, relations)
+        try:
+            return self._grow(tree, start)
+        finally:
+            # Only share the tree with the other threads once it is grown
+            self._trees[end] = tree
+
+    def _search_bidirectional(self, start, end, relations, tree=_SearchTree):
+        """Grows search trees from both the start and end elements until they
+        meet, always expanding the smallest frontier.
+        """
+        forward = tree(start, relations)
+        backward = tree(end, relations)
+        meeting = start if start == end else None
+        try:
+            while meeting is None:
+                if len(forward.frontier()) <= len(backward.frontier()):
+                    tree, other = forward, backward
+                else:
+                    tree, other = backward, forward
+                if not tree.frontier():
+                    # The start and end elements are not related
+                    raise NoTransformationError()
+                # The trees meet when an element is discovered by both
+                meeting = tree.expand_layer(other.parents.__contains__)
+        finally:
+            self.expanded += forward.expanded + backward.expanded
+            # Only share the trees with the other threads once they are grown
+            self._trees[start] = forward
+            self._trees[end] = backward
+        transformation = list(forward.path(meeting))
+        transformation.reverse()
+        transformation.extend(backward.path(backward.parents[meeting]))
+        return transformation
+
+    def _search_astar(self, start, end, relations, heuristic):
+        """Expands the elements by increasing estimated length of the
+        transformation through them until the end element is reached.
+
+        A transformation changes a single letter, so the heuristic changes by
+        at most one between related elements and an element is never reached
+        again by a shorter transformation once it is expanded.
+        """
+        parents = {start: None}
+        distances = {start: 0}
+        expanded = set()
+        # The ties are broken in favor of the elements furthest from start,
+        # then in the order of discovery
+        order = 0
+        heap = [(heuristic(start, end), 0, order, start)]
+        try:
+            while heap:
+                estimate, distance, order_, element = heapq.heappop(heap)
+                if element == end:
+                    break
+                if element in expanded:
+                    continue
+                expanded.add(element)
+                distance = -distance + 1
+                for relation in relations[element]:
+                    if distance < distances.get(relation, distance + 1):
+                        distances[relation] = distance
+                        parents[relation] = element
+                        order += 1
+                        heapq.heappush(heap, (
+                            distance + heuristic(relation, end), -distance,
+                            order, relation))
+            else:
+                # The start and end elements are not related
+                raise NoTransformationError()
+        finally:
+            self.expanded += len(expanded)
+        transformation = []
+        while end is not None:
+            transformation.append(end)
+            end = parents[end]
+        transformation.reverse()
+        return transformation
+
+
+class TransformationFinders(object):
+    """The TransformationFinder of the words of each length, created when they
+    are first needed so that their caches are shared by the queries of a
+    length.
+    """
+
+    def __init__(self, relations_of, search='bidirectional', cache_size=0,
+                 tree_cache_size=0, components=False):
+        """Creates the finders of the relations returned by relations_of for a
+        given word length.
+
+        When components is True, the connected components of the relations
+        are computed when the finder is created. The other arguments are the
+        ones of TransformationFinder.
+        """
+        self.relations_of = relations_of
+        self.search = search
+        self.cache_size = cache_size
+        self.tree_cache_size = tree_cache_size
+        self.components = components
+        self._finders = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, length):
+        """Returns the finder of the words of the given length."""
+        with self._lock:
+            finder = self._finders.get(length)
+            if finder is None:
+                relations = self.relations_of(length)
+                components = None
+                if self.components:
+                    components = connected_components(relations)
+                finder = self._finders[length] = TransformationFinder(
+                    relations, self.search, self.cache_size,
+                    self.tree_cache_size, components)
+            return finder
+
+    def expanded(self):
+        """Returns the number of elements expanded by the searches of all the
+        finders.
+        """
+        with self._lock:
+            return sum(finder.expanded for finder in self._finders.values())
+
+    def cache_info(self):
+        """Returns a dictionnary that maps a word length with the statistics of
+        the cache of its finder.
+        """
+        with self._lock:
+            return dict((length, finder.cache_info())
+                        for length, finder in self._finders.items())
 
 
 class NormalizedWordList(object):
@@ -133,17 +1667,39 @@ class NormalizedWordList(object):
     """
 
     def __init__(self, wordlist, wordlength, must_contain=None):
-        """Creates a normalized word list based on the contents of wordlist.
+        """Creates a normalized word list based on the contents of wordlist,
+        either a file object or an iterable of UTF-8 encoded lines.
 
         Only words that have a length of wordlength are kept and the existence
-        of the words given in must_contain is checked.
+        of the words given in must_contain is checked, whatever their length.
+        wordlength is either a length, a collection of lengths or None to keep
+        the words of any length.
         """
-        self.iterwords = codecs.iterdecode(wordlist, 'utf-8')
         self.wordlength = wordlength
+        if wordlength is None or isinstance(wordlength, int):
+            self.wordlengths = wordlength
+        else:
+            self.wordlengths = frozenset(wordlength)
         self.contains = {}
         if must_contain is not None:
             for word in must_contain:
                 self.contains[word] = False
+        # Only decode the lines that may contain a word of an interesting
+        # length
+        accept = None
+        if self.wordlengths is not None:
+            if isinstance(self.wordlengths, int):
+                lengths = set([self.wordlengths])
+            else:
+                lengths = set(self.wordlengths)
+            lengths.update(len(word) for word in self.contains)
+            if lengths:
+                accept = length_filter(lengths)
+            else:
+                accept = lambda line: False
+        if hasattr(wordlist, 'read'):
+            wordlist = iter_lines(wordlist)
+        self.iterwords = iter_words(wordlist, accept)
 
     def __iter__(self):
         return self
@@ -153,19 +1709,240 @@ class NormalizedWordList(object):
             word = next(self.iterwords).strip()
             if word in self.contains:
                 self.contains[word] = True
-            if len(word) == self.wordlength:
+            if self.wordlengths is None:
+                if word:
+                    return word
+            elif isinstance(self.wordlengths, int):
+                if len(word) == self.wordlengths:
+                    return word
+            elif len(word) in self.wordlengths:
                 return word
 
     # Python 2 compatibility
     next = __next__
 
 
+def load_relations(words, lengths=None, graph='lazy', neighbor_cache=0,
+                   backend='python', jobs=1, stats=None, neighbors='auto'):
+    """Builds the relations between the words of each length in a single pass
+    over words.
+
+    Returns a dictionnary that maps a word length with the relations between
+    the words of that length. Only the given lengths are kept, unless lengths
+    is None. The relations are either 'lazy', 'full' or 'compact', matching
+    LazyRelations, the dictionnary returned by RelationsBuilder.relations() and
+    CompactRelations respectively. The compact relations of the python
+    backend are built by jobs worker processes. The lazy relations of each
+    length use the neighbors strategy of RelationsBuilder.lazy_relations().
+    The phases of the construction, the partitions and the strategies chosen
+    are recorded in stats.
+    """
+    if stats is None:
+        stats = NullStats()
+    if graph == 'compact':
+        # The compact relations are built from all the words of a length at
+        # once
+        words_of = defaultdict(list)
+        for word in words:
+            if lengths is None or len(word) in lengths:
+                words_of[len(word)].append(word)
+        if backend == 'python':
+            return _compact_relations(words_of, jobs, stats)
+        with stats.phase('relations'):
+            return dict((length,
+                         RelationsBuilder.build_compact(words, backend))
+                        for length, words in words_of.items())
+    with stats.phase('partition'):
+        builders = MultiLengthRelationsBuilder(words, lengths).builders
+    if stats.enabled:
+        _count_partitions(builders, stats)
+    if graph == 'lazy':
+        with stats.phase('strategy'):
+            strategies = dict((length, _neighbor_strategy(builder, neighbors))
+                              for length, builder in builders.items())
+        if stats.enabled:
+            _count_strategies(strategies, stats)
+    with stats.phase('relations'):
+        if graph == 'lazy':
+            return dict((length, builder.lazy_relations(
+                neighbor_cache, strategies[length].name))
+                for length, builder in builders.items())
+        return dict((length, builder.relations())
+                    for length, builder in builders.items())
+
+
+def load_edit_relations(words, stats=None):
+    """Builds the EditRelations between words of every length in a single
+    pass over words, recording the phases of the construction and the
+    partitions in stats like load_relations().
+    """
+    if stats is None:
+        stats = NullStats()
+    with stats.phase('partition'):
+        builder = MultiLengthRelationsBuilder(words)
+    if stats.enabled:
+        _count_partitions(builder.builders, stats)
+    return builder.edit_relations()
+
+
+def _neighbor_strategy(builder, neighbors):
+    """Returns the NeighborStrategy of a builder, measuring the words even when
+    the strategy is chosen by neighbors.
+    """
+    if neighbors not in RelationsBuilder.NEIGHBOR_STRATEGIES:
+        raise ValueError('unknown neighbor strategy: %r' % neighbors)
+    strategy = builder.neighbor_strategy()
+    if neighbors != 'auto':
+        strategy = strategy._replace(name=neighbors)
+    return strategy
+
+
+def _count_strategies(strategies, stats):
+    """Records the neighbor strategy of each word length and its measures."""
+    stats.update('neighbor strategies', dict(
+        (length, strategy.name) for length, strategy in strategies.items()))
+    stats.update('alphabet sizes', dict(
+        (length, strategy.alphabet)
+        for length, strategy in strategies.items()))
+    stats.update('bucket densities', dict(
+        (length, round(strategy.density, 2))
+        for length, strategy in strategies.items()))
+
+
+def _count_partitions(builders, stats):
+    """Adds the number of partitions of the builders, their sizes and the
+    number of relations between distinct words to the statistics.
+    """
+    histogram = defaultdict(int)
+    for builder in builders.values():
+        for size, count in builder.bucket_sizes().items():
+            histogram[size] += count
+    _count_bucket_sizes(histogram, stats)
+
+
+def _count_buckets(words_of, buckets, stats):
+    """Adds the statistics of _count_partitions() from the words of each
+    length and their buckets computed by _build_buckets().
+    """
+    histogram = defaultdict(int)
+    for length, positions in buckets.items():
+        for bucket_offsets, members, bucket_of in positions:
+            # The words missing from the buckets have their own partition
+            single = len(words_of[length]) - len(members)
+            if single:
+                histogram[1] += single
+            for bucket in range(len(bucket_offsets) - 1):
+                histogram[bucket_offsets[bucket + 1] -
+                          bucket_offsets[bucket]] += 1
+    _count_bucket_sizes(histogram, stats)
+
+
+def _count_bucket_sizes(histogram, stats):
+    """Adds the number of partitions, their sizes and the number of relations
+    between distinct words to the statistics from a dictionnary that maps a
+    number of words with the number of partitions shared by that many
+    words.
+    """
+    stats.count('buckets', sum(histogram.values()))
+    stats.count('bucket sizes', dict(histogram))
+    # Two distinct words share at most one partition
+    stats.count('edges', sum(count * size * (size - 1) // 2
+                             for size, count in histogram.items()))
+
+
+def word_argument(value):
+    """Converts a command-line argument into a word.
+
+    The command-line arguments are byte strings in Python 2 and they are
+    decoded as UTF-8.
+    """
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
+
+
+class QueryError(Exception):
+    """Exception raised when a query for a transformation cannot be answered.
+    """
+    pass
+
+
+def query_transformation(start, end, finder_of):
+    """Returns the shortest list of transformations between two words.
+
+    finder_of is a function returning the TransformationFinder of the words of
+    a given length, such as TransformationFinders. A QueryError
+    describing the problem is raised when there is no such transformation.
+    """
+    if len(start) != len(end):
+        raise QueryError('the words must have the same length')
+    finder = finder_of(len(start))
+    for word in [start, end]:
+        if word not in finder.relations:
+            raise QueryError("'%s' is not in the list of words" % word)
+    try:
+        return list(finder.find_transformation(start, end))
+    except NoTransformationError:
+        raise QueryError("no transformation is possible from '%s' to '%s'" %
+                         (start, end))
+
+
+def answer_queries(queries, finder_of):
+    """Generates the answer to each query of a batch.
+
+    A query is a line containing the word to transform from and the word to
+    transform to, separated by whitespace. finder_of is a function returning
+    the TransformationFinder of the words of a given length. The answer is
+    either the words of the transformation separated by a space or an error
+    message.
+    """
+    for query in queries:
+        words = query.split()
+        if not words:
+            continue
+        try:
+            if len(words) != 2:
+                raise QueryError('a query must contain exactly two words')
+            yield ' '.join(query_transformation(words[0], words[1],
+                                                finder_of))
+        except QueryError as e:
+            yield 'error: %s' % e
+
+
+def plural(count, noun):
+    """Returns a count followed by a noun in the singular or plural form."""
+    return '%d %s%s' % (count, noun, '' if count == 1 else 's')
+
+
+def describe_components(length, components):
+    """Generates the lines of the report about the connected components of
+    the words of a given length.
+
+    The report gives the number of words and of components, followed by the
+    number of components of each size, from the largest size.
+    """
+    sizes = components.sizes()
+    yield 'length %d: %s in %s' % (length, plural(sum(sizes), 'word'),
+                                   plural(len(sizes), 'component'))
+    counts = defaultdict(int)
+    for size in sizes:
+        counts[size] += 1
+    for size in sorted(counts, reverse=True):
+        yield '  %s of %s' % (plural(counts[size], 'component'),
+                              plural(size, 'word'))
+
+
 def main():
     """Module entry point."""
+    import sys
+    if sys.argv[1:2] in (['serve'], ['client']):
+        from .server import main as server_main
+        return server_main()
     import argparse
     parser = argparse.ArgumentParser(
         description="""transforms a word into another word by changing one
-                       letter at a time """)
+                       letter at a time; run '%(prog)s serve --help' or
+                       '%(prog)s client --help' for the server mode""")
     # Cannot import the version from the package when running this module as a
     # script
     try:
@@ -174,44 +1951,285 @@ def main():
                             version='%(prog)s ' + __version__)
     except SystemError:
         pass
-    # Work around the encoding differences between Python 2 and 3 for the
-    # command-line arguments
-    import sys
-    if sys.version_info[0] == 3:
-        word_type = str
-    else:
-        def word_type(object):
-            return unicode(object, 'utf-8')
-    parser.add_argument('--from', dest='start', required=True, type=word_type,
+    parser.add_argument('--from', dest='start', type=word_argument,
                         help='word to transform from')
-    parser.add_argument('--to', dest='end', required=True, type=word_type,
+    parser.add_argument('--to', dest='end', type=word_argument,
                         help='word to transform to')
+    parser.add_argument('--search', choices=TransformationFinder.SEARCHES,
+                        default='bidirectional',
+                        help='search algorithm (default: %(default)s)')
+    parser.add_argument('--graph', choices=['lazy', 'full', 'compact'],
+                        default='lazy',
+                        help="""compute the relations of the words when the
+                                search reaches them (lazy), before the search
+                                (full) or before the search as arrays of word
+                                identifiers (compact)
+                                (default: %(default)s)""")
+    parser.add_argument('--neighbor-cache', metavar='SIZE', type=int,
+                        default=0,
+                        help="""number of sets of relations kept in memory by
+                                the lazy graph (default: %(default)s)""")
+    parser.add_argument('--neighbors',
+                        choices=RelationsBuilder.NEIGHBOR_STRATEGIES,
+                        default='auto',
+                        help="""find the relations of a word in the lazy graph
+                                from the words sharing a partition with it
+                                (buckets) or by looking up every substitution
+                                of its letters (substitutions); auto chooses
+                                for each word length from the size of the
+                                alphabet and the density of the partitions
+                                (default: %(default)s)""")
+    parser.add_argument('--backend', choices=RelationsBuilder.BACKENDS,
+                        default='python',
+                        help="""backend used to build the compact graph
+                                (default: %(default)s)""")
+    parser.add_argument('--cache-size', metavar='SIZE', type=int, default=0,
+                        help="""number of transformations kept in memory for
+                                the repeated queries of --queries
+                                (default: %(default)s)""")
+    parser.add_argument('--tree-cache-size', metavar='SIZE', type=int,
+                        default=0,
+                        help="""number of search trees kept in memory to
+                                answer the queries of --queries sharing a word
+                                (default: %(default)s)""")
+    parser.add_argument('--queries', metavar='FILE',
+                        type=argparse.FileType('rb'),
+                        help="""answer the queries read from FILE, or from
+                                the standard input if FILE is -, with one pair
+                                of words per line instead of --from and --to;
+                                the words of all the queried lengths are read
+                                in a single pass, and only the lengths of the
+                                queries are kept when FILE is a regular
+                                file""")
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=1,
+                        help="""number of worker processes used to build the
+                                compact graph with the python backend or the
+                                index (default: %(default)s)""")
+    parser.add_argument('--index', metavar='INDEX',
+                        help="""use the index of the list of words stored in
+                                INDEX, which is built or rebuilt when it is
+                                missing or stale""")
+    parser.add_argument('--build-index', metavar='INDEX',
+                        help="""build the index of the list of words in INDEX
+                                and exit""")
+    parser.add_argument('--all', action='store_true',
+                        help="""print every shortest transformation between
+                                the --from and --to words, one per line""")
+    parser.add_argument('--limit', metavar='K', type=int,
+                        help="""print the K shortest transformations between
+                                the --from and --to words, one per line by
+                                increasing length: every shortest
+                                transformation, then longer ones if there are
+                                fewer than K""")
+    parser.add_argument('--count', action='store_true',
+                        help="""print the number of shortest transformations
+                                between the --from and --to words""")
+    parser.add_argument('--edits', action='store_true',
+                        help="""also transform a word by inserting or removing
+                                a letter, so that the --from and --to words
+                                can have different lengths; the relations are
+                                always computed lazily""")
+    parser.add_argument('--components', action='store_true',
+                        help="""report the sizes of the groups of words that
+                                can be transformed into each other, for each
+                                word length, and exit""")
     parser.add_argument('wordlist', type=argparse.FileType('rb'),
                         help='a file containing a list of words')
+    add_stats_arguments(parser)
     args = parser.parse_args()
+    if args.limit is not None and args.limit < 1:
+        parser.error('the --limit argument must be at least 1')
+    if args.backend != 'python' and args.graph != 'compact':
+        parser.error('the --backend argument requires the --graph compact '
+                     'argument')
+    if (args.jobs > 1 and (args.graph != 'compact' or args.edits) and
+            args.index is None and args.build_index is None):
+        parser.error('the --jobs argument requires the --graph compact, '
+                     '--index or --build-index argument')
+    stats = stats_from_arguments(args)
+    try:
+        with profiled(args.profile):
+            _transform(parser, args, stats)
+    finally:
+        stats.write(sys.stderr if args.stats else None, args.stats_json)
+
+
+def _read_words(wordlist, wordlength, stats, must_contain=None):
+    """Returns the NormalizedWordList of a list of words and the words it
+    keeps.
+
+    When statistics are collected, the list is read and normalized before
+    returning the words, so that the time of each phase is known.
+    """
+    if not stats.enabled:
+        words = NormalizedWordList(wordlist, wordlength, must_contain)
+        return words, words
+    with stats.phase('read'):
+        lines = list(iter_lines(wordlist))
+    stats.set('lines read', len(lines))
+    with stats.phase('normalize'):
+        normalized = NormalizedWordList(lines, wordlength, must_contain)
+        words = list(normalized)
+    stats.set('words kept', len(words))
+    return normalized, words
+
+
+def _query_lengths(queries):
+    """Returns the set of the lengths of the words of the queries read from a
+    regular file, which is then read again from the start of the queries, or
+    None when the queries cannot be read twice.
+    """
+    try:
+        if not stat.S_ISREG(os.fstat(queries.fileno()).st_mode):
+            return None
+    except (AttributeError, EnvironmentError, ValueError):
+        return None
+    position = queries.tell()
+    lengths = set()
+    for query in codecs.iterdecode(queries, 'utf-8'):
+        lengths.update(len(word) for word in query.split())
+    queries.seek(position)
+    return lengths
+
+
+def _transform(parser, args, stats):
+    """Runs the command of the parsed arguments, recording its statistics."""
+    import sys
+    if args.build_index is not None:
+        from .index import build_index
+        with stats.phase('index'):
+            build_index(args.build_index, args.wordlist, args.jobs)
+        return
+    if args.edits and (args.components or args.queries is not None):
+        parser.error('the --edits argument requires the --from and --to '
+                     'arguments')
+    if args.components:
+        if args.index is not None:
+            from .index import open_index
+            with stats.phase('index'):
+                index = open_index(args.index, args.wordlist, args.jobs)
+            graphs = dict((length, index.relations(length))
+                          for length in index.lengths())
+        else:
+            words = _read_words(args.wordlist, None, stats)[1]
+            graphs = load_relations(words, None, args.graph,
+                                    args.neighbor_cache, args.backend,
+                                    args.jobs, stats, args.neighbors)
+        with stats.phase('components'):
+            reports = [list(describe_components(
+                length, connected_components(graphs[length])))
+                for length in sorted(graphs)]
+        for lines in reports:
+            for line in lines:
+                print(line)
+        return
+    if args.queries is not None:
+        if args.start is not None or args.end is not None:
+            parser.error('the --queries argument cannot be used with the '
+                         '--from and --to arguments')
+        if args.all or args.limit is not None or args.count:
+            parser.error('the --all, --limit and --count arguments require '
+                         'the --from and --to arguments')
+        if args.index is not None:
+            from .index import open_index
+            with stats.phase('index'):
+                relations_of = open_index(args.index, args.wordlist,
+                                          args.jobs).relations
+        else:
+            # The relations of the queried lengths are built in a single pass
+            # over the list of words before answering the queries as they
+            # are read
+            lengths = _query_lengths(args.queries)
+            words = _read_words(args.wordlist, lengths, stats)[1]
+            graphs = load_relations(words, lengths, args.graph,
+                                    args.neighbor_cache, args.backend,
+                                    args.jobs, stats, args.neighbors)
+
+            def relations_of(length):
+                return graphs.get(length, {})
+
+        def queries():
+            for query in codecs.iterdecode(args.queries, 'utf-8'):
+                stats.count('queries')
+                yield query
+        # Reject the queries for unrelated words without searching
+        finder_of = TransformationFinders(relations_of, args.search,
+                                          args.cache_size,
+                                          args.tree_cache_size,
+                                          components=True)
+        stats.set('queries', 0)
+        with stats.phase('search'):
+            for answer in answer_queries(queries(), finder_of):
+                print(answer)
+                sys.stdout.flush()
+        stats.set('nodes expanded', finder_of.expanded())
+        return
+    if args.start is None or args.end is None:
+        parser.error('the --from and --to arguments are required')
+    if args.edits:
+        if args.index is not None:
+            parser.error('the --edits argument cannot be used with the '
+                         '--index argument')
+        normalized, words = _read_words(args.wordlist, None, stats,
+                                        must_contain=[args.start, args.end])
+        relations = load_edit_relations(words, stats)
+        contains = normalized.contains
     # The words in the chain of transformations must have the same length
-    if len(args.start) != len(args.end):
+    elif len(args.start) != len(args.end):
         parser.error('the --from and --to arguments must have the same length')
-    # Filter and normalize the words and check for the presence of the words at
-    # the beginning and end of the transformation (the check is valid once the
-    # iteration is finished)
-    words = NormalizedWordList(args.wordlist, len(args.start),
-                               must_contain=[args.start, args.end])
-    relations = RelationsBuilder(words).relations()
-    if not words.contains[args.start]:
-        parser.exit(1, _('%s: error: %s\n') % (parser.prog,
-                       "'%s' is not in the list of words" % args.start))
-    if not words.contains[args.end]:
-        parser.exit(1, _('%s: error: %s\n') % (parser.prog,
-                       "'%s' is not in the list of words" % args.start))
+    elif args.index is not None:
+        from .index import open_index
+        with stats.phase('index'):
+            relations = open_index(args.index, args.wordlist,
+                                   args.jobs).relations(len(args.start))
+        contains = dict((word, word in relations)
+                        for word in [args.start, args.end])
+    else:
+        # Filter and normalize the words and check for the presence of the
+        # words at the beginning and end of the transformation (the check is
+        # valid once the iteration is finished)
+        normalized, words = _read_words(args.wordlist, len(args.start), stats,
+                                        must_contain=[args.start, args.end])
+        relations = load_relations(words, None, args.graph,
+                                   args.neighbor_cache, args.backend,
+                                   args.jobs, stats,
+                                   args.neighbors).get(len(args.start), {})
+        contains = normalized.contains
+    for word in [args.start, args.end]:
+        if not contains[word]:
+            parser.exit(1, _('%s: error: %s\n') % (parser.prog,
+                           "'%s' is not in the list of words" % word))
+    finder = TransformationFinder(relations, args.search)
+    if args.count:
+        with stats.phase('search'):
+            count = finder.count_transformations(args.start, args.end)
+        stats.set('nodes expanded', finder.expanded)
+        print(count)
+        return
     try:
-        finder = TransformationFinder(relations)
-        for word in finder.find_transformation(args.start, args.end):
-            print(word)
+        if args.all or args.limit is not None:
+            # The transformations are printed as soon as they are found
+            if args.limit is not None:
+                transformations = finder.find_shortest_transformations(
+                    args.start, args.end, args.limit)
+            else:
+                transformations = finder.find_all_transformations(
+                    args.start, args.end)
+            with stats.phase('search'):
+                for transformation in transformations:
+                    print(' '.join(transformation))
+            return
+        with stats.phase('search'):
+            transformation = list(finder.find_transformation(args.start,
+                                                             args.end))
     except NoTransformationError:
         parser.exit(1, _('%s: error: %s\n') % (parser.prog,
                        "no transformation is possible from '%s' to '%s'" %
                        (args.start, args.end)))
+    finally:
+        stats.set('nodes expanded', finder.expanded)
+    for word in transformation:
+        print(word)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Georges Discry
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+"""Computes the relations between words with vectorized NumPy operations.
+
+NumPy is an optional dependency: numpy is None when it is not installed.
+"""
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _to_array(values):
+    """Converts a NumPy array into an array of unsigned integers."""
+    converted = array('I')
+    data = values.astype(numpy.uint32).tobytes()
+    try:
+        converted.frombytes(data)
+    except AttributeError:
+        # Python 2 compatibility
+        converted.fromstring(data)
+    return converted
+
+
+def _group_pairs(keys):
+    """Returns the pairs of rows that have the same key.
+
+    keys is a matrix whose rows are the keys to group. The pairs are returned
+    as two arrays of row indices and include the pair of each row with itself.
+    """
+    count = len(keys)
+    if keys.shape[1]:
+        # Sort the rows so that equal keys are consecutive
+        order = numpy.lexsort(keys.T[::-1])
+        sorted_keys = keys[order]
+        new_group = numpy.ones(count, dtype=bool)
+        new_group[1:] = (sorted_keys[1:] != sorted_keys[:-1]).any(axis=1)
+    else:
+        # Words of a single letter all have the same empty key
+        order = numpy.arange(count)
+        new_group = numpy.zeros(count, dtype=bool)
+        new_group[0] = True
+    starts = numpy.flatnonzero(new_group)
+    sizes = numpy.diff(numpy.append(starts, count))
+    # Each row is paired with every row of its group
+    row_sizes = numpy.repeat(sizes, sizes)
+    row_starts = numpy.repeat(starts, sizes)
+    first_pairs = numpy.cumsum(row_sizes) - row_sizes
+    total = row_sizes.sum()
+    within = numpy.arange(total) - numpy.repeat(first_pairs, row_sizes)
+    sources = numpy.repeat(numpy.arange(count), row_sizes)
+    targets = numpy.repeat(row_starts, row_sizes) + within
+    return order[sources], order[targets]
+
+
+def compact_relations(words):
+    """Computes the relations between words in compressed sparse row form.
+
+    Returns the sorted list of words, the offsets and the neighbors arrays
+    described by transform.CompactRelations. The words of the same length are
+    encoded as a matrix of code points and the words having a common partition
+    are found by masking each column in turn.
+    """
+    words = sorted(set(word for word in words if word))
+    count = len(words)
+    lengths = numpy.array([len(word) for word in words], dtype=numpy.int64)
+    sources, targets = [], []
+    for length in numpy.unique(lengths):
+        ids = numpy.flatnonzero(lengths == length)
+        encoded = u''.join(words[i] for i in ids).encode('utf-32-le')
+        codes = numpy.frombuffer(encoded, dtype='<u4').reshape(len(ids),
+                                                                 length)
+        for position in range(length):
+            keys = numpy.delete(codes, position, axis=1)
+            source, target = _group_pairs(keys)
+            sources.append(ids[source])
+            targets.append(ids[target])
+    if sources:
+        edges = numpy.unique(numpy.concatenate(sources) * count +
+                             numpy.concatenate(targets))
+    else:
+        edges = numpy.zeros(0, dtype=numpy.int64)
+    source, target = numpy.divmod(edges, count) if count else (edges, edges)
+    offsets = numpy.zeros(count + 1, dtype=numpy.int64)
+    offsets[1:] = numpy.cumsum(numpy.bincount(source, minlength=count))
+    return words, _to_array(offsets), _to_array(target)